@@ -0,0 +1,281 @@
+import heapq
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from utils.shared_arrays import pool_context, shared_arrays, open_shared
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RULE_METRICS = ('lift', 'confidence', 'support', 'leverage', 'conviction')
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(words):
+        """Number of set bits per row of a 2-D uint64 array."""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        """Number of set bits per row of a 2-D uint64 array."""
+        return POPCOUNT_TABLE[np.ascontiguousarray(words).view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+class Transactions:
+    """Transactions in coordinate form: one (transaction, item) pair per purchase, without duplicates."""
+
+    def __init__(self, transaction_ids, item_ids, labels, count):
+        size = max(len(labels), 1)
+        pairs = np.unique(np.asarray(transaction_ids, dtype=np.int64) * size + np.asarray(item_ids, dtype=np.int64))
+        self.transaction_ids = pairs // size
+        self.item_ids = pairs % size
+        self.labels = list(labels)
+        self.count = int(count)
+
+
+def encode_transactions(data_frame, transaction_column=None, item_column=None, items_column=None, separator=','):
+    """Turn a DataFrame into Transactions.
+
+    Three layouts are understood:
+      transaction_column + item_column: one row per (transaction, item), e.g. an order lines table
+      items_column: one row per transaction with the items joined by separator
+      neither: one row per transaction; 0/1 and boolean columns are items when set,
+          every other column contributes a "column=value" item
+    """
+    if transaction_column or item_column:
+        if not (transaction_column and item_column):
+            raise ValueError("transaction_column and item_column must be given together.")
+        for column in (transaction_column, item_column):
+            if column not in data_frame.columns:
+                raise ValueError(f"Unknown column: {column}")
+        rows = data_frame[[transaction_column, item_column]].dropna()
+        transaction_ids, transactions = pd.factorize(rows[transaction_column])
+        item_ids, labels = pd.factorize(rows[item_column].astype(str))
+        return Transactions(transaction_ids, item_ids, labels, len(transactions))
+
+    if items_column:
+        if items_column not in data_frame.columns:
+            raise ValueError(f"Unknown column: {items_column}")
+        baskets = data_frame[items_column].reset_index(drop=True).dropna().astype(str)
+        items = baskets.str.split(separator).explode().str.strip()
+        items = items[items != '']
+        item_ids, labels = pd.factorize(items)
+        return Transactions(items.index.to_numpy(), item_ids, labels, len(data_frame))
+
+    transaction_ids, item_ids, labels = [], [], []
+    for column in data_frame.columns:
+        values = data_frame[column].reset_index(drop=True)
+        present = values.dropna()
+        if pd.api.types.is_bool_dtype(values) or (len(present) and present.isin([0, 1]).all()):
+            rows = np.flatnonzero(values.fillna(0).astype(bool).to_numpy())
+            transaction_ids.append(rows)
+            item_ids.append(np.full(len(rows), len(labels)))
+            labels.append(str(column))
+        else:
+            codes, uniques = pd.factorize(values)
+            rows = np.flatnonzero(codes >= 0)
+            transaction_ids.append(rows)
+            item_ids.append(codes[rows] + len(labels))
+            labels.extend(f"{column}={value}" for value in uniques)
+    if not labels:
+        return Transactions([], [], [], len(data_frame))
+    return Transactions(np.concatenate(transaction_ids), np.concatenate(item_ids), labels, len(data_frame))
+
+
+def build_bitsets(transaction_ids, item_ids, item_count, transaction_count):
+    """Vertical layout: row i holds one bit per transaction, set where the transaction contains item i."""
+    words = (transaction_count + 63) // 64
+    keys = item_ids * words + (transaction_ids >> 6)
+    bits = np.left_shift(np.uint64(1), (transaction_ids & 63).astype(np.uint64))
+    order = np.argsort(keys, kind='stable')
+    keys, bits = keys[order], bits[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    bitsets = np.zeros(item_count * words, dtype=np.uint64)
+    if len(starts):
+        bitsets[keys[starts]] = np.bitwise_or.reduceat(bits, starts)
+    return bitsets.reshape(item_count, words)
+
+
+# State shared with worker processes: set once per process by the pool initializer
+SHARED = {}
+
+
+def share_state(bitsets, min_count, max_length, block_items):
+    SHARED.update(bitsets=bitsets, min_count=min_count, max_length=max_length, block_items=block_items)
+
+
+def share_mapped_state(bitsets_path, *state):
+    share_state(open_shared(bitsets_path), *state)
+
+
+def mine_class(first):
+    """Eclat over the equivalence class of itemsets whose lowest-ranked item is `first`.
+
+    Only the words in which `first` occurs can contribute, so every bitset in
+    the class is narrowed to those words before intersecting; deeper levels
+    narrow further, which keeps the work proportional to the class support.
+    """
+    bitsets = SHARED['bitsets']
+    min_count = SHARED['min_count']
+    block_items = SHARED['block_items']
+    prefix = bitsets[first]
+    words = np.flatnonzero(prefix)
+    prefix = prefix[words]
+
+    members, member_bits, results = [], [], []
+    for start in range(first + 1, len(bitsets), block_items):
+        block = bitsets[start:start + block_items][:, words] & prefix
+        counts = popcount(block)
+        keep = np.flatnonzero(counts >= min_count)
+        for offset in keep:
+            results.append(((first, start + int(offset)), int(counts[offset])))
+        members.append(keep + start)
+        member_bits.append(block[keep])
+    if members:
+        extend((first,), np.concatenate(members), np.concatenate(member_bits), results)
+    return results
+
+
+def extend(prefix, items, bits, results):
+    """Depth-first Eclat step: each member item extends the prefix, intersected with the members after it."""
+    max_length = SHARED['max_length']
+    if max_length is not None and len(prefix) + 2 > max_length:
+        return
+    min_count = SHARED['min_count']
+    for position in range(len(items) - 1):
+        row = bits[position]
+        words = np.flatnonzero(row)
+        narrowed = bits[position + 1:, words] & row[words]
+        counts = popcount(narrowed)
+        keep = np.flatnonzero(counts >= min_count)
+        if not len(keep):
+            continue
+        new_prefix = prefix + (int(items[position]),)
+        new_items = items[position + 1:][keep]
+        for item, count in zip(new_items, counts[keep]):
+            results.append((new_prefix + (int(item),), int(count)))
+        extend(new_prefix, new_items, narrowed[keep], results)
+
+
+class AssociationMiner:
+    """Frequent itemset and association rule mining with Eclat over transaction bitsets.
+
+    Item supports are counted with one bincount and infrequent items are
+    dropped before any bitset is built, so memory is
+    frequent items x transactions / 8 bytes. Itemsets are enumerated depth
+    first per equivalence class, with the classes spread over worker
+    processes. Rules are generated lazily and only the top_k by the chosen
+    metric are kept.
+    """
+
+    def __init__(self, min_support=0.01, min_confidence=0.5, max_length=None, metric='lift', top_k=100,
+                 max_workers=None, block_items=256):
+        if not 0 < min_support <= 1:
+            raise ValueError("min_support must be in (0, 1].")
+        if not 0 <= min_confidence <= 1:
+            raise ValueError("min_confidence must be in [0, 1].")
+        if metric not in RULE_METRICS:
+            raise ValueError(f"Unsupported rule metric: {metric}")
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.max_length = max_length
+        self.metric = metric
+        self.top_k = top_k
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.block_items = block_items
+
+    def mine(self, transactions, progress=None):
+        """Mine frequent itemsets and the top association rules; returns a JSON-friendly dict."""
+        progress = progress or (lambda fraction, message='': None)
+        itemsets = self.frequent_itemsets(transactions, progress)
+        progress(0.9, "Generating rules")
+        rules = heapq.nlargest(self.top_k, self.iter_rules(itemsets, transactions),
+                               key=lambda rule: math.inf if rule[self.metric] is None else rule[self.metric])
+        top_itemsets = heapq.nlargest(self.top_k, ((itemset, count) for itemset, count in itemsets.items()
+                                                   if len(itemset) > 1), key=lambda entry: entry[1])
+        logger.info(f"Found {len(itemsets)} frequent itemsets and kept {len(rules)} rules")
+        return {
+            "transactions": transactions.count,
+            "items": len(transactions.labels),
+            "frequent_itemsets": len(itemsets),
+            "itemsets": [{"items": [transactions.labels[item] for item in itemset],
+                          "support": count / transactions.count} for itemset, count in top_itemsets],
+            "rules": rules,
+        }
+
+    def frequent_itemsets(self, transactions, progress=None):
+        """Map each frequent itemset (sorted tuple of item ids) to its transaction count."""
+        progress = progress or (lambda fraction, message='': None)
+        if transactions.count == 0:
+            return {}
+        min_count = max(1, math.ceil(self.min_support * transactions.count))
+        support = np.bincount(transactions.item_ids, minlength=len(transactions.labels))
+        # Rank frequent items by ascending support, which keeps the Eclat classes small
+        frequent = np.flatnonzero(support >= min_count)
+        frequent = frequent[np.argsort(support[frequent], kind='stable')]
+        itemsets = {(int(item),): int(support[item]) for item in frequent}
+        progress(0.05, f"{len(frequent)} frequent items")
+        if len(frequent) < 2 or self.max_length == 1:
+            return itemsets
+
+        rank = np.full(len(transactions.labels), -1, dtype=np.int64)
+        rank[frequent] = np.arange(len(frequent))
+        ranks = rank[transactions.item_ids]
+        keep = ranks >= 0
+        bitsets = build_bitsets(transactions.transaction_ids[keep], ranks[keep], len(frequent), transactions.count)
+
+        def collect(results):
+            for ranked, count in results:
+                itemsets[tuple(sorted(int(frequent[position]) for position in ranked))] = count
+
+        classes = range(len(frequent) - 1)
+        state = (bitsets, min_count, self.max_length, self.block_items)
+        if self.max_workers > 1 and len(frequent) > 64:
+            # The workers map the bitsets from a file rather than each unpickling a copy
+            with shared_arrays(bitsets) as (bitsets_path,), \
+                    ProcessPoolExecutor(max_workers=self.max_workers, mp_context=pool_context(),
+                                        initializer=share_mapped_state, initargs=(bitsets_path, *state[1:])) as executor:
+                futures = [executor.submit(mine_class, first) for first in classes]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    collect(future.result())
+                    progress(0.05 + 0.85 * done / len(futures), f"Mined {done}/{len(futures)} item classes")
+        else:
+            share_state(*state)
+            try:
+                for first in classes:
+                    collect(mine_class(first))
+                    progress(0.05 + 0.85 * (first + 1) / len(classes), f"Mined {first + 1}/{len(classes)} item classes")
+            finally:
+                SHARED.clear()
+        return itemsets
+
+    def iter_rules(self, itemsets, transactions):
+        """Yield rules antecedent -> consequent meeting min_confidence, one dict at a time."""
+        total = transactions.count
+        labels = transactions.labels
+        for itemset, count in itemsets.items():
+            if len(itemset) < 2:
+                continue
+            support = count / total
+            for size in range(1, len(itemset)):
+                for antecedent in combinations(itemset, size):
+                    confidence = count / itemsets[antecedent]
+                    if confidence < self.min_confidence:
+                        continue
+                    consequent = tuple(item for item in itemset if item not in antecedent)
+                    consequent_support = itemsets[consequent] / total
+                    yield {
+                        "antecedents": [labels[item] for item in antecedent],
+                        "consequents": [labels[item] for item in consequent],
+                        "support": support,
+                        "confidence": confidence,
+                        "lift": confidence / consequent_support,
+                        "leverage": support - itemsets[antecedent] / total * consequent_support,
+                        "conviction": (1 - consequent_support) / (1 - confidence) if confidence < 1 else None,
+                    }
@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from data_ingestion.running_stats import RunningStats
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+METHODS = ('covariance', 'pearson', 'spearman')
+DEFAULT_BLOCK_ROWS = 100000
+
+
+class CorrelationEngine:
+    """Computes covariance, Pearson and Spearman matrices for every numeric column at once.
+
+    Missing values are handled pairwise: each pair of columns uses the rows
+    where both are present, like pandas' DataFrame.cov/corr. Instead of a
+    loop per pair, the sums needed for all pairs come out of a handful of
+    matrix products per block of rows, and row blocks are processed in a
+    thread pool (NumPy releases the GIL inside BLAS).
+    """
+
+    def __init__(self, block_rows=DEFAULT_BLOCK_ROWS, max_workers=None, cache_size=32):
+        self.block_rows = block_rows
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def compute(self, data_frame, methods=METHODS, cache_key=None):
+        """Return {'columns': [...], method: DataFrame, ...} for the numeric columns of data_frame.
+
+        When cache_key identifies the dataset version (e.g. path, mtime and
+        size), results are reused until that version changes.
+        """
+        unknown = set(methods) - set(METHODS)
+        if unknown:
+            raise ValueError(f"Unsupported correlation methods: {', '.join(sorted(unknown))}")
+
+        key = (cache_key, tuple(sorted(methods))) if cache_key is not None else None
+        if key is not None:
+            with self.lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    logger.info("Serving correlation matrices from cache")
+                    return self.cache[key]
+
+        numeric = data_frame.select_dtypes(include='number')
+        columns = list(numeric.columns)
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        results = {'columns': columns}
+
+        if 'covariance' in methods or 'pearson' in methods:
+            covariance, pearson = self.pairwise_moments(values)
+            if 'covariance' in methods:
+                results['covariance'] = pd.DataFrame(covariance, index=columns, columns=columns)
+            if 'pearson' in methods:
+                results['pearson'] = pd.DataFrame(pearson, index=columns, columns=columns)
+
+        if 'spearman' in methods:
+            # Ranks are computed once per column over its non-missing values
+            ranks = self.rank_columns(values)
+            _, spearman = self.pairwise_moments(ranks)
+            results['spearman'] = pd.DataFrame(spearman, index=columns, columns=columns)
+
+        logger.info(f"Computed {', '.join(methods)} for {len(columns)} columns over {len(values)} rows")
+        if key is not None:
+            with self.lock:
+                self.cache[key] = results
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return results
+
+    def pairwise_moments(self, values):
+        """Return the pairwise-complete covariance and Pearson matrices of a 2-D float array."""
+        if values.shape[1] == 0:
+            empty = np.empty((0, 0))
+            return empty, empty
+
+        # Each row block becomes a mergeable RunningStats state; merging them is exact
+        blocks = [values[start:start + self.block_rows] for start in range(0, len(values), self.block_rows)]
+        if len(blocks) <= 1:
+            partials = [RunningStats.from_array(block) for block in blocks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                partials = list(executor.map(RunningStats.from_array, blocks))
+
+        stats = RunningStats(range(values.shape[1]))
+        for partial in partials:
+            stats.merge(partial)
+        return stats.covariance().to_numpy(), stats.correlation().to_numpy()
+
+    def rank_columns(self, values):
+        """Average ranks of every column, NaN kept in place, ranked in parallel."""
+        ranks = np.empty_like(values)
+
+        def rank_into(index):
+            ranks[:, index] = rank_column(values[:, index])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(rank_into, range(values.shape[1])))
+        return ranks
+
+    def clear_cache(self):
+        with self.lock:
+            self.cache.clear()
+
+
+def rank_column(column):
+    """Average ranks (1-based, ties share their mean rank) of a 1-D array, NaN left as NaN."""
+    present = ~np.isnan(column)
+    present_values = column[present]
+    order = np.argsort(present_values, kind='mergesort')
+    sorted_values = present_values[order]
+    is_new = np.empty(len(sorted_values), dtype=bool)
+    is_new[:1] = True
+    np.not_equal(sorted_values[1:], sorted_values[:-1], out=is_new[1:])
+    starts = np.flatnonzero(is_new)
+    ends = np.append(starts[1:], len(sorted_values))
+    group_ranks = (starts + 1 + ends) / 2.0
+
+    ranked = np.empty(len(sorted_values))
+    ranked[order] = group_ranks[np.cumsum(is_new) - 1]
+    result = np.full(len(column), np.nan)
+    result[present] = ranked
+    return result
+
+
+def matrix_to_json(matrix):
+    """Convert a result matrix to nested lists with NaN replaced by None."""
+    values = matrix.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+# Shared engine used by the API endpoints
+correlation_engine = CorrelationEngine()
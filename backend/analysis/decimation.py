@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from analysis.resampling import detect_date_column
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+KINDS = ('line', 'ohlc')
+METHODS = ('lttb', 'minmax')
+DEFAULT_POINTS_PER_TILE = 1000
+OHLC_NAMES = ('open', 'high', 'low', 'close')
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: pick threshold points that keep the visual shape of a line.
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the point chosen in the
+    previous bucket and the average of the next one.
+
+    :return: Indices of the selected points, ascending
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    # Averages of every bucket up front, so the loop only does the argmax per bucket
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    average_x = np.append(sums_x / sizes, x[n - 1])
+    average_y = np.append(sums_y / sizes, y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_x, next_y = average_x[bucket + 1], average_y[bucket + 1]
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def min_max(y, buckets):
+    """Keep the minimum and maximum of each bucket, which preserves every spike of a dense line.
+
+    :return: Indices of the selected points, ascending
+    """
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    edges = np.floor(np.linspace(0, n, buckets + 1)).astype(np.int64)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    selected = []
+    for reduce in (np.minimum.reduceat, np.maximum.reduceat):
+        # First position in each bucket that holds the bucket's extreme
+        hits = np.flatnonzero(y == reduce(y, edges[:-1])[bucket_of])
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        selected.append(hits[first])
+    return np.unique(np.concatenate(selected))
+
+
+def ohlc_bars(x, open_, high, low, close, buckets):
+    """Merge consecutive bars into at most buckets bars: first open, highest high, lowest low, last close."""
+    n = len(x)
+    if n <= buckets:
+        return x, open_, high, low, close
+    edges = np.floor(np.linspace(0, n, buckets + 1)).astype(np.int64)[:-1]
+    lasts = np.append(edges[1:] - 1, n - 1)
+    return (x[edges], open_[edges], np.fmax.reduceat(high, edges), np.fmin.reduceat(low, edges), close[lasts])
+
+
+def sample_points(coordinates, labels, max_points=20000, bounds=None):
+    """Downsample points for a scatter plot, keeping one representative per occupied grid cell.
+
+    Sparse regions and outliers survive, which plain random sampling loses,
+    and each sample carries the number of points in its cell.
+    """
+    x = np.asarray(coordinates[:, 0])
+    y = np.asarray(coordinates[:, 1])
+    if bounds is not None:
+        x_min, y_min, x_max, y_max = bounds
+        inside = np.flatnonzero((x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max))
+    else:
+        inside = np.arange(len(x))
+        x_min, y_min, x_max, y_max = (x.min(), y.min(), x.max(), y.max()) if len(x) else (0, 0, 1, 1)
+    if len(inside) <= max_points:
+        return pd.DataFrame({'x': x[inside], 'y': y[inside], 'cluster': np.asarray(labels)[inside],
+                             'count': np.ones(len(inside), dtype=np.int64)})
+
+    side = max(1, int(np.sqrt(max_points)))
+    width = max(float(x_max - x_min), 1e-12) / side
+    height = max(float(y_max - y_min), 1e-12) / side
+    columns = np.clip(((x[inside] - x_min) / width).astype(np.int64), 0, side - 1)
+    rows = np.clip(((y[inside] - y_min) / height).astype(np.int64), 0, side - 1)
+    cells = rows * side + columns
+    # Shuffle before taking the first point per cell, so the representative is a random member
+    order = np.random.default_rng(0).permutation(len(inside))
+    _, first, counts = np.unique(cells[order], return_index=True, return_counts=True)
+    chosen = inside[order[first]]
+    return pd.DataFrame({'x': x[chosen], 'y': y[chosen], 'cluster': np.asarray(labels)[chosen], 'count': counts})
+
+
+class ChartSeries:
+    """A series sorted by x, as float64 arrays ready for slicing into tiles."""
+
+    def __init__(self, series_id, kind, x, values, x_column, x_is_time):
+        self.series_id = series_id
+        self.kind = kind
+        self.x = x
+        self.values = values
+        self.x_column = x_column
+        self.x_is_time = x_is_time
+
+    def describe(self, points_per_tile=DEFAULT_POINTS_PER_TILE):
+        rows = len(self.x)
+        return {
+            "series_id": self.series_id,
+            "kind": self.kind,
+            "rows": rows,
+            "x_column": self.x_column,
+            "columns": list(self.values),
+            "x_is_time": self.x_is_time,
+            "x_min": float(self.x[0]) if rows else 0.0,
+            "x_max": float(self.x[-1]) if rows else 0.0,
+            # Past this zoom level a tile holds fewer raw points than it may return
+            "max_zoom": max(0, math.ceil(math.log2(max(rows, 1) / points_per_tile))),
+        }
+
+
+class SeriesDecimator:
+    """Level-of-detail tiles for line and OHLC charts of millions of points.
+
+    The x range of a series is split into 2**zoom equal tiles per zoom
+    level, and each tile is decimated to a fixed number of points (LTTB or
+    min-max for lines, merged bars for OHLC). A client asks only for the
+    tiles covering its viewport at the zoom level matching it, so the points
+    drawn stay roughly constant however far it zooms in. Prepared series
+    and decimated tiles are cached per dataset version.
+    """
+
+    def __init__(self, series_cache_size=16, tile_cache_size=4096):
+        self.series = OrderedDict()
+        self.tiles_cache = OrderedDict()
+        self.series_cache_size = series_cache_size
+        self.tile_cache_size = tile_cache_size
+        self.lock = threading.Lock()
+
+    def prepare(self, data_frame, x_column=None, columns=None, kind='line', version=None):
+        """Sort and convert a series for tiling and return its description with the series_id.
+
+        :param x_column: Column for the x axis; the datetime column, or else the row number, by default
+        :param columns: y columns for lines, or the open/high/low/close columns for OHLC (found by name by default)
+        :param version: Identifies the dataset version; the prepared series is reused for the same version
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unsupported chart kind: {kind}")
+        if x_column is None:
+            x_column = detect_date_column(data_frame)
+        if kind == 'ohlc' and not columns:
+            lookup = {str(column).lower(): column for column in data_frame.columns}
+            if not all(name in lookup for name in OHLC_NAMES):
+                raise ValueError("OHLC charts need open, high, low and close columns.")
+            columns = [lookup[name] for name in OHLC_NAMES]
+        if kind == 'ohlc' and len(columns) != 4:
+            raise ValueError("OHLC charts need exactly four columns: open, high, low, close.")
+        if not columns:
+            columns = [column for column in data_frame.select_dtypes(include='number').columns if column != x_column]
+        missing = [column for column in [x_column, *columns] if column is not None and column not in data_frame.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        if not columns:
+            raise ValueError("No numeric columns to plot.")
+
+        series_id = None
+        if version is not None:
+            key = json.dumps([version, x_column, columns, kind], default=str)
+            series_id = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+            with self.lock:
+                if series_id in self.series:
+                    self.series.move_to_end(series_id)
+                    return self.series[series_id].describe()
+
+        x, x_is_time = self.x_values(data_frame, x_column)
+        values = {str(column): pd.to_numeric(data_frame[column], errors='coerce').to_numpy(dtype=np.float64)
+                  for column in columns}
+        keep = ~np.isnan(x)
+        order = np.argsort(x[keep], kind='stable')
+        x = x[keep][order]
+        values = {column: array[keep][order] for column, array in values.items()}
+
+        series_id = series_id or uuid.uuid4().hex[:20]
+        series = ChartSeries(series_id, kind, x, values, None if x_column is None else str(x_column), x_is_time)
+        with self.lock:
+            self.series[series_id] = series
+            while len(self.series) > self.series_cache_size:
+                self.series.popitem(last=False)
+        logger.info(f"Prepared {kind} series {series_id} with {len(x)} points")
+        return series.describe()
+
+    @staticmethod
+    def x_values(data_frame, x_column):
+        """x as float64: seconds since the epoch for datetimes, row numbers when there is no x column."""
+        if x_column is None:
+            return np.arange(len(data_frame), dtype=np.float64), False
+        values = data_frame[x_column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan), False
+        # utc=True copes with mixed offsets, e.g. daylight saving changes in market data
+        times = pd.to_datetime(values.astype(str) if isinstance(values.dtype, pd.CategoricalDtype) else values,
+                               utc=True, errors='coerce', format='mixed')
+        nanoseconds = times.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+        nanoseconds[times.isna().to_numpy()] = np.nan
+        return nanoseconds / 1e9, True
+
+    def describe(self, series_id, points_per_tile=DEFAULT_POINTS_PER_TILE):
+        with self.lock:
+            return self.series[series_id].describe(points_per_tile)
+
+    def tiles(self, series_id, zoom, indices, points_per_tile=DEFAULT_POINTS_PER_TILE, method='lttb'):
+        """Decimated tiles of a series at one zoom level; KeyError when the series is unknown."""
+        if method not in METHODS:
+            raise ValueError(f"Unsupported decimation method: {method}")
+        if zoom < 0 or zoom > 40:
+            raise ValueError("zoom must be between 0 and 40.")
+        if points_per_tile < 4:
+            raise ValueError("points_per_tile must be at least 4.")
+        with self.lock:
+            series = self.series[series_id]
+            self.series.move_to_end(series_id)
+        result = []
+        for index in indices:
+            key = (series_id, zoom, index, points_per_tile, method)
+            with self.lock:
+                tile = self.tiles_cache.get(key)
+                if tile is not None:
+                    self.tiles_cache.move_to_end(key)
+            if tile is None:
+                tile = self.build_tile(series, zoom, index, points_per_tile, method)
+                with self.lock:
+                    self.tiles_cache[key] = tile
+                    while len(self.tiles_cache) > self.tile_cache_size:
+                        self.tiles_cache.popitem(last=False)
+            result.append(tile)
+        return result
+
+    @staticmethod
+    def build_tile(series, zoom, index, points_per_tile, method):
+        count = 2 ** zoom
+        if not 0 <= index < count:
+            raise ValueError(f"Tile index {index} is outside zoom level {zoom}.")
+        x = series.x
+        if len(x):
+            width = (x[-1] - x[0]) / count
+            x_min = x[0] + index * width
+            x_max = x[-1] if index == count - 1 else x[0] + (index + 1) * width
+        else:
+            x_min = x_max = 0.0
+        start = int(np.searchsorted(x, x_min, side='left'))
+        stop = int(np.searchsorted(x, x_max, side='right' if index == count - 1 else 'left'))
+        tile = {"zoom": zoom, "index": index, "x_min": float(x_min), "x_max": float(x_max), "raw_points": stop - start}
+
+        if series.kind == 'ohlc':
+            bars = ohlc_bars(x[start:stop], *(series.values[column][start:stop] for column in series.values),
+                             points_per_tile)
+            tile["x"] = bars[0].tolist()
+            tile["values"] = {name: [None if np.isnan(value) else value for value in bar.tolist()]
+                              for name, bar in zip(OHLC_NAMES, bars[1:])}
+            return tile
+
+        # Lines reach one point past each edge so that neighbouring tiles join up
+        start, stop = max(start - 1, 0), min(stop + 1, len(x))
+        tile["lines"] = {}
+        for column, values in series.values.items():
+            tile_x, tile_y = x[start:stop], values[start:stop]
+            present = ~np.isnan(tile_y)
+            tile_x, tile_y = tile_x[present], tile_y[present]
+            selected = lttb(tile_x, tile_y, points_per_tile) if method == 'lttb' else min_max(tile_y, points_per_tile // 2)
+            tile["lines"][column] = {"x": tile_x[selected].tolist(), "y": tile_y[selected].tolist()}
+        return tile
+
+    def clear_cache(self):
+        with self.lock:
+            self.series.clear()
+            self.tiles_cache.clear()
+
+
+# Shared decimator used by the API endpoints
+series_decimator = SeriesDecimator()
@@ -0,0 +1,173 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('rolling_mean', 'rolling_median', 'linear', 'time', 'ffill', 'bfill')
+# Rows impute_chunks holds back waiting for a later observed value before flushing them as they are
+DEFAULT_MAX_PENDING = 100000
+
+
+class MissingValueImputer:
+    """Fills missing values column by column with vectorised NumPy/pandas operations.
+
+    Strategies:
+      rolling_mean / rolling_median: centred window of `window` rows around
+          each gap (the notebook used 5 before and 5 after, i.e. window=11)
+      linear / time: interpolation by position or by a datetime index
+      ffill / bfill: carry the previous / next observed value
+
+    Only missing cells are replaced; observed values are never changed.
+    Columns are imputed in parallel, and impute_chunks streams over chunked
+    input while keeping enough overlap that results match a single pass.
+    """
+
+    def __init__(self, strategy='rolling_mean', window=11, max_workers=None, max_pending=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unsupported imputation strategy: {strategy}")
+        self.strategy = strategy
+        self.window = max(1, int(window))
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.max_pending = max_pending or DEFAULT_MAX_PENDING
+
+    def impute(self, data_frame, columns=None, date_column=None):
+        """Return a copy of data_frame with missing values filled in the numeric (or given) columns.
+
+        The 'time' strategy interpolates against date_column, or against the
+        frame's index when it is already a DatetimeIndex.
+        """
+        columns = list(columns) if columns else list(data_frame.select_dtypes(include='number').columns)
+        result = data_frame.copy()
+        index = None
+        if self.strategy == 'time':
+            if date_column is not None:
+                index = pd.DatetimeIndex(pd.to_datetime(data_frame[date_column], utc=True, format='mixed'))
+            elif isinstance(data_frame.index, pd.DatetimeIndex):
+                index = data_frame.index
+            else:
+                raise ValueError("Time interpolation needs a date_column or a DatetimeIndex.")
+
+        def fill(column):
+            return column, self.impute_array(data_frame[column].to_numpy(dtype=np.float64, na_value=np.nan), index)
+
+        if len(columns) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                filled = list(executor.map(fill, columns))
+        else:
+            filled = [fill(column) for column in columns]
+        for column, values in filled:
+            result[column] = values
+        return result
+
+    def impute_array(self, values, index=None):
+        """Fill the NaNs of one column held as a 1-D float array."""
+        missing = np.isnan(values)
+        if not missing.any():
+            return values
+        series = pd.Series(values, index=index)
+
+        if self.strategy == 'rolling_mean':
+            filled = series.rolling(self.window, center=True, min_periods=1).mean()
+        elif self.strategy == 'rolling_median':
+            filled = series.rolling(self.window, center=True, min_periods=1).median()
+        elif self.strategy == 'linear':
+            filled = series.interpolate(method='linear', limit_area='inside')
+        elif self.strategy == 'time':
+            filled = series.interpolate(method='time', limit_area='inside')
+        elif self.strategy == 'ffill':
+            filled = series.ffill()
+        else:
+            filled = series.bfill()
+
+        result = values.copy()
+        result[missing] = filled.to_numpy()[missing]
+        return result
+
+    def impute_chunks(self, chunks, columns=None, date_column=None):
+        """Impute a stream of DataFrame chunks, yielding imputed chunks in order.
+
+        Rolling strategies carry window // 2 raw rows of context on each side
+        of a chunk boundary. Interpolation and backward fill need the next
+        observed value, so each column is final up to its own last observed
+        value (interpolation also leaves a column's leading gap as it is), and
+        rows are emitted once every column is final; the others are held back
+        until a later chunk supplies the values. Once more than max_pending
+        rows are held back they are flushed as they are, the open gaps staying
+        missing as at the end of the input. Forward fill carries the last
+        filled row. Apart from such flushed gaps the output matches imputing
+        the whole input at once.
+        """
+        context = None       # rows already emitted, kept as left-hand context
+        pending = []         # raw chunks not emitted yet
+        pending_rows = 0
+        last_observed = None  # per column: position in pending of its last observed value, or -1
+        seen = None           # per column: whether any value was observed so far
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.select_dtypes(include='number').columns)
+            observed = chunk[columns].notna().to_numpy()
+            present = observed.any(axis=0)
+            last = pending_rows + len(chunk) - 1 - np.argmax(observed[::-1], axis=0)
+            if last_observed is None:
+                last_observed, seen = np.full(len(columns), -1), np.zeros(len(columns), dtype=bool)
+            last_observed = np.where(present, last, last_observed)
+            seen |= present
+            pending.append(chunk)
+            pending_rows += len(chunk)
+
+            ready = self.ready_rows(pending_rows, last_observed, seen)
+            if pending_rows - ready > self.max_pending:
+                ready = pending_rows
+            if ready == 0:
+                continue
+            # Held back rows are bounded by max_pending, so joining them stays linear overall
+            raw = pending[0] if len(pending) == 1 else pd.concat(pending)
+            offset = 0 if context is None else len(context)
+            combined = raw if context is None else pd.concat([context, raw])
+            emitted = self.impute(combined, columns, date_column).iloc[offset:offset + ready]
+            yield emitted
+
+            context = self.next_context(context, raw.iloc[:ready], emitted)
+            rest = raw.iloc[ready:]
+            pending = [rest] if len(rest) else []
+            pending_rows = len(rest)
+            last_observed = np.maximum(last_observed - ready, -1)
+
+        if pending:
+            raw = pd.concat(pending)
+            offset = 0 if context is None else len(context)
+            combined = raw if context is None else pd.concat([context, raw])
+            yield self.impute(combined, columns, date_column).iloc[offset:]
+
+    def ready_rows(self, pending_rows, last_observed, seen):
+        """How many leading pending rows can be finalised with the data seen so far."""
+        if self.strategy in ('rolling_mean', 'rolling_median'):
+            return max(0, pending_rows - self.window // 2)
+        if self.strategy == 'ffill' or not len(last_observed):
+            return pending_rows
+        final = last_observed + 1
+        if self.strategy in ('linear', 'time'):
+            # Without an earlier observed value a gap is not interpolated, whatever follows
+            final = np.where(seen, final, pending_rows)
+        return int(final.min())
+
+    def next_context(self, context, raw_emitted, imputed_emitted):
+        """Rows to keep in front of the next chunk."""
+        if self.strategy == 'ffill':
+            # The last filled row carries every column's last observed value forward
+            return imputed_emitted.iloc[-1:]
+        if self.strategy in ('rolling_mean', 'rolling_median'):
+            half = self.window // 2
+            if half == 0:
+                return None
+            history = raw_emitted if context is None else pd.concat([context, raw_emitted])
+            return history.iloc[-half:]
+        # Emitted cells were either observed or filled from both sides, so the last filled row
+        # anchors interpolation exactly as the observed values around it would
+        return imputed_emitted.iloc[-1:]
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.cluster import Birch, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+from analysis.decimation import sample_points
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.projection_cache')
+# Randomized PCA needs the whole scaled matrix in memory; beyond this, use incremental PCA
+DEFAULT_MAX_IN_MEMORY_BYTES = 1024 * 1024 * 1024
+REDUCERS = ('pca', 'randomized_pca')
+CLUSTERERS = ('kmeans', 'birch')
+
+
+def prefetch(chunks, depth=2):
+    """Read the next chunks on a background thread while the current one is being processed."""
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    threading.Thread(target=produce, name='prefetch', daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class ProjectionEngine:
+    """Out-of-core 2-D projection and clustering over a stream of DataFrame chunks.
+
+    The data is never held as one matrix. A first pass fits the scaler,
+    a second fits incremental PCA and mini-batch k-means (or Birch) with
+    partial_fit, and a third writes float32 coordinates and cluster labels
+    straight into .npy files. Chunk parsing runs ahead on a background
+    thread, and the final transform runs on a thread pool. Results are keyed
+    by dataset version and parameters, and served as memory maps, so
+    Visualisation can sample millions of points per viewport cheaply.
+    """
+
+    def __init__(self, cache_dir=None, max_workers=None, max_in_memory_bytes=None, cache_size=8):
+        self.cache_dir = cache_dir or os.environ.get('PROJECTION_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.max_in_memory_bytes = max_in_memory_bytes or int(os.environ.get('PROJECTION_MAX_IN_MEMORY_BYTES',
+                                                                             DEFAULT_MAX_IN_MEMORY_BYTES))
+        self.loaded = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def path(self, projection_id, suffix):
+        return os.path.join(self.cache_dir, f"{os.path.basename(projection_id)}.{suffix}")
+
+    def project(self, chunk_source, columns=None, method='pca', clusters=None, cluster_method='kmeans',
+                version=None, progress=None):
+        """Project a dataset to two dimensions and optionally cluster it.
+
+        :param chunk_source: Callable returning a fresh iterator of DataFrame chunks; it is called once per pass
+        :param columns: Numeric columns to use; all numeric columns of the first chunk by default
+        :param method: 'pca' (incremental, out-of-core) or 'randomized_pca' (in memory, within a byte budget)
+        :param clusters: Number of clusters, or None to skip clustering
+        :param version: Identifies the dataset version; results for the same version and parameters are reused
+        :return: Metadata of the projection, including the projection_id used to fetch points
+        """
+        progress = progress or (lambda fraction, message='': None)
+        if method not in REDUCERS:
+            raise ValueError(f"Unsupported projection method: {method}")
+        if clusters is not None and cluster_method not in CLUSTERERS:
+            raise ValueError(f"Unsupported clustering method: {cluster_method}")
+        if clusters is not None and clusters < 2:
+            raise ValueError("clusters must be at least 2.")
+
+        parameters = [columns, method, clusters, cluster_method if clusters else None]
+        if version is not None:
+            projection_id = hashlib.sha1(json.dumps([version, parameters], default=str).encode('utf-8')).hexdigest()[:20]
+            cached = self.metadata(projection_id)
+            if cached is not None:
+                logger.info(f"Serving projection {projection_id} from cache")
+                return cached
+        else:
+            projection_id = uuid.uuid4().hex[:20]
+
+        # Pass 1: column selection, row count and scaling statistics
+        scaler = StandardScaler()
+        rows = 0
+        for chunk in prefetch(chunk_source()):
+            if columns is None:
+                columns = list(chunk.select_dtypes(include='number').columns)
+                if len(columns) < 2:
+                    raise ValueError("At least two numeric columns are needed for a 2-D projection.")
+            matrix = self.matrix(chunk, columns)
+            if len(matrix):
+                scaler.partial_fit(matrix)
+                rows += len(matrix)
+        if rows < 2:
+            raise ValueError("Not enough rows to project.")
+        if clusters is not None and clusters > rows:
+            raise ValueError("clusters cannot exceed the number of rows.")
+        progress(0.2, f"Scanned {rows} rows")
+
+        # Pass 2: fit the reducer and the clusterer chunk by chunk
+        reducer, clusterer = None, None
+        if clusters is not None:
+            clusterer = (MiniBatchKMeans(n_clusters=clusters, random_state=0, n_init=3) if cluster_method == 'kmeans'
+                         else Birch(n_clusters=clusters))
+        if method == 'randomized_pca':
+            if rows * len(columns) * 4 > self.max_in_memory_bytes:
+                raise ValueError("Dataset is too large for randomized PCA in memory; use method 'pca'.")
+            scaled = np.concatenate([self.scale(scaler, self.matrix(chunk, columns)) for chunk in prefetch(chunk_source())])
+            reducer = PCA(n_components=2, svd_solver='randomized', random_state=0).fit(scaled)
+            if clusterer is not None:
+                clusterer.fit(scaled)
+            del scaled
+        else:
+            reducer = IncrementalPCA(n_components=2)
+            # partial_fit needs at least n_components rows per call, and k-means n_clusters rows on the first call
+            minimum = max(2, clusters or 0)
+            carry = None
+            for chunk in prefetch(chunk_source()):
+                scaled = self.scale(scaler, self.matrix(chunk, columns))
+                if carry is not None:
+                    scaled, carry = np.concatenate([carry, scaled]), None
+                if len(scaled) < minimum:
+                    carry = scaled
+                    continue
+                reducer.partial_fit(scaled)
+                if clusterer is not None:
+                    clusterer.partial_fit(scaled)
+            if carry is not None and len(carry):
+                # Either later rows of a fitted model, or every row when all chunks were small
+                if len(carry) >= 2:
+                    reducer.partial_fit(carry)
+                if clusterer is not None:
+                    clusterer.partial_fit(carry)
+        progress(0.6, "Fitted projection")
+
+        # Pass 3: transform on a thread pool and write float32 results straight to disk
+        os.makedirs(self.cache_dir, exist_ok=True)
+        coordinates_path = self.path(projection_id, 'coords.npy')
+        labels_path = self.path(projection_id, 'labels.npy')
+        coordinates = np.lib.format.open_memmap(f"{coordinates_path}.tmp", mode='w+', dtype=np.float32, shape=(rows, 2))
+        labels = np.lib.format.open_memmap(f"{labels_path}.tmp", mode='w+', dtype=np.int32, shape=(rows,))
+        labels[:] = -1
+
+        def transform(matrix):
+            scaled = self.scale(scaler, matrix)
+            return (reducer.transform(scaled).astype(np.float32),
+                    None if clusterer is None else clusterer.predict(scaled).astype(np.int32))
+
+        offset = 0
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def drain(limit):
+                nonlocal offset
+                while len(pending) > limit:
+                    projected, predicted = pending.popleft().result()
+                    coordinates[offset:offset + len(projected)] = projected
+                    if predicted is not None:
+                        labels[offset:offset + len(predicted)] = predicted
+                    offset += len(projected)
+                    progress(0.6 + 0.35 * offset / rows, f"Projected {offset}/{rows} rows")
+
+            for chunk in prefetch(chunk_source()):
+                matrix = self.matrix(chunk, columns)
+                if len(matrix):
+                    pending.append(executor.submit(transform, matrix))
+                # Keep a bounded number of chunks in flight
+                drain(2 * self.max_workers)
+            drain(0)
+        coordinates.flush()
+        labels.flush()
+        del coordinates, labels
+        os.replace(f"{coordinates_path}.tmp", coordinates_path)
+        os.replace(f"{labels_path}.tmp", labels_path)
+
+        coordinates, labels = self.load(projection_id)
+        metadata = {
+            "projection_id": projection_id,
+            "rows": rows,
+            "columns": columns,
+            "method": method,
+            "explained_variance_ratio": [float(value) for value in reducer.explained_variance_ratio_],
+            "components": {column: [float(value) for value in reducer.components_[:, index]]
+                           for index, column in enumerate(columns)},
+            "bounds": [float(value) for value in (*coordinates.min(axis=0), *coordinates.max(axis=0))],
+            "clusters": None,
+        }
+        if clusterer is not None:
+            sizes = np.bincount(labels, minlength=clusters)
+            centers = np.zeros((clusters, 2))
+            np.add.at(centers, labels, coordinates)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                centers = centers / sizes[:, None]
+            metadata["clusters"] = [{"cluster": index, "size": int(sizes[index]),
+                                     "x": None if sizes[index] == 0 else float(centers[index, 0]),
+                                     "y": None if sizes[index] == 0 else float(centers[index, 1])}
+                                    for index in range(clusters)]
+        with open(self.path(projection_id, 'json'), 'w', encoding='utf-8') as file:
+            json.dump(metadata, file)
+        logger.info(f"Projected {rows} rows into projection {projection_id}")
+        return metadata
+
+    @staticmethod
+    def matrix(chunk, columns):
+        missing = [column for column in columns if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        return chunk[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+
+    @staticmethod
+    def scale(scaler, matrix):
+        """Standardise a float32 block; missing values become the column mean (zero after scaling)."""
+        scaled = scaler.transform(matrix).astype(np.float32, copy=False)
+        return np.nan_to_num(scaled, copy=False)
+
+    def metadata(self, projection_id):
+        try:
+            with open(self.path(projection_id, 'json'), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, projection_id):
+        """Memory-map the coordinates and labels of a projection."""
+        with self.lock:
+            if projection_id in self.loaded:
+                self.loaded.move_to_end(projection_id)
+                return self.loaded[projection_id]
+        if not os.path.exists(self.path(projection_id, 'coords.npy')):
+            raise KeyError(projection_id)
+        arrays = (np.load(self.path(projection_id, 'coords.npy'), mmap_mode='r'),
+                  np.load(self.path(projection_id, 'labels.npy'), mmap_mode='r'))
+        with self.lock:
+            self.loaded[projection_id] = arrays
+            while len(self.loaded) > self.cache_size:
+                self.loaded.popitem(last=False)
+        return arrays
+
+    def points(self, projection_id, max_points=20000, bounds=None):
+        """Sample the points of a projection inside bounds for plotting.
+
+        :param bounds: (x_min, y_min, x_max, y_max) viewport, or None for everything
+        :return: DataFrame with x, y, cluster and count, where count is how many points each sample stands for
+        """
+        coordinates, labels = self.load(projection_id)
+        return sample_points(coordinates, labels, max_points, bounds)
+
+
+# Shared engine used by the API endpoints
+projection_engine = ProjectionEngine()
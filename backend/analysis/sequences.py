@@ -0,0 +1,263 @@
+import heapq
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from utils.shared_arrays import pool_context, shared_arrays, open_shared
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Upper bound on the candidate positions expanded at once while counting extensions
+BLOCK_POSITIONS = 4_000_000
+
+
+class SequenceDatabase:
+    """Event sequences in CSR layout: one flat array of item ids and the offset where each sequence starts.
+
+    Built incrementally from DataFrame chunks (file chunks, SQL batches) with
+    one row per event, so the whole log never has to be held as Python
+    objects. Events are ordered by order_column within each sequence, or kept
+    in arrival order when no order column is given.
+    """
+
+    def __init__(self, sequence_column, item_column, order_column=None):
+        self.sequence_column = sequence_column
+        self.item_column = item_column
+        self.order_column = order_column
+        self.sequence_ids = {}
+        self.item_ids = {}
+        self.parts = []
+        self.items = None
+        self.starts = None
+        self.labels = None
+
+    def add_chunk(self, chunk):
+        """Append the events of a DataFrame chunk."""
+        columns = [self.sequence_column, self.item_column] + ([self.order_column] if self.order_column else [])
+        missing = [column for column in columns if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        events = chunk[columns].dropna(subset=[self.sequence_column, self.item_column])
+        sequences = self.encode(events[self.sequence_column], self.sequence_ids)
+        items = self.encode(events[self.item_column].astype(str), self.item_ids)
+        if self.order_column:
+            order = events[self.order_column]
+            if not pd.api.types.is_numeric_dtype(order):
+                order = pd.to_datetime(order, utc=True, errors='coerce', format='mixed').astype('int64')
+            order = order.to_numpy(dtype=np.float64)
+        else:
+            order = np.zeros(len(events))
+        self.parts.append((sequences, items, order))
+        return self
+
+    @staticmethod
+    def encode(values, mapping):
+        """Map values to dense integer ids, extending the mapping with unseen values."""
+        codes, uniques = pd.factorize(values)
+        lookup = np.array([mapping.setdefault(value, len(mapping)) for value in uniques], dtype=np.int32)
+        return lookup[codes] if len(codes) else np.array([], dtype=np.int32)
+
+    def finalize(self):
+        """Sort the collected events into sequences and build the CSR arrays."""
+        if self.parts:
+            sequences, items, order = (np.concatenate(part) for part in zip(*self.parts))
+        else:
+            sequences, items, order = np.array([], dtype=np.int32), np.array([], dtype=np.int32), np.array([])
+        self.parts = []
+        # lexsort is stable, so events with equal order keep their arrival order
+        index = np.lexsort((order, sequences))
+        self.items = items[index]
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(sequences, minlength=len(self.sequence_ids)))])
+        self.labels = list(self.item_ids)
+        logger.info(f"Built {len(self.sequence_ids)} sequences with {len(self.items)} events")
+        return self
+
+    @property
+    def count(self):
+        return len(self.starts) - 1
+
+
+# State shared with worker processes: set once per process by the pool initializer
+SHARED = {}
+
+
+def share_state(items, ends, min_count, max_gap, max_length):
+    SHARED.update(items=items, ends=ends, min_count=min_count, max_gap=max_gap, max_length=max_length)
+
+
+def share_mapped_state(items_path, ends_path, *state):
+    share_state(open_shared(items_path), open_shared(ends_path), *state)
+
+
+def extensions(sequences, positions, max_gap, all_embeddings):
+    """Count the items that can extend a projected database.
+
+    The projected database is pseudo-projected: pairs of (sequence, position
+    of the last matched event) into the shared item array, never copies of
+    the suffixes. Candidate positions are expanded block by block, at most
+    max_gap events after each position. Under a gap constraint every
+    embedding must be kept (all_embeddings), since a later occurrence of the
+    prefix may satisfy the gap when the first one does not; without it only
+    the earliest occurrence per sequence matters.
+
+    :return: (item ids, supports, projections) for the frequent extensions
+    """
+    items, ends, min_count = SHARED['items'], SHARED['ends'], SHARED['min_count']
+    low = positions + 1
+    high = ends[sequences] if max_gap is None else np.minimum(ends[sequences], low + max_gap)
+    lengths = np.maximum(high - low, 0)
+    cumulative = np.cumsum(lengths)
+
+    found_items, found_sequences, found_positions = [], [], []
+    start = 0
+    while start < len(lengths):
+        before = cumulative[start] - lengths[start]
+        end = max(start + 1, int(np.searchsorted(cumulative, before + BLOCK_POSITIONS, side='right')))
+        block_lengths = lengths[start:end]
+        total = int(block_lengths.sum())
+        if total:
+            firsts = np.cumsum(block_lengths) - block_lengths
+            candidate = np.repeat(low[start:end], block_lengths) + (np.arange(total) - np.repeat(firsts, block_lengths))
+            candidate_items = items[candidate]
+            valid = candidate_items >= 0
+            found_items.append(candidate_items[valid])
+            found_sequences.append(np.repeat(sequences[start:end], block_lengths)[valid])
+            found_positions.append(candidate[valid])
+        start = end
+    if not found_items:
+        return [], [], []
+
+    found_items = np.concatenate(found_items)
+    found_sequences = np.concatenate(found_sequences)
+    found_positions = np.concatenate(found_positions)
+    order = np.lexsort((found_positions, found_sequences, found_items))
+    found_items, found_sequences, found_positions = found_items[order], found_sequences[order], found_positions[order]
+
+    # First embedding of each (item, sequence); overlapping gap windows can repeat an embedding
+    changed = np.r_[True, (found_items[1:] != found_items[:-1]) | (found_sequences[1:] != found_sequences[:-1])]
+    support = np.bincount(found_items[changed])
+    if not all_embeddings:
+        keep = changed
+    else:
+        keep = changed | np.r_[True, found_positions[1:] != found_positions[:-1]]
+    found_items, found_sequences, found_positions = found_items[keep], found_sequences[keep], found_positions[keep]
+
+    frequent = np.flatnonzero(support >= min_count)
+    bounds = np.searchsorted(found_items, np.r_[frequent, frequent + 1].reshape(2, -1))
+    projections = [(found_sequences[first:last], found_positions[first:last]) for first, last in bounds.T]
+    return frequent, support[frequent], projections
+
+
+def grow(prefix, sequences, positions, results):
+    """Depth-first PrefixSpan step: record and recurse into every frequent extension of prefix."""
+    max_length = SHARED['max_length']
+    if max_length is not None and len(prefix) >= max_length:
+        return
+    max_gap = SHARED['max_gap']
+    items, supports, projections = extensions(sequences, positions, max_gap, max_gap is not None)
+    for item, support, (item_sequences, item_positions) in zip(items, supports, projections):
+        pattern = prefix + (int(item),)
+        results.append((pattern, int(support)))
+        grow(pattern, item_sequences, item_positions, results)
+
+
+def mine_prefix(item, sequences, positions):
+    """Mine every pattern that starts with item, given its projected database."""
+    results = []
+    grow((int(item),), sequences, positions, results)
+    return results
+
+
+class SequentialPatternMiner:
+    """PrefixSpan over a pseudo-projected SequenceDatabase.
+
+    Items below min_support are pruned before mining: without a gap
+    constraint they are removed from the sequences, with one they are masked
+    so gaps are still measured in events. Patterns are grown depth first,
+    so only the projections along the current prefix are alive at a time,
+    and the subtrees of the frequent first items run in worker processes.
+
+    :param max_gap: Maximum number of events between consecutive pattern items (1 = adjacent)
+    :param max_length: Maximum number of items in a pattern
+    """
+
+    def __init__(self, min_support=0.01, max_gap=None, max_length=None, top_k=100, max_workers=None):
+        if not 0 < min_support <= 1:
+            raise ValueError("min_support must be in (0, 1].")
+        if max_gap is not None and max_gap < 1:
+            raise ValueError("max_gap must be at least 1.")
+        if max_length is not None and max_length < 1:
+            raise ValueError("max_length must be at least 1.")
+        self.min_support = min_support
+        self.max_gap = max_gap
+        self.max_length = max_length
+        self.top_k = top_k
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def mine(self, database, progress=None):
+        """Mine frequent sequential patterns; returns a JSON-friendly dict with the top_k by support."""
+        progress = progress or (lambda fraction, message='': None)
+        patterns = self.frequent_patterns(database, progress)
+        top = heapq.nlargest(self.top_k, patterns.items(), key=lambda entry: (entry[1], len(entry[0])))
+        logger.info(f"Found {len(patterns)} frequent sequential patterns")
+        return {
+            "sequences": database.count,
+            "events": int(len(database.items)),
+            "frequent_patterns": len(patterns),
+            "patterns": [{"pattern": [database.labels[item] for item in pattern], "length": len(pattern),
+                          "count": count, "support": count / database.count} for pattern, count in top],
+        }
+
+    def frequent_patterns(self, database, progress=None):
+        """Map each frequent pattern (tuple of item ids) to the number of sequences containing it."""
+        progress = progress or (lambda fraction, message='': None)
+        if database.count == 0 or len(database.items) == 0:
+            return {}
+        min_count = max(1, math.ceil(self.min_support * database.count))
+        items, starts = self.prune(database, min_count)
+        sequences = np.arange(len(starts) - 1)
+        state = (items, starts[1:], min_count, self.max_gap, self.max_length)
+
+        # The first item may occur anywhere in a sequence; gaps only apply between pattern items
+        share_state(*state)
+        try:
+            firsts, supports, projections = extensions(sequences, starts[:-1] - 1, None, self.max_gap is not None)
+            patterns = {(int(item),): int(support) for item, support in zip(firsts, supports)}
+            progress(0.1, f"{len(firsts)} frequent items")
+            if self.max_length == 1 or not len(firsts):
+                return patterns
+
+            if self.max_workers > 1 and len(firsts) > 1:
+                # The workers map the event arrays from files rather than each unpickling a copy
+                with shared_arrays(*state[:2]) as paths, \
+                        ProcessPoolExecutor(max_workers=self.max_workers, mp_context=pool_context(),
+                                            initializer=share_mapped_state, initargs=(*paths, *state[2:])) as executor:
+                    futures = [executor.submit(mine_prefix, item, *projection)
+                               for item, projection in zip(firsts, projections)]
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        patterns.update(future.result())
+                        progress(0.1 + 0.9 * done / len(futures), f"Mined {done}/{len(futures)} prefixes")
+            else:
+                for done, (item, projection) in enumerate(zip(firsts, projections), start=1):
+                    patterns.update(mine_prefix(item, *projection))
+                    progress(0.1 + 0.9 * done / len(firsts), f"Mined {done}/{len(firsts)} prefixes")
+        finally:
+            SHARED.clear()
+        return patterns
+
+    def prune(self, database, min_count):
+        """Drop (or, under a gap constraint, mask with -1) events whose item is not frequent."""
+        lengths = np.diff(database.starts)
+        sequence_of_event = np.repeat(np.arange(database.count), lengths)
+        pairs = np.unique(sequence_of_event.astype(np.int64) * len(database.labels) + database.items)
+        support = np.bincount(pairs % len(database.labels), minlength=len(database.labels))
+        frequent = support[database.items] >= min_count
+        if self.max_gap is not None:
+            return np.where(frequent, database.items, -1), database.starts
+        kept = np.bincount(sequence_of_event[frequent], minlength=database.count)
+        return database.items[frequent], np.concatenate([[0], np.cumsum(kept)])
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import (HistGradientBoostingClassifier, HistGradientBoostingRegressor, RandomForestClassifier,
+                              RandomForestRegressor)
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, LogisticRegression, Ridge
+from sklearn.model_selection import GridSearchCV, KFold, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.models')
+MAX_CATEGORIES = 50
+MAX_SHARED_ARRAYS = 8
+
+MODELS = {
+    'regression': {
+        'linear': lambda: LinearRegression(),
+        'ridge': lambda: Ridge(),
+        'lasso': lambda: Lasso(max_iter=10000),
+        'elastic_net': lambda: ElasticNet(max_iter=10000),
+        'decision_tree': lambda: DecisionTreeRegressor(random_state=0),
+        'random_forest': lambda: RandomForestRegressor(n_estimators=100, random_state=0),
+        'gradient_boosting': lambda: HistGradientBoostingRegressor(random_state=0),
+    },
+    'classification': {
+        'logistic': lambda: LogisticRegression(max_iter=1000),
+        'decision_tree': lambda: DecisionTreeClassifier(random_state=0),
+        'random_forest': lambda: RandomForestClassifier(n_estimators=100, random_state=0),
+        'gradient_boosting': lambda: HistGradientBoostingClassifier(random_state=0),
+    },
+}
+# Models that need standardised inputs
+LINEAR_MODELS = ('linear', 'ridge', 'lasso', 'elastic_net', 'logistic')
+
+DEFAULT_GRIDS = {
+    'ridge': {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0]},
+    'lasso': {'alpha': [0.0001, 0.001, 0.01, 0.1, 1.0]},
+    'elastic_net': {'alpha': [0.001, 0.01, 0.1, 1.0], 'l1_ratio': [0.2, 0.5, 0.8]},
+    'logistic': {'C': [0.01, 0.1, 1.0, 10.0]},
+    'decision_tree': {'max_depth': [3, 5, 10, None]},
+    'random_forest': {'max_depth': [None, 10], 'min_samples_leaf': [1, 5]},
+    'gradient_boosting': {'learning_rate': [0.05, 0.1], 'max_leaf_nodes': [15, 31]},
+}
+
+SCORING = {
+    'regression': {'r2': 'r2', 'mae': 'neg_mean_absolute_error', 'rmse': 'neg_root_mean_squared_error'},
+    'classification': {'accuracy': 'accuracy', 'f1_macro': 'f1_macro'},
+}
+
+
+def encode_features(data_frame, features, categories=None):
+    """Build a float32 feature matrix; categorical columns are one-hot encoded.
+
+    :param categories: Levels per categorical column from training; when given, the
+        same columns are produced so a fitted model can score new data
+    :return: (matrix, feature names, categories)
+    """
+    missing = [column for column in features if column not in data_frame.columns]
+    if missing:
+        raise ValueError(f"Unknown columns: {', '.join(missing)}")
+    if categories is None:
+        categories = {}
+        for column in features:
+            values = data_frame[column]
+            if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                levels = values.dropna().astype(str).unique()
+                if len(levels) > MAX_CATEGORIES:
+                    raise ValueError(f"Column {column} has too many categories ({len(levels)}) to encode.")
+                categories[column] = sorted(levels)
+
+    blocks, names = [], []
+    for column in features:
+        values = data_frame[column]
+        if column in categories:
+            text = values.astype(str).where(values.notna())
+            for level in categories[column]:
+                blocks.append((text == level).to_numpy(dtype=np.float32))
+                names.append(f"{column}={level}")
+        else:
+            blocks.append(pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan))
+            names.append(column)
+    matrix = np.column_stack(blocks) if blocks else np.empty((len(data_frame), 0), dtype=np.float32)
+    return matrix, names, categories
+
+
+def default_features(data_frame, target):
+    """Every numeric column plus the categorical columns with few enough levels, except the target."""
+    features = []
+    for column in data_frame.columns:
+        if column == target:
+            continue
+        values = data_frame[column]
+        if pd.api.types.is_numeric_dtype(values) or values.nunique(dropna=True) <= MAX_CATEGORIES:
+            features.append(column)
+    return features
+
+
+class ModelTrainer:
+    """Fits, cross-validates, persists and re-scores scikit-learn models on server-side datasets.
+
+    The feature matrix is dumped once per content hash and reopened as a
+    read-only memory map, so the parallel grid-search workers (joblib) share
+    the pages instead of each receiving a pickled copy. Every (fold,
+    parameter) fit runs as its own task across n_jobs cores. Fitted pipelines
+    are saved with joblib and kept in a small in-memory LRU for re-scoring.
+    """
+
+    def __init__(self, model_dir=None, n_jobs=None, cache_size=8):
+        self.model_dir = model_dir or os.environ.get('MODEL_DIR', DEFAULT_MODEL_DIR)
+        self.array_dir = os.path.join(self.model_dir, 'arrays')
+        self.n_jobs = n_jobs or int(os.environ.get('TRAINING_N_JOBS', -1))
+        self.loaded = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def train(self, data_frame, task, model, target, features=None, param_grid=None, cv=5, progress=None):
+        """Fit a model with a cross-validated grid search and persist the best estimator.
+
+        :param task: 'regression' or 'classification'
+        :param model: Key of MODELS[task]
+        :param features: Feature columns; see default_features when omitted
+        :param param_grid: Hyperparameter grid; DEFAULT_GRIDS for the model when omitted
+        :return: JSON-friendly summary including the model_id used for scoring
+        """
+        progress = progress or (lambda fraction, message='': None)
+        if task not in MODELS:
+            raise ValueError(f"Unsupported task: {task}")
+        if model not in MODELS[task]:
+            raise ValueError(f"Unsupported {task} model: {model}")
+        if target not in data_frame.columns:
+            raise ValueError(f"Unknown column: {target}")
+        features = list(features) if features else default_features(data_frame, target)
+
+        rows = data_frame[data_frame[target].notna()]
+        X, names, categories = encode_features(rows, features)
+        classes = None
+        if task == 'classification':
+            classes, y = np.unique(rows[target].astype(str).to_numpy(), return_inverse=True)
+            if len(classes) < 2:
+                raise ValueError("Classification needs at least two target classes.")
+        else:
+            y = pd.to_numeric(rows[target], errors='coerce').to_numpy(dtype=np.float64)
+            keep = ~np.isnan(y)
+            X, y = X[keep], y[keep]
+        folds = min(cv, len(y) if classes is None else int(np.bincount(y).min()))
+        if folds < 2:
+            raise ValueError("Not enough rows for cross-validation.")
+
+        X, y = self.shared_arrays(X, y)
+        progress(0.1, f"Prepared {X.shape[0]} rows x {X.shape[1]} features")
+
+        steps = [('impute', SimpleImputer(strategy='median', keep_empty_features=True))]
+        if model in LINEAR_MODELS:
+            steps.append(('scale', StandardScaler()))
+        steps.append(('model', MODELS[task][model]()))
+        grid = param_grid if param_grid is not None else DEFAULT_GRIDS.get(model, {})
+        grid = {f"model__{name}": list(values) for name, values in grid.items()}
+        splitter = (KFold(folds, shuffle=True, random_state=0) if task == 'regression'
+                    else StratifiedKFold(folds, shuffle=True, random_state=0))
+        scoring = SCORING[task]
+        primary = next(iter(scoring))
+        search = GridSearchCV(Pipeline(steps), grid, scoring=scoring, refit=primary, cv=splitter, n_jobs=self.n_jobs)
+
+        started = time.time()
+        search.fit(X, y)
+        progress(0.9, "Saving model")
+
+        cv_scores = {}
+        for name in scoring:
+            mean = search.cv_results_[f"mean_test_{name}"][search.best_index_]
+            std = search.cv_results_[f"std_test_{name}"][search.best_index_]
+            # Error scorers are negated by scikit-learn so that greater is better
+            sign = -1.0 if scoring[name].startswith('neg_') else 1.0
+            cv_scores[name] = {"mean": float(sign * mean), "std": float(std)}
+
+        model_id = hashlib.sha1(json.dumps([task, model, target, names, search.best_params_, time.time()],
+                                           default=str).encode('utf-8')).hexdigest()[:16]
+        metadata = {
+            "model_id": model_id,
+            "task": task,
+            "model": model,
+            "target": target,
+            "features": features,
+            "encoded_features": names,
+            "rows": int(X.shape[0]),
+            "folds": folds,
+            "best_params": {name.replace('model__', '', 1): value for name, value in search.best_params_.items()},
+            "cv": cv_scores,
+            "weights": self.weights(search.best_estimator_.named_steps['model'], names),
+            "classes": None if classes is None else [str(label) for label in classes],
+            "fit_seconds": round(time.time() - started, 3),
+            "created": time.time(),
+        }
+        self.save(model_id, search.best_estimator_, categories, metadata)
+        logger.info(f"Trained {task} model {model} ({model_id}) on {X.shape[0]} rows")
+        return metadata
+
+    @staticmethod
+    def weights(estimator, names):
+        """Coefficients of linear models or impurity importances of tree models, largest first."""
+        if hasattr(estimator, 'coef_'):
+            coefficients = np.atleast_2d(estimator.coef_)
+            values = coefficients[0] if len(coefficients) == 1 else np.abs(coefficients).mean(axis=0)
+        elif hasattr(estimator, 'feature_importances_'):
+            values = estimator.feature_importances_
+        else:
+            return []
+        order = np.argsort(-np.abs(values))
+        return [{"feature": names[index], "weight": float(values[index])} for index in order]
+
+    def shared_arrays(self, X, y):
+        """Dump X and y once per content hash and reopen them as read-only memory maps."""
+        os.makedirs(self.array_dir, exist_ok=True)
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(X))
+        digest.update(np.ascontiguousarray(y))
+        path = os.path.join(self.array_dir, f"{digest.hexdigest()}.joblib")
+        if not os.path.exists(path):
+            temporary = f"{path}.{os.getpid()}.tmp"
+            joblib.dump((np.ascontiguousarray(X), np.ascontiguousarray(y)), temporary)
+            os.replace(temporary, path)
+            self.prune_arrays()
+        else:
+            os.utime(path)
+        return joblib.load(path, mmap_mode='r')
+
+    def prune_arrays(self):
+        """Keep only the most recently used shared arrays on disk."""
+        paths = [os.path.join(self.array_dir, name) for name in os.listdir(self.array_dir) if name.endswith('.joblib')]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[MAX_SHARED_ARRAYS:]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+    def save(self, model_id, estimator, categories, metadata):
+        os.makedirs(self.model_dir, exist_ok=True)
+        joblib.dump({'estimator': estimator, 'categories': categories, 'metadata': metadata},
+                    os.path.join(self.model_dir, f"{model_id}.joblib"))
+        # Metadata also goes to a small sidecar so listing models does not unpickle them
+        with open(os.path.join(self.model_dir, f"{model_id}.json"), 'w', encoding='utf-8') as file:
+            json.dump(metadata, file, default=str)
+
+    def load(self, model_id):
+        """Load a persisted model, keeping recently used ones in memory."""
+        with self.lock:
+            if model_id in self.loaded:
+                self.loaded.move_to_end(model_id)
+                return self.loaded[model_id]
+        path = os.path.join(self.model_dir, f"{os.path.basename(model_id)}.joblib")
+        if not os.path.exists(path):
+            raise KeyError(model_id)
+        bundle = joblib.load(path)
+        with self.lock:
+            self.loaded[model_id] = bundle
+            while len(self.loaded) > self.cache_size:
+                self.loaded.popitem(last=False)
+        return bundle
+
+    def predict(self, model_id, data_frame):
+        """Score a DataFrame with a persisted model; returns a DataFrame of predictions."""
+        bundle = self.load(model_id)
+        metadata = bundle['metadata']
+        X, _, _ = encode_features(data_frame, metadata['features'], bundle['categories'])
+        estimator = bundle['estimator']
+        predictions = estimator.predict(X)
+        result = pd.DataFrame(index=data_frame.index)
+        if metadata['classes'] is not None:
+            classes = np.array(metadata['classes'])
+            result['prediction'] = classes[predictions]
+            if hasattr(estimator, 'predict_proba'):
+                result['probability'] = estimator.predict_proba(X).max(axis=1)
+        else:
+            result['prediction'] = predictions
+        return result.reset_index(drop=True)
+
+    def list_models(self):
+        """Metadata of every persisted model, newest first."""
+        if not os.path.isdir(self.model_dir):
+            return []
+        models = []
+        for name in os.listdir(self.model_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(self.model_dir, name), 'r', encoding='utf-8') as file:
+                    models.append(json.load(file))
+        return sorted(models, key=lambda metadata: metadata['created'], reverse=True)
+
+
+# Shared trainer used by the API endpoints
+model_trainer = ModelTrainer()
@@ -1,10 +1,44 @@
-import yfinance as yf
-import pandas as pd
+"""Refresh the NVIDIA daily price history.
 
+Run from backend/ as `python -m data.NVIDIA`. By default only the days after
+the last stored one are fetched and appended to the year-partitioned Parquet
+store in data/NVIDIA/. With --full the whole history is fetched again and
+data/NVIDIA.csv is rewritten. With --seed the store is filled from
+data/NVIDIA.csv without fetching anything, e.g. once before the first refresh.
+"""
+import argparse
+from data_ingestion.market_store import MarketDataStore, csv_history, yfinance_history
 
-ticker = yf.Ticker("NVDA")
-nvidia = ticker.history(period="max")
-nvidia['Date'] = nvidia.index
-nvidia['Year'] = nvidia['Date'].dt.year
+STORE_PATH = 'data/NVIDIA'
+CSV_PATH = 'data/NVIDIA.csv'
 
-pd.DataFrame(nvidia).to_csv('data/NVIDIA.csv')
\ No newline at end of file
+
+def refresh_csv(history_provider, csv_path=CSV_PATH):
+    nvidia = history_provider(None)
+    # The date stays in the exchange's timezone and is written once, as its own column
+    nvidia = nvidia.reset_index()
+    nvidia['Year'] = nvidia['Date'].dt.year
+    nvidia.to_csv(csv_path, index=False)
+    return len(nvidia)
+
+
+def refresh_store(history_provider, store_path=STORE_PATH):
+    return MarketDataStore(store_path).ingest(history_provider)
+
+
+def seed_store(csv_path=CSV_PATH, store_path=STORE_PATH):
+    # Rows already stored are skipped, so seeding twice appends nothing
+    return refresh_store(csv_history(csv_path), store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--full', action='store_true', help=f"rewrite {CSV_PATH} from the whole history")
+    parser.add_argument('--seed', action='store_true', help=f"fill {STORE_PATH} from {CSV_PATH} without fetching")
+    args = parser.parse_args()
+    if args.seed:
+        print(f"Appended {seed_store()} rows from {CSV_PATH} to {STORE_PATH}")
+    elif args.full:
+        print(f"Wrote {refresh_csv(yfinance_history('NVDA'))} rows to {CSV_PATH}")
+    else:
+        print(f"Appended {refresh_store(yfinance_history('NVDA'))} rows to {STORE_PATH}")
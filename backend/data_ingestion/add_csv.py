@@ -1,26 +1,143 @@
 import pandas as pd
+import json
 import os
+from data_ingestion.running_stats import track_stats
+
+DEFAULT_CHUNK_SIZE = 50000
 
 class DataReader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, cache=None):
         self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.cache = cache
         self.data_frame = None
 
     def read_csv(self):
         """Read data from a CSV file."""
-        self.data_frame = pd.read_csv(self.file_path)
+        self.data_frame = self.load('csv', pd.read_csv)
         return self.data_frame
 
     def read_excel(self):
         """Read data from an Excel file."""
-        self.data_frame = pd.read_excel(self.file_path)
+        self.data_frame = self.load('excel', pd.read_excel)
         return self.data_frame
 
     def read_json(self):
         """Read data from a JSON file."""
-        self.data_frame = pd.read_json(self.file_path)
+        self.data_frame = self.load('json', pd.read_json)
         return self.data_frame
 
+    def read(self):
+        """Read the file with the reader that matches its extension."""
+        extension = os.path.splitext(self.file_path)[1].lower()
+        if extension == '.csv':
+            return self.read_csv()
+        if extension in ('.xlsx', '.xls', '.xlsm'):
+            return self.read_excel()
+        if extension == '.json':
+            return self.read_json()
+        raise ValueError(f"Unsupported file format: {extension}")
+
+    def version(self):
+        """Identify the current version of the file by path, mtime and size."""
+        stat = os.stat(self.file_path)
+        return (os.path.realpath(self.file_path), stat.st_mtime_ns, stat.st_size)
+
+    def load(self, kind, parser):
+        """Parse the file, going through the dataset cache when one is configured."""
+        if self.cache is None:
+            return parser(self.file_path)
+        return self.cache.get_or_load(self.file_path, kind, parser)
+
+    def iter_csv(self, chunk_size=None):
+        """Yield a CSV file as DataFrame chunks of at most chunk_size rows."""
+        with pd.read_csv(self.file_path, chunksize=chunk_size or self.chunk_size) as reader:
+            for chunk in reader:
+                yield chunk
+
+    def iter_excel(self, chunk_size=None, sheet_name=None):
+        """Yield the rows of an Excel sheet as DataFrame chunks using openpyxl's read-only mode."""
+        chunk_size = chunk_size or self.chunk_size
+        if self.file_path.lower().endswith('.xls'):
+            # Legacy .xls files are not readable by openpyxl, so fall back to a full read
+            data_frame = pd.read_excel(self.file_path, sheet_name=sheet_name or 0)
+            for start in range(0, len(data_frame), chunk_size):
+                yield data_frame.iloc[start:start + chunk_size]
+            return
+
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name) if name is not None else f"Unnamed: {index}" for index, name in enumerate(header)]
+
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame.from_records(buffer, columns=columns)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame.from_records(buffer, columns=columns)
+        finally:
+            workbook.close()
+
+    def iter_json(self, chunk_size=None):
+        """Yield a JSON file as DataFrame chunks.
+
+        Line-delimited JSON (one record per line) is streamed. A regular JSON
+        document cannot be split without parsing it, so it is read once and
+        then sliced into chunks.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if self.is_json_lines():
+            with pd.read_json(self.file_path, lines=True, chunksize=chunk_size) as reader:
+                for chunk in reader:
+                    yield chunk
+        else:
+            data_frame = pd.read_json(self.file_path)
+            for start in range(0, len(data_frame), chunk_size):
+                yield data_frame.iloc[start:start + chunk_size]
+
+    def is_json_lines(self):
+        """Check whether the JSON file holds one record per line rather than a single document."""
+        if self.file_path.endswith(('.jsonl', '.ndjson')):
+            return True
+        with open(self.file_path, 'r') as file:
+            for line in file:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                try:
+                    record = json.loads(stripped)
+                except ValueError:
+                    return False
+                # A single-line column-oriented document nests its values, a record does not
+                return isinstance(record, dict) and not any(isinstance(value, (dict, list)) for value in record.values())
+        return False
+
+    def iter_chunks(self, chunk_size=None, stats=None):
+        """Yield DataFrame chunks using the reader that matches the file extension.
+
+        When a RunningStats accumulator is given, every chunk is folded into
+        it on the way through.
+        """
+        extension = os.path.splitext(self.file_path)[1].lower()
+        if extension == '.csv':
+            chunks = self.iter_csv(chunk_size)
+        elif extension in ('.xlsx', '.xls', '.xlsm'):
+            chunks = self.iter_excel(chunk_size)
+        elif extension in ('.json', '.jsonl', '.ndjson'):
+            chunks = self.iter_json(chunk_size)
+        else:
+            raise ValueError(f"Unsupported file format: {extension}")
+        return track_stats(chunks, stats) if stats is not None else chunks
+
     def display_data(self):
         """Display the DataFrame."""
         if self.data_frame is not None:
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.dataset_cache')
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class CacheEntry:
+    def __init__(self, signature, content_hash, data_frame, nbytes):
+        self.signature = signature
+        self.content_hash = content_hash
+        self.data_frame = data_frame
+        self.nbytes = nbytes
+
+
+class DatasetCache:
+    """Process-wide cache of parsed files keyed by path, mtime, size and content hash.
+
+    Parsed frames are kept in memory under a byte budget with LRU eviction and
+    written through to an on-disk cache so that a restarted process stays
+    warm; spilled files are kept under their own byte budget, least recently
+    used deleted first. A repeat load of an unchanged file only costs a stat() call.
+    Frames are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, max_bytes=None, cache_dir=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('DATASET_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else int(os.environ.get('DATASET_CACHE_MAX_DISK_BYTES', DEFAULT_MAX_DISK_BYTES))
+        self.cache_dir = cache_dir or os.environ.get('DATASET_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.lock = threading.RLock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0, 'spill_failures': 0}
+        self.index_file = os.path.join(self.cache_dir, 'index.json')
+        self.index = self.load_index()
+
+    def get_or_load(self, file_path, kind, loader):
+        """Return the parsed frame for file_path, calling loader(file_path) only when needed."""
+        path = os.path.realpath(file_path)
+        key = (path, kind)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry.data_frame
+
+        # The file is new or its metadata changed: fall back to the content hash
+        signature_key = self.signature_key(path, kind, signature)
+        content_hash = self.index.get(signature_key) or self.hash_file(path)
+
+        with self.lock:
+            if entry is not None and entry.content_hash == content_hash:
+                # Touched but unchanged, e.g. re-saved with identical bytes
+                entry.signature = signature
+                self.entries.move_to_end(key)
+                self.record_index(signature_key, content_hash)
+                self.stats['hits'] += 1
+                return entry.data_frame
+
+        data_frame = self.load_spilled(kind, content_hash)
+        if data_frame is not None:
+            with self.lock:
+                self.stats['disk_hits'] += 1
+        else:
+            data_frame = loader(file_path)
+            with self.lock:
+                self.stats['misses'] += 1
+            self.spill(kind, content_hash, data_frame)
+
+        with self.lock:
+            self.record_index(signature_key, content_hash)
+            self.store(key, CacheEntry(signature, content_hash, data_frame, self.frame_size(data_frame)))
+        return data_frame
+
+    def store(self, key, entry):
+        """Insert an entry and evict least recently used frames until the budget is met."""
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= previous.nbytes
+
+        if entry.nbytes > self.max_bytes:
+            logger.info(f"Frame for {key[0]} ({entry.nbytes} bytes) exceeds the cache budget; kept on disk only")
+            return
+
+        self.entries[key] = entry
+        self.current_bytes += entry.nbytes
+        while self.current_bytes > self.max_bytes and self.entries:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.stats['evictions'] += 1
+            logger.info(f"Evicted cached frame for {evicted_key[0]}")
+
+    def spill(self, kind, content_hash, data_frame):
+        """Write a parsed frame to the on-disk cache as Feather.
+
+        Object columns holding mixed types (common in Excel sheets) do not
+        convert to Arrow; those frames are only cached in memory, since a
+        converted copy would not read back as the loader returned it.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        spill_path = self.spill_path(kind, content_hash)
+        temp_path = f"{spill_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            data_frame.reset_index(drop=True).to_feather(temp_path)
+            os.replace(temp_path, spill_path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            with self.lock:
+                self.stats['spill_failures'] += 1
+            logger.info(f"Not spilling cached frame for content hash {content_hash}: {str(e)}")
+            return
+        self.prune_disk()
+
+    def load_spilled(self, kind, content_hash):
+        """Load a frame from the on-disk cache, or return None if it is not there."""
+        spill_path = self.spill_path(kind, content_hash)
+        if not os.path.exists(spill_path):
+            return None
+        try:
+            data_frame = pd.read_feather(spill_path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {spill_path}: {str(e)}")
+            return None
+        try:
+            # The modification time orders spilled files for eviction
+            os.utime(spill_path)
+        except OSError:
+            pass
+        return data_frame
+
+    def prune_disk(self):
+        """Delete the least recently used spilled files until the disk budget is met."""
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(('.feather', '.pkl'))]
+        except OSError:
+            return
+        spilled = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith('.pkl'):
+                # Left by earlier versions, which pickled what Feather could not hold; never read now
+                self.remove_spilled(path)
+            else:
+                spilled.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in spilled)
+        kept = []
+        for _, size, path in sorted(spilled):
+            if total > self.max_disk_bytes and self.remove_spilled(path):
+                total -= size
+                with self.lock:
+                    self.stats['disk_evictions'] += 1
+                logger.info(f"Deleted spilled cache file {path}")
+            else:
+                kept.append(os.path.basename(path).split('-', 1)[0])
+        if len(kept) < len(spilled):
+            # Signatures of files whose frames are gone from disk are not worth keeping in the index
+            with self.lock:
+                kept = set(kept)
+                self.index = {key: value for key, value in self.index.items() if value in kept}
+                self.write_index()
+
+    @staticmethod
+    def remove_spilled(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def spill_path(self, kind, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}-{kind}.feather")
+
+    def load_index(self):
+        """Load the signature to content hash index written by earlier processes."""
+        try:
+            with open(self.index_file, 'r') as index:
+                return json.load(index)
+        except (OSError, ValueError):
+            return {}
+
+    def record_index(self, signature_key, content_hash):
+        """Remember the content hash for a file signature so restarts can skip hashing."""
+        if self.index.get(signature_key) == content_hash:
+            return
+        self.index[signature_key] = content_hash
+        self.write_index()
+
+    def write_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{self.index_file}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, 'w') as index:
+                json.dump(self.index, index)
+            os.replace(temp_path, self.index_file)
+        except OSError as e:
+            logger.warning(f"Failed to write cache index: {str(e)}")
+
+    def invalidate(self, file_path=None):
+        """Drop cached frames for one file, or for every file when no path is given."""
+        with self.lock:
+            if file_path is None:
+                self.entries.clear()
+                self.current_bytes = 0
+                return
+            path = os.path.realpath(file_path)
+            for key in [key for key in self.entries if key[0] == path]:
+                self.current_bytes -= self.entries.pop(key).nbytes
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and current memory usage."""
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.current_bytes, max_bytes=self.max_bytes)
+
+    @staticmethod
+    def signature_key(path, kind, signature):
+        return hashlib.sha1(f"{path}|{kind}|{signature[0]}|{signature[1]}".encode()).hexdigest()
+
+    @staticmethod
+    def hash_file(path):
+        """Hash the file contents in blocks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def frame_size(data_frame):
+        return int(data_frame.memory_usage(index=True, deep=True).sum())
+
+
+# Shared cache used by the API endpoints
+dataset_cache = DatasetCache()
@@ -0,0 +1,440 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.datasets')
+# String columns with at most this share of distinct values are stored as categoricals
+CATEGORY_RATIO = 0.5
+
+FILTER_OPERATORS = {
+    '==': lambda values, value: values == value,
+    '!=': lambda values, value: values != value,
+    '<': lambda values, value: values < value,
+    '<=': lambda values, value: values <= value,
+    '>': lambda values, value: values > value,
+    '>=': lambda values, value: values >= value,
+    'in': lambda values, value: values.isin(value),
+    'not_in': lambda values, value: ~values.isin(value),
+    'contains': lambda values, value: values.astype(str).str.contains(str(value), regex=False, na=False),
+    'is_null': lambda values, value: values.isna(),
+    'not_null': lambda values, value: values.notna(),
+}
+
+
+def compact(data_frame):
+    """Store a frame as typed columns: numeric text becomes numbers, repetitive strings become categoricals."""
+    data_frame = data_frame.reset_index(drop=True)
+    data_frame.columns = [str(column) for column in data_frame.columns]
+    for column in data_frame.select_dtypes(include=['object', 'string']).columns:
+        values = data_frame[column]
+        present = values.notna() & (values.astype(str) != '')
+        converted = pd.to_numeric(values.where(present), errors='coerce')
+        if converted.notna().sum() == present.sum() and present.any():
+            data_frame[column] = converted
+        elif len(values) and values.nunique(dropna=True) <= CATEGORY_RATIO * len(values):
+            try:
+                data_frame[column] = values.astype('category')
+            except TypeError:
+                # Unhashable values such as nested lists stay as objects
+                pass
+    return data_frame
+
+
+def frame_size(data_frame):
+    return int(data_frame.memory_usage(index=True, deep=True).sum())
+
+
+def write_feather(data_frame, path):
+    """Write a frame as Feather, atomically; object columns mixing types (which Arrow rejects) are written as text."""
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            data_frame.to_feather(temp_path)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            data_frame = data_frame.copy()
+            for column in data_frame.select_dtypes(include='object').columns:
+                values = data_frame[column]
+                data_frame[column] = values.where(values.isna(), values.astype(str))
+            data_frame.to_feather(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class Dataset:
+    def __init__(self, dataset_id, name, source, data_frame, loader=None, parent=None, origin=None):
+        self.dataset_id = dataset_id
+        self.name = name
+        self.source = source
+        self.data_frame = data_frame
+        # Rebuilds the frame after eviction: re-reads the file, or reads the spilled copy
+        self.loader = loader
+        self.parent = parent
+        # What is needed to query the source again (e.g. connection details); never sent to clients
+        self.origin = origin
+        # Rows appended by live updates, joined to the frame on the next read
+        self.pending = []
+        self.revision = 0
+        self.set_frame(data_frame)
+        self.created = time.time()
+
+    def set_frame(self, data_frame):
+        self.data_frame = data_frame
+        self.rows = len(data_frame)
+        self.schema = [{"name": column, "dtype": str(dtype)} for column, dtype in data_frame.dtypes.items()]
+        self.nbytes = frame_size(data_frame)
+
+    def describe(self):
+        return {
+            "dataset_id": self.dataset_id,
+            "name": self.name,
+            "rows": self.rows,
+            "columns": self.schema,
+            "bytes": self.nbytes,
+            "source": self.source,
+            "parent": self.parent,
+            "revision": self.revision,
+            "resident": self.data_frame is not None,
+        }
+
+
+class DatasetRegistry:
+    """Server-side datasets referenced by ID, so clients exchange handles instead of whole tables.
+
+    Each load is parsed once into typed columns and kept resident; slices,
+    filters, statistics and analysis jobs then work on it by ID. Frames are
+    held under a byte budget: the least recently used ones are dropped when
+    it is exceeded, to be re-read from their file or, for data with no file
+    behind it (sheets, SQL results, filters), from a copy spilled to disk.
+    Registered frames are shared and must not be modified in place.
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('DATASET_REGISTRY_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.spill_dir = spill_dir or os.environ.get('DATASET_REGISTRY_DIR', DEFAULT_SPILL_DIR)
+        self.datasets = OrderedDict()
+        self.current_bytes = 0
+        self.lock = threading.RLock()
+        # Snapshot path -> number of jobs that still need the file
+        self.snapshot_refs = {}
+
+    def register(self, data_frame, name=None, source=None, loader=None, dataset_id=None, parent=None, origin=None):
+        """Add a frame and return its descriptor (ID, schema and row count).
+
+        :param loader: Callable re-creating the frame, e.g. re-reading its file; without one the frame is spilled when evicted
+        :param dataset_id: Stable ID, e.g. derived from a file version, so reloading unchanged data returns the same handle
+        """
+        dataset_id = dataset_id or uuid.uuid4().hex
+        with self.lock:
+            existing = self.datasets.get(dataset_id)
+            if existing is not None:
+                self.datasets.move_to_end(dataset_id)
+                if existing.data_frame is None:
+                    self.make_resident(existing, compact(data_frame))
+                return existing.describe()
+        dataset = Dataset(dataset_id, name or dataset_id, source, compact(data_frame), loader, parent, origin)
+        with self.lock:
+            self.datasets[dataset_id] = dataset
+            self.current_bytes += dataset.nbytes
+            self.evict(keep=dataset_id)
+        logger.info(f"Registered dataset {dataset_id} ({dataset.rows} rows, {dataset.nbytes} bytes)")
+        return dataset.describe()
+
+    def register_file(self, data_reader, name=None):
+        """Register a file read through a DataReader; the ID is stable while the file is unchanged."""
+        version = data_reader.version()
+        dataset_id = hashlib.sha1(repr(version).encode('utf-8')).hexdigest()[:20]
+        with self.lock:
+            if dataset_id in self.datasets:
+                self.datasets.move_to_end(dataset_id)
+                return self.datasets[dataset_id].describe()
+
+        def reload():
+            # The handle names one version of the file; once it changes, the data is gone
+            if data_reader.version() != version:
+                raise KeyError(dataset_id)
+            return data_reader.read()
+
+        return self.register(data_reader.read(), name=name or os.path.basename(data_reader.file_path),
+                             source={"file_path": data_reader.file_path}, loader=reload, dataset_id=dataset_id,
+                             origin={"version": version})
+
+    def get(self, dataset_id):
+        """Return the frame of a dataset, reloading it if it was evicted; KeyError for unknown IDs."""
+        with self.lock:
+            dataset = self.datasets[dataset_id]
+            self.datasets.move_to_end(dataset_id)
+            if dataset.data_frame is not None:
+                self.consolidate(dataset)
+                return dataset.data_frame
+        data_frame = compact(dataset.loader())
+        with self.lock:
+            if dataset.data_frame is None:
+                self.make_resident(dataset, data_frame)
+            self.consolidate(dataset)
+            return dataset.data_frame
+
+    def consolidate(self, dataset):
+        """Join rows appended since the last read to the frame; must be called with the lock held."""
+        if not dataset.pending:
+            return
+        categorical = [column for column, dtype in dataset.data_frame.dtypes.items()
+                       if isinstance(dtype, pd.CategoricalDtype)]
+        joined = pd.concat([dataset.data_frame, *dataset.pending], ignore_index=True)
+        for column in categorical:
+            # New values outside the known categories turn the joined column into plain objects
+            if not isinstance(joined[column].dtype, pd.CategoricalDtype):
+                joined[column] = joined[column].astype('category')
+        dataset.pending = []
+        self.current_bytes -= dataset.nbytes
+        dataset.set_frame(joined)
+        self.current_bytes += dataset.nbytes
+
+    def version(self, dataset_id):
+        """Identify the current contents of a dataset: its ID plus the revision bumped by every live update."""
+        with self.lock:
+            return (dataset_id, self.datasets[dataset_id].revision)
+
+    def append(self, dataset_id, data_frame):
+        """Append rows, e.g. from a live update, and return the position of the first new one.
+
+        Appended chunks are only joined to the frame when it is next read, so a
+        stream of small appends does not copy the whole dataset for every delta.
+        """
+        chunk = compact(data_frame)
+        while True:
+            with self.lock:
+                dataset = self.datasets[dataset_id]
+                if dataset.data_frame is not None:
+                    start = dataset.rows
+                    dataset.pending.append(chunk)
+                    size = frame_size(chunk)
+                    dataset.rows += len(chunk)
+                    dataset.nbytes += size
+                    self.current_bytes += size
+                    self.changed(dataset)
+                    return start
+            # The frame has to be resident: once changed, the dataset no longer matches its file or spilled copy
+            self.get(dataset_id)
+
+    def update_rows(self, dataset_id, positions, data_frame):
+        """Overwrite the rows at positions with the rows of data_frame (same columns, same order)."""
+        updated = self.get(dataset_id).copy()
+        for column in data_frame.columns:
+            values = updated[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            values.iloc[positions] = data_frame[column].to_numpy()
+            updated[column] = values
+        self.replace(dataset_id, updated)
+
+    def replace(self, dataset_id, data_frame):
+        """Swap in new contents for a dataset, e.g. after its source was rewritten."""
+        data_frame = compact(data_frame)
+        with self.lock:
+            dataset = self.datasets[dataset_id]
+            if dataset.data_frame is not None:
+                self.current_bytes -= dataset.nbytes
+            dataset.pending = []
+            dataset.set_frame(data_frame)
+            self.current_bytes += dataset.nbytes
+            self.changed(dataset)
+            self.evict(keep=dataset_id)
+
+    def changed(self, dataset):
+        dataset.revision += 1
+        # The frame no longer matches its file or spilled copy; it is spilled afresh when evicted
+        dataset.loader = None
+        spill_path = self.spill_path(dataset.dataset_id)
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def make_resident(self, dataset, data_frame):
+        dataset.data_frame = data_frame
+        self.current_bytes += dataset.nbytes
+        self.evict(keep=dataset.dataset_id)
+        logger.info(f"Reloaded dataset {dataset.dataset_id}")
+
+    def __contains__(self, dataset_id):
+        with self.lock:
+            return dataset_id in self.datasets
+
+    def describe(self, dataset_id):
+        with self.lock:
+            return self.datasets[dataset_id].describe()
+
+    def list(self):
+        with self.lock:
+            return [dataset.describe() for dataset in self.datasets.values()]
+
+    def remove(self, dataset_id):
+        with self.lock:
+            dataset = self.datasets.pop(dataset_id)
+            if dataset.data_frame is not None:
+                self.current_bytes -= dataset.nbytes
+        spill_path = self.spill_path(dataset_id)
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+        # Snapshots still held by jobs are deleted when those jobs release them
+        snapshot_dir = os.path.join(self.spill_dir, 'snapshots')
+        with self.lock:
+            if os.path.isdir(snapshot_dir):
+                for name in os.listdir(snapshot_dir):
+                    path = os.path.join(snapshot_dir, name)
+                    if name.startswith(f"{os.path.basename(dataset_id)}-") and path not in self.snapshot_refs:
+                        os.remove(path)
+        logger.info(f"Removed dataset {dataset_id}")
+
+    def slice(self, dataset_id, offset=0, limit=None, columns=None):
+        """Rows offset..offset+limit of a dataset, optionally restricted to some columns."""
+        data_frame = self.get(dataset_id)
+        if columns:
+            missing = [column for column in columns if column not in data_frame.columns]
+            if missing:
+                raise ValueError(f"Unknown columns: {', '.join(missing)}")
+            data_frame = data_frame[columns]
+        stop = None if limit is None else offset + limit
+        return data_frame.iloc[offset:stop]
+
+    def filter(self, dataset_id, conditions, columns=None, name=None):
+        """Register the rows matching every condition as a new dataset and return its descriptor.
+
+        :param conditions: List of {"column", "op", "value"} with op one of FILTER_OPERATORS
+        """
+        data_frame = self.get(dataset_id)
+        missing = [column for column in columns or [] if column not in data_frame.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        mask = np.ones(len(data_frame), dtype=bool)
+        for condition in conditions:
+            column, operator = condition.get('column'), condition.get('op', '==')
+            if column not in data_frame.columns:
+                raise ValueError(f"Unknown column: {column}")
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            values = data_frame[column]
+            value = condition.get('value')
+            if pd.api.types.is_datetime64_any_dtype(values) and operator not in ('in', 'not_in', 'is_null', 'not_null'):
+                value = pd.Timestamp(value)
+            try:
+                mask &= np.asarray(FILTER_OPERATORS[operator](values, value), dtype=bool)
+            except TypeError as e:
+                raise ValueError(f"Cannot apply {operator} to column {column}: {str(e)}")
+        result = data_frame.loc[mask, columns] if columns else data_frame.loc[mask]
+        with self.lock:
+            parent_name = self.datasets[dataset_id].name
+        return self.register(result, name=name or f"{parent_name} (filtered)", source={"dataset_id": dataset_id,
+                             "filters": conditions}, parent=dataset_id)
+
+    def evict(self, keep=None):
+        """Drop least recently used frames until the budget is met; must be called with the lock held."""
+        for dataset_id in list(self.datasets):
+            if self.current_bytes <= self.max_bytes:
+                return
+            dataset = self.datasets[dataset_id]
+            if dataset_id == keep or dataset.data_frame is None:
+                continue
+            self.consolidate(dataset)
+            if dataset.loader is None:
+                dataset.loader = self.spill(dataset)
+                if dataset.loader is None:
+                    continue
+            dataset.data_frame = None
+            self.current_bytes -= dataset.nbytes
+            logger.info(f"Evicted dataset {dataset_id} from memory")
+
+    def spill(self, dataset):
+        """Write a frame without a source file to disk as Feather and return a loader for it, or None on failure.
+
+        Feather rather than pickle, so that reading the spill directory back cannot run code.
+        """
+        spill_path = self.spill_path(dataset.dataset_id)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self.remove_legacy_spills()
+            write_feather(dataset.data_frame.reset_index(drop=True), spill_path)
+            return lambda: pd.read_feather(spill_path)
+        except Exception as e:
+            logger.warning(f"Failed to spill dataset {dataset.dataset_id}: {str(e)}")
+            return None
+
+    def remove_legacy_spills(self):
+        """Delete frames pickled by earlier versions; they are never read now."""
+        for name in os.listdir(self.spill_dir):
+            if name.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(self.spill_dir, name))
+                except OSError:
+                    continue
+
+    def spill_path(self, dataset_id):
+        return os.path.join(self.spill_dir, f"{os.path.basename(dataset_id)}.feather")
+
+    def snapshot(self, dataset_id):
+        """Write the current contents of a dataset to a Feather file and return (path, revision).
+
+        Job processes do not share this registry, so they are handed the
+        snapshot instead and restore() it. Jobs on the same revision share
+        one file, which stays until every one of them has called
+        release_snapshot(), even if the dataset changes or is removed meanwhile.
+        """
+        data_frame = self.get(dataset_id)
+        revision = self.version(dataset_id)[1]
+        directory = os.path.join(self.spill_dir, 'snapshots')
+        path = os.path.join(directory, f"{os.path.basename(dataset_id)}-{revision}.feather")
+        with self.lock:
+            self.snapshot_refs[path] = self.snapshot_refs.get(path, 0) + 1
+            written = os.path.exists(path)
+        if not written:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                write_feather(data_frame.reset_index(drop=True), path)
+            except Exception:
+                self.release_snapshot((path, revision))
+                raise
+        return path, revision
+
+    def release_snapshot(self, snapshot):
+        """Give up a reference taken by snapshot(); the file is deleted with the last one."""
+        path, _ = snapshot
+        with self.lock:
+            count = self.snapshot_refs.pop(path, 0) - 1
+            if count > 0:
+                self.snapshot_refs[path] = count
+                return
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def restore(self, dataset_id, snapshot):
+        """Register a snapshot() under the ID and revision it was taken from, e.g. in a job process."""
+        path, revision = snapshot
+        descriptor = self.register(pd.read_feather(path), dataset_id=dataset_id)
+        with self.lock:
+            self.datasets[dataset_id].revision = revision
+        return dict(descriptor, revision=revision)
+
+    def get_stats(self):
+        with self.lock:
+            resident = sum(dataset.data_frame is not None for dataset in self.datasets.values())
+            return {"datasets": len(self.datasets), "resident": resident, "bytes": self.current_bytes,
+                    "max_bytes": self.max_bytes}
+
+
+# Shared registry used by the API endpoints
+dataset_registry = DatasetRegistry()
@@ -0,0 +1,114 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import sqlalchemy as sa
+from sqlalchemy.engine import make_url
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class EngineEntry:
+    def __init__(self, engine):
+        self.engine = engine
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class EngineRegistry:
+    """Keeps one pooled SQLAlchemy engine per connection string.
+
+    Engines are created on first use and reused by later requests, so the
+    TCP and authentication handshake is paid once per pooled connection
+    instead of once per query. Engines that have not been used for
+    idle_timeout seconds are disposed.
+    """
+
+    def __init__(self, pool_size=None, max_overflow=None, pool_pre_ping=None, pool_recycle=None, idle_timeout=None):
+        self.pool_size = pool_size if pool_size is not None else int(os.environ.get('DB_POOL_SIZE', 5))
+        self.max_overflow = max_overflow if max_overflow is not None else int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        self.pool_pre_ping = pool_pre_ping if pool_pre_ping is not None else os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        self.pool_recycle = pool_recycle if pool_recycle is not None else int(os.environ.get('DB_POOL_RECYCLE', 1800))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else int(os.environ.get('DB_ENGINE_IDLE_TIMEOUT', 3600))
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_engine(self, connection_string):
+        """Return the pooled engine for a connection string, creating it if needed."""
+        self.evict_idle()
+        with self.lock:
+            entry = self.entries.get(connection_string)
+            if entry is None:
+                entry = EngineEntry(self.create_engine(connection_string))
+                self.entries[connection_string] = entry
+                logger.info(f"Created pooled engine for {self.mask(connection_string)}")
+            entry.last_used = time.time()
+            entry.uses += 1
+            return entry.engine
+
+    def create_engine(self, connection_string):
+        """Create an engine with the configured pool settings."""
+        url = make_url(connection_string)
+        options = {'pool_pre_ping': self.pool_pre_ping}
+        # In-memory SQLite databases live in a single connection and do not take pool sizing
+        if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+            options.update(pool_size=self.pool_size, max_overflow=self.max_overflow, pool_recycle=self.pool_recycle)
+        engine = sa.create_engine(url, **options)
+        if url.get_backend_name() == 'sqlite':
+            # ATTACH and VACUUM INTO would create or write files other than the opened one
+            sa.event.listen(engine, 'connect', lambda connection, record:
+                            connection.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 0))
+        return engine
+
+    def evict_idle(self):
+        """Dispose engines that have not been used within the idle timeout."""
+        now = time.time()
+        with self.lock:
+            idle = [key for key, entry in self.entries.items() if now - entry.last_used > self.idle_timeout]
+            evicted = [self.entries.pop(key) for key in idle]
+        for key, entry in zip(idle, evicted):
+            entry.engine.dispose()
+            logger.info(f"Disposed idle engine for {self.mask(key)}")
+        return len(evicted)
+
+    def dispose_all(self):
+        """Dispose every pooled engine, e.g. on application shutdown."""
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+        for entry in entries:
+            entry.engine.dispose()
+
+    def get_stats(self):
+        """Return pool statistics for every registered engine."""
+        with self.lock:
+            items = list(self.entries.items())
+        stats = []
+        for key, entry in items:
+            pool = entry.engine.pool
+            stats.append({
+                "url": self.mask(key),
+                "pool": pool.__class__.__name__,
+                "size": pool.size() if hasattr(pool, 'size') else None,
+                "checked_out": pool.checkedout() if hasattr(pool, 'checkedout') else None,
+                "overflow": pool.overflow() if hasattr(pool, 'overflow') else None,
+                "status": pool.status(),
+                "uses": entry.uses,
+                "created_at": entry.created_at,
+                "last_used": entry.last_used,
+            })
+        return stats
+
+    @staticmethod
+    def mask(connection_string):
+        """Hide the password in a connection string for logs and stats."""
+        return make_url(connection_string).render_as_string(hide_password=True)
+
+
+# Shared registry used by the Database classes
+engine_registry = EngineRegistry()
@@ -0,0 +1,106 @@
+import hashlib
+import io
+import os
+import pandas as pd
+
+# Bytes just before the consumed offset that are hashed to tell an append from a rewrite
+FINGERPRINT_BYTES = 4096
+# Bytes read at a time when looking for the end of the last complete line
+BLOCK_BYTES = 1 << 16
+
+
+def last_line_end(file, start, end):
+    """Offset just past the last newline in file[start:end], or start when there is none; reads backwards in blocks."""
+    position = end
+    while position > start:
+        block_start = max(start, position - BLOCK_BYTES)
+        file.seek(block_start)
+        index = file.read(position - block_start).rfind(b'\n')
+        if index >= 0:
+            return block_start + index + 1
+        position = block_start
+    return start
+
+
+class LineRange(io.RawIOBase):
+    """Reads prefix followed by file[start:end], straight from the file and without copying the range."""
+
+    def __init__(self, file, start, end, prefix=b''):
+        self.file = file
+        self.prefix = prefix
+        self.remaining = end - start
+        file.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            size = min(len(buffer), len(self.prefix))
+            buffer[:size] = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+            return size
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        size = self.file.readinto(memoryview(buffer)[:size])
+        self.remaining -= size
+        return size
+
+
+class FileTail:
+    """Reads the complete lines appended to a CSV file since the consumed offset.
+
+    The bytes just before the offset are fingerprinted, so a file that was
+    rewritten rather than appended to can be told apart from one that grew.
+    Lines are streamed from the file to the parser, never held as a whole.
+
+    :param offset: Bytes already consumed, by default the whole file; moved back to the end of a complete line
+    """
+
+    def __init__(self, file_path, offset=None):
+        self.file_path = file_path
+        with open(file_path, 'rb') as file:
+            self.header = file.readline()
+            size = os.fstat(file.fileno()).st_size
+            self.offset = last_line_end(file, 0, size if offset is None else offset)
+        self.fingerprint = self.fingerprint_at(self.offset)
+
+    def rewritten(self):
+        """Whether the consumed part of the file changed, so that appended lines cannot be trusted."""
+        return os.path.getsize(self.file_path) < self.offset or self.fingerprint_at(self.offset) != self.fingerprint
+
+    def read_appended(self, chunk_size=None):
+        """Yield the lines appended since the consumed offset as frames of up to chunk_size rows, then move the offset past them."""
+        with open(self.file_path, 'rb') as file:
+            end = last_line_end(file, self.offset, os.fstat(file.fileno()).st_size)
+            if end == self.offset:
+                return
+            if self.offset == 0:
+                # The header is part of the range; it may not have existed when the tail was created
+                file.seek(0)
+                self.header = file.readline()
+                prefix = b''
+            else:
+                # Re-attach the header so that pandas sees the same columns
+                prefix = self.header
+            lines = io.BufferedReader(LineRange(file, self.offset, end, prefix))
+            if chunk_size is None:
+                yield pd.read_csv(lines)
+            else:
+                with pd.read_csv(lines, chunksize=chunk_size) as reader:
+                    yield from reader
+        self.offset = end
+        self.fingerprint = self.fingerprint_at(self.offset)
+
+    def read_consumed(self):
+        """Parse everything up to the consumed offset, e.g. to reload a rewritten file consistently with the tail."""
+        with open(self.file_path, 'rb') as file:
+            return pd.read_csv(io.BufferedReader(LineRange(file, 0, self.offset)))
+
+    def fingerprint_at(self, offset):
+        """Hash the bytes just before offset."""
+        start = max(0, offset - FINGERPRINT_BYTES)
+        with open(self.file_path, 'rb') as file:
+            file.seek(start)
+            return hashlib.sha1(file.read(offset - start)).hexdigest()
@@ -8,6 +8,7 @@ import webbrowser
 import threading
 import json
 import os
+import pandas as pd
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -20,10 +21,22 @@ class GoogleDriveClient:
     REDIRECT_URI = 'http://127.0.0.1:5500/callback'
     TOKEN_FILE = 'backend/data_ingestion/token.json'
     CREDENTIALS_FILE = 'backend/data_ingestion/credentials.json'
+    # Rows requested per range when a tab is split into windows
+    WINDOW_ROWS = 50000
+    # Ranges sent in a single values().batchGet call
+    BATCH_RANGES = 50
+    # Seconds to wait for the user to finish signing in before giving up
+    AUTHORIZATION_TIMEOUT = int(os.environ.get('GOOGLE_AUTH_TIMEOUT', 300))
 
     def __init__(self):
         self.authorization_code = None
+        self.authorization_received = threading.Event()
+        self.pending_flow = None
+        self.server_thread = None
         self.creds = None
+        self.creds_lock = threading.RLock()
+        # googleapiclient service objects are not thread-safe, so each worker thread keeps its own
+        self.local_services = threading.local()
         self.app = Flask(__name__)
         self.setup_routes()
         logger.info("GoogleDriveClient initialized")
@@ -34,6 +47,7 @@ class GoogleDriveClient:
         def callback():
             """OAuth callback to capture the authorization code."""
             self.authorization_code = request.args.get('code')
+            self.authorization_received.set()
             logger.info("Authorization code received")
             return "Authorization successful! You can close this window now."
 
@@ -45,21 +59,32 @@ class GoogleDriveClient:
             logger.error(f"Failed to start Flask server: {str(e)}")
             raise
 
-    def get_credentials(self):
-        """Handles the OAuth flow and retrieves the credentials."""
+    def start_authorization(self):
+        """Open the OAuth consent page in the browser; the code arrives on the callback route."""
         try:
             flow = Flow.from_client_secrets_file(
                 self.CREDENTIALS_FILE, self.SCOPES, redirect_uri=self.REDIRECT_URI)
-            
+
             auth_url, _ = flow.authorization_url(prompt='consent')
-            server_thread = threading.Thread(target=self.start_server)
-            server_thread.daemon = True
-            server_thread.start()
+            # A code from an earlier, abandoned flow must not complete this one
+            self.authorization_code = None
+            self.authorization_received.clear()
+            if self.server_thread is None:
+                self.server_thread = threading.Thread(target=self.start_server)
+                self.server_thread.daemon = True
+                self.server_thread.start()
 
             webbrowser.open(auth_url)
-            while self.authorization_code is None:
-                pass
+            self.pending_flow = flow
+            return flow
+        except Exception as e:
+            logger.error(f"Failed to start authorization: {str(e)}")
+            raise
 
+    def finish_authorization(self):
+        """Exchange the received authorization code for credentials."""
+        flow, self.pending_flow = self.pending_flow, None
+        try:
             flow.fetch_token(code=self.authorization_code)
             self.creds = flow.credentials
             self.save_credentials()
@@ -81,31 +106,78 @@ class GoogleDriveClient:
     def load_credentials(self):
         """Load the credentials from the token file, refreshing them if necessary."""
         try:
-            if os.path.exists(self.TOKEN_FILE):
+            if not self.creds and os.path.exists(self.TOKEN_FILE):
                 self.creds = Credentials.from_authorized_user_file(self.TOKEN_FILE, self.SCOPES)
-            
-            if not self.creds or not self.creds.valid:
-                if self.creds and self.creds.expired and self.creds.refresh_token:
-                    self.creds.refresh(Request())
-                    self.save_credentials()
-                else:
-                    self.get_credentials()
-            logger.info("Credentials loaded successfully")
+
+            if self.creds and not self.creds.valid and self.creds.expired and self.creds.refresh_token:
+                self.creds.refresh(Request())
+                self.save_credentials()
         except Exception as e:
             logger.error(f"Failed to load credentials: {str(e)}")
             raise
 
-    def fetch_sheets(self):
-        """Fetch a list of Google Sheets from the Drive account."""
-        if not self.creds:
+    def ensure_credentials(self):
+        """Load credentials once and refresh them when they expire, shared by all threads.
+
+        Without usable credentials one OAuth flow is started in the browser.
+        Threads wait for it outside the lock and give up after
+        AUTHORIZATION_TIMEOUT seconds, so an abandoned flow fails the calls
+        waiting on it instead of blocking every thread; the next call starts
+        a new flow.
+        """
+        with self.creds_lock:
             self.load_credentials()
+            if self.creds and self.creds.valid:
+                return self.creds
+            flow = self.pending_flow or self.start_authorization()
+
+        if not self.authorization_received.wait(self.AUTHORIZATION_TIMEOUT):
+            with self.creds_lock:
+                if self.pending_flow is flow:
+                    self.pending_flow = None
+            logger.error("Google authorization timed out")
+            raise TimeoutError(f"Google authorization was not completed within {self.AUTHORIZATION_TIMEOUT} seconds.")
+
+        with self.creds_lock:
+            # The first thread to get here exchanges the code, the others reuse its credentials
+            if self.pending_flow is not None and self.authorization_received.is_set():
+                self.finish_authorization()
+            if not (self.creds and self.creds.valid):
+                raise RuntimeError("Google authorization did not complete.")
+            return self.creds
 
+    def get_service(self, name, version):
+        """Return a discovery client for the current thread, building it only once."""
+        creds = self.ensure_credentials()
+        services = getattr(self.local_services, 'services', None)
+        if services is None:
+            services = self.local_services.services = {}
+
+        cached = services.get((name, version))
+        if cached is not None and cached[0] is creds:
+            return cached[1]
+
+        service = build(name, version, credentials=creds, cache_discovery=False)
+        services[(name, version)] = (creds, service)
+        logger.info(f"Built {name} {version} service client")
+        return service
+
+    def fetch_sheets(self):
+        """Fetch a list of Google Sheets from the Drive account."""
         try:
-            drive_service = build('drive', 'v3', credentials=self.creds)
-            results = drive_service.files().list(
-                q="mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="files(id, name)").execute()
-            items = results.get('files', [])
+            drive_service = self.get_service('drive', 'v3')
+            items = []
+            page_token = None
+            while True:
+                results = drive_service.files().list(
+                    q="mimeType='application/vnd.google-apps.spreadsheet'",
+                    fields="nextPageToken, files(id, name)",
+                    pageSize=1000,
+                    pageToken=page_token).execute()
+                items.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
 
             if not items:
                 logger.info("No sheets found")
@@ -119,6 +191,16 @@ class GoogleDriveClient:
             logger.error(f"An error occurred while fetching sheets: {str(e)}")
             raise
 
+    def fetch_revision(self, sheet_id):
+        """Fetch only the Drive modifiedTime and version of a spreadsheet."""
+        try:
+            drive_service = self.get_service('drive', 'v3')
+            metadata = drive_service.files().get(fileId=sheet_id, fields="modifiedTime, version").execute()
+            return {"modified_time": metadata.get('modifiedTime'), "version": metadata.get('version')}
+        except Exception as e:
+            logger.error(f"An error occurred while fetching sheet revision: {str(e)}")
+            raise
+
     def remove_token(self):
         """Remove the existing token file if it exists."""
         try:
@@ -131,16 +213,92 @@ class GoogleDriveClient:
             logger.error(f"Failed to remove token file: {str(e)}")
             raise
 
-    def fetch_sheet_content(self, sheet_id, range_name='Sheet1!A1:Z1000'):
-        """Fetch the content of a specific Google Sheet."""
-        if not self.creds:
-            self.load_credentials()
+    def fetch_sheet_tabs(self, sheet_id):
+        """Fetch the title and grid size of every tab in a spreadsheet."""
+        try:
+            sheets_service = self.get_service('sheets', 'v4')
+            metadata = sheets_service.spreadsheets().get(
+                spreadsheetId=sheet_id,
+                fields="sheets.properties(sheetId,title,index,gridProperties(rowCount,columnCount))").execute()
+            tabs = []
+            for sheet in metadata.get('sheets', []):
+                properties = sheet['properties']
+                grid = properties.get('gridProperties', {})
+                tabs.append({
+                    "id": properties.get('sheetId'),
+                    "title": properties['title'],
+                    "index": properties.get('index', 0),
+                    "row_count": grid.get('rowCount', 0),
+                    "column_count": grid.get('columnCount', 0),
+                })
+            logger.info(f"Found {len(tabs)} tabs in sheet: {sheet_id}")
+            return sorted(tabs, key=lambda tab: tab['index'])
+        except Exception as e:
+            logger.error(f"An error occurred while fetching sheet metadata: {str(e)}")
+            raise
 
+    def fetch_workbook(self, sheet_id, tabs=None, window_rows=None):
+        """Fetch the values of several tabs with as few values().batchGet calls as possible.
+
+        Ranges are derived from the tab metadata rather than a fixed A1:Z1000
+        block, and tabs taller than window_rows are split into row windows so
+        no single response grows unbounded. Returns a dict of tab title to
+        rows.
+        """
+        all_tabs = self.fetch_sheet_tabs(sheet_id)
+        if tabs is not None:
+            wanted = set(tabs)
+            all_tabs = [tab for tab in all_tabs if tab['title'] in wanted]
+        return self.fetch_tab_values(sheet_id, all_tabs, window_rows)
+
+    def fetch_tab_values(self, sheet_id, all_tabs, window_rows=None):
+        """Fetch the values of the given tabs (as returned by fetch_sheet_tabs) in bulk."""
+        window_rows = window_rows or self.WINDOW_ROWS
         try:
-            sheets_service = build('sheets', 'v4', credentials=self.creds)
-            sheet = sheets_service.spreadsheets()
-            result = sheet.values().get(spreadsheetId=sheet_id, range=range_name).execute()
-            values = result.get('values', [])
+            # One entry per requested range: (tab title, expected rows in the window)
+            ranges = []
+            for tab in all_tabs:
+                last_column = column_letter(max(tab['column_count'], 1))
+                for start in range(1, max(tab['row_count'], 1) + 1, window_rows):
+                    end = min(start + window_rows - 1, max(tab['row_count'], 1))
+                    ranges.append((tab['title'], f"{quote_title(tab['title'])}!A{start}:{last_column}{end}", end - start + 1))
+
+            workbook = {tab['title']: [] for tab in all_tabs}
+            sheets_service = self.get_service('sheets', 'v4')
+            for batch_start in range(0, len(ranges), self.BATCH_RANGES):
+                batch = ranges[batch_start:batch_start + self.BATCH_RANGES]
+                result = sheets_service.spreadsheets().values().batchGet(
+                    spreadsheetId=sheet_id,
+                    ranges=[range_name for _, range_name, _ in batch],
+                    majorDimension='ROWS').execute()
+                for (title, _, window_size), value_range in zip(batch, result.get('valueRanges', [])):
+                    values = value_range.get('values', [])
+                    # The API drops trailing empty rows, so pad windows to keep later rows aligned
+                    workbook[title].extend(values + [[] for _ in range(window_size - len(values))])
+
+            for title, rows in workbook.items():
+                while rows and not rows[-1]:
+                    rows.pop()
+            logger.info(f"Fetched {len(workbook)} tabs from sheet {sheet_id} using {len(ranges)} ranges")
+            return workbook
+        except Exception as e:
+            logger.error(f"An error occurred while fetching workbook: {str(e)}")
+            raise
+
+    def fetch_sheet_content(self, sheet_id, range_name=None):
+        """Fetch the content of a specific Google Sheet.
+
+        Without a range the whole first tab is fetched.
+        """
+        try:
+            if range_name is None:
+                tabs = self.fetch_sheet_tabs(sheet_id)
+                values = self.fetch_tab_values(sheet_id, tabs[:1])[tabs[0]['title']] if tabs else []
+            else:
+                sheets_service = self.get_service('sheets', 'v4')
+                sheet = sheets_service.spreadsheets()
+                result = sheet.values().get(spreadsheetId=sheet_id, range=range_name).execute()
+                values = result.get('values', [])
 
             if not values:
                 logger.info('No data found in the specified sheet.')
@@ -153,6 +311,50 @@ class GoogleDriveClient:
             logger.error(f"An error occurred while fetching sheet content: {str(e)}")
             raise
 
+
+def column_letter(index):
+    """Convert a 1-based column index to its A1 letter, e.g. 28 -> 'AB'."""
+    letters = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def quote_title(title):
+    """Quote a tab title for use in A1 notation."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def values_to_dataframe(values, header=True):
+    """Convert a Sheets string grid into a DataFrame with numeric and date columns typed."""
+    if not values:
+        return pd.DataFrame()
+
+    width = max(len(row) for row in values)
+    rows = [row + [None] * (width - len(row)) for row in values]
+    if header:
+        columns = [str(name) if name not in (None, '') else f"Unnamed: {index}" for index, name in enumerate(rows[0])]
+        data_frame = pd.DataFrame(rows[1:], columns=columns)
+    else:
+        data_frame = pd.DataFrame(rows)
+
+    for column in data_frame.columns:
+        series = data_frame[column].replace('', None)
+        present = series.notna()
+        if not present.any():
+            continue
+        numeric = pd.to_numeric(series.astype(str).str.replace(',', '', regex=False).where(present), errors='coerce')
+        if numeric[present].notna().all():
+            data_frame[column] = numeric
+            continue
+        dates = pd.to_datetime(series, errors='coerce', format='mixed')
+        if dates[present].notna().all():
+            data_frame[column] = dates
+        else:
+            data_frame[column] = series
+    return data_frame
+
 if __name__ == '__main__':
     try:
         google_drive_client = GoogleDriveClient()
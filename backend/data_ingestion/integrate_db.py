@@ -1,22 +1,102 @@
 import sqlalchemy as sa
 from sqlalchemy.orm import sessionmaker
+import datetime
+import decimal
 import os
+import threading
+import time
+import urllib.parse
+import weakref
+import pandas as pd
+import pyarrow as pa
+from data_ingestion.engine_registry import engine_registry
+
+# Time bucket units understood by Database.time_bucket
+TIME_BUCKETS = ('hour', 'day', 'week', 'month', 'quarter', 'year')
+
+# Directory SQLite databases are opened from; db_name cannot point outside it
+DEFAULT_SQLITE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+SQLITE_DIR = os.environ.get('SQLITE_DIR', DEFAULT_SQLITE_DIR)
+
+# Reflected tables per pooled engine with the time each was reflected, so the catalog is queried
+# once per table until the reflection is older than the TTL and picks up schema changes again
+_table_metadata = weakref.WeakKeyDictionary()
+_table_metadata_lock = threading.Lock()
+TABLE_METADATA_TTL = int(os.environ.get('DB_TABLE_METADATA_TTL', 300))
+
+
+def sql_constant(value):
+    """Inline a constant from a fixed set (a unit or format) into SQL.
+
+    Bound parameters would differ between the SELECT and GROUP BY copies of
+    a bucket expression, which PostgreSQL and Oracle reject as not grouped.
+    """
+    return sa.literal_column(f"'{value}'")
+
+
+# Arrow types for the Python types of SQLAlchemy column types; decimals become
+# floats, as in pandas.read_sql, since their scale can differ from row to row
+ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    decimal.Decimal: pa.float64(),
+    str: pa.string(),
+    bytes: pa.binary(),
+    datetime.datetime: pa.timestamp('us'),
+    datetime.date: pa.date32(),
+    datetime.time: pa.time64('us'),
+}
+
+
+def arrow_type(values, sql_type=None):
+    """
+    Arrow type of a result column, from its first batch of values or else its SQL type.
+
+    :param values: The column's values in the first batch
+    :param sql_type: The column's SQLAlchemy type, when known
+    :return: pyarrow.DataType; string when neither the values nor the type tell
+    """
+    try:
+        declared = ARROW_TYPES.get(sql_type.python_type)
+    except (AttributeError, NotImplementedError):
+        declared = None
+    inferred = pa.array(values, from_pandas=True).type if values else pa.null()
+    if pa.types.is_null(inferred):
+        return declared or pa.string()
+    if pa.types.is_decimal(inferred) or (pa.types.is_integer(inferred) and declared == pa.float64()):
+        return pa.float64()
+    return inferred
+
+
+def arrow_array(values, arrow_type):
+    """Convert a column's values to the given Arrow type; decimals are converted to floats first."""
+    if pa.types.is_floating(arrow_type):
+        values = [float(value) if isinstance(value, decimal.Decimal) else value for value in values]
+    return pa.array(values, type=arrow_type, from_pandas=True)
 
 class Database:
-    def __init__(self, db_type='mysql', user=None, password=None, host=None, port=None, db_name=None):
+    def __init__(self, db_type='mysql', user=None, password=None, host=None, port=None, db_name=None, registry=engine_registry):
         self.db_type = db_type
         self.user = user or os.environ.get('DB_USER', 'your_username')
         self.password = password or os.environ.get('DB_PASSWORD', 'your_password')
         self.host = host or os.environ.get('DB_HOST', 'your_host')
         self.port = port or os.environ.get('DB_PORT', 'your_port')
         self.db_name = db_name or os.environ.get('DB_NAME', 'your_database_name')
+        self.registry = registry
         self.engine = self.create_engine()
         self.session = sessionmaker(bind=self.engine)()
 
+    def get_connection_string(self):
+        """Build the SQLAlchemy connection string for this database."""
+        return f"{self.db_type}+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.db_name}"
+
     def create_engine(self):
-        """Create a database engine based on the database type."""
-        connection_string = f"{self.db_type}+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.db_name}"
-        return sa.create_engine(connection_string)
+        """Get a pooled engine from the registry, or a dedicated one when no registry is used."""
+        connection_string = self.get_connection_string()
+        if self.registry is None:
+            return sa.create_engine(connection_string)
+        return self.registry.get_engine(connection_string)
 
     def fetch_data(self, query):
         """
@@ -35,15 +115,214 @@ class Database:
         finally:
             self.session.close()
 
+    def reflect_table(self, name, schema=None):
+        """
+        Describe a table from the database catalog; the result is cached per engine for TABLE_METADATA_TTL seconds.
+
+        :param name: Table name
+        :param schema: Optional schema (or Oracle owner) of the table
+        :return: sqlalchemy.Table with the table's columns
+        """
+        with _table_metadata_lock:
+            metadata, reflected_at = _table_metadata.setdefault(self.engine, (sa.MetaData(), {}))
+            key = f"{schema}.{name}" if schema else name
+            if key in metadata.tables:
+                # Tables reflected along with another one, through a foreign key, have no time of their own
+                if key in reflected_at and time.monotonic() - reflected_at[key] < TABLE_METADATA_TTL:
+                    return metadata.tables[key]
+                metadata.remove(metadata.tables[key])
+            table = sa.Table(name, metadata, schema=schema, autoload_with=self.engine)
+            reflected_at[key] = time.monotonic()
+            return table
+
+    def time_bucket(self, column, unit):
+        """
+        Truncate a datetime column to the start of its hour, day, week (Monday), month, quarter or year.
+
+        :param column: SQLAlchemy column expression
+        :param unit: One of TIME_BUCKETS
+        :return: SQLAlchemy expression in this database's dialect (MySQL here)
+        """
+        day = sa.func.date(column)
+        year_start = sa.func.makedate(sa.func.year(column), 1)
+        buckets = {
+            'hour': lambda: sa.func.timestampadd(sa.text('HOUR'), sa.func.hour(column), day),
+            'day': lambda: day,
+            'week': lambda: sa.func.subdate(day, sa.func.weekday(column)),
+            'month': lambda: sa.func.subdate(day, sa.func.dayofmonth(column) - 1),
+            'quarter': lambda: sa.func.timestampadd(sa.text('QUARTER'), sa.func.quarter(column) - 1, year_start),
+            'year': lambda: year_start,
+        }
+        return buckets[self.check_bucket(unit)]()
+
+    @staticmethod
+    def check_bucket(unit):
+        if unit not in TIME_BUCKETS:
+            raise ValueError(f"Unsupported time bucket: {unit}")
+        return unit
+
+    def stream_data(self, query, batch_size=10000, params=None, stats=None):
+        """
+        Stream the results of a SQL query in batches using a server-side cursor.
+
+        :param query: SQL query string, or a SQLAlchemy Core statement
+        :param batch_size: Number of rows fetched from the cursor per batch
+        :param params: Optional bind parameters for the query
+        :param stats: Optional RunningStats accumulator updated with every batch
+        :return: Generator of (columns, rows) tuples, rows being a list of tuples
+        """
+        with self.engine.connect() as connection:
+            statement = sa.text(query) if isinstance(query, str) else query
+            result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement, params or {})
+            columns = list(result.keys())
+            for partition in result.partitions(batch_size):
+                if stats is not None:
+                    stats.update(pd.DataFrame.from_records(partition, columns=columns))
+                yield columns, partition
+
+    def stream_columns(self, query, batch_size=10000, params=None):
+        """
+        Stream the results of a SQL query as columnar batches.
+
+        :param query: SQL query string
+        :param batch_size: Number of rows per batch
+        :param params: Optional bind parameters for the query
+        :return: Generator of dictionaries mapping each column to a list of values
+        """
+        for columns, rows in self.stream_data(query, batch_size, params):
+            values = list(zip(*rows)) if rows else [()] * len(columns)
+            yield {column: list(column_values) for column, column_values in zip(columns, values)}
+
+    def stream_arrow(self, query, batch_size=10000, params=None):
+        """
+        Stream the results of a SQL query as Arrow record batches.
+
+        The query runs and its first batch is fetched before this returns, so
+        errors surface here rather than midway through a response. The schema
+        is settled from the first batch and the result's column types, and
+        holds for every later batch, including when there are no rows.
+
+        :param query: SQL query string, or a SQLAlchemy Core statement
+        :param batch_size: Number of rows per batch
+        :param params: Optional bind parameters for the query
+        :return: pyarrow.RecordBatchReader
+        """
+        connection = self.engine.connect()
+        try:
+            statement = sa.text(query) if isinstance(query, str) else query
+            result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement, params or {})
+            columns = list(result.keys())
+            # Textual queries carry no column types; Core statements do
+            sql_types = [column.type for column in getattr(statement, 'selected_columns', [])] or [None] * len(columns)
+            rows = result.fetchmany(batch_size)
+            values = list(zip(*rows)) if rows else [()] * len(columns)
+            schema = pa.schema([(column, arrow_type(column_values, sql_type))
+                                for column, column_values, sql_type in zip(columns, values, sql_types)])
+        except Exception:
+            connection.close()
+            raise
+
+        def batches(rows):
+            try:
+                while rows:
+                    values = list(zip(*rows))
+                    yield pa.RecordBatch.from_arrays([arrow_array(column_values, field.type)
+                                                      for column_values, field in zip(values, schema)], schema=schema)
+                    rows = result.fetchmany(batch_size)
+            finally:
+                connection.close()
+
+        return pa.RecordBatchReader.from_batches(schema, batches(rows))
+
+    def fetch_page(self, query, limit, key, after=None, params=None):
+        """
+        Fetch one page of a SQL query's results, ordered by a key column.
+
+        The query is wrapped in a subquery and paged on the key
+        (WHERE key > :after ORDER BY key) with the dialect's own LIMIT syntax,
+        so pages are stable and the database never skips over earlier rows.
+
+        :param query: SQL query string
+        :param limit: Maximum number of rows to return
+        :param key: Column the pages are ordered by; its values must be unique and not null
+        :param after: Key value of the last row of the previous page, or None for the first page
+        :param params: Optional bind parameters for the query
+        :return: List of dictionaries containing the rows of the page
+        """
+        paged_query = (sa.select(sa.text('*'))
+                       .select_from(sa.text(f"({query.strip().rstrip(';')}) paged_query"))
+                       .order_by(sa.column(key))
+                       .limit(limit))
+        if after is not None:
+            paged_query = paged_query.where(sa.column(key) > sa.bindparam('paged_after', after))
+        with self.engine.connect() as connection:
+            result = connection.execute(paged_query, params or {})
+            columns = list(result.keys())
+            return [dict(zip(columns, row)) for row in result.fetchall()]
+
 # Example of a derived class for PostgreSQL
 class PostgreSQLDatabase(Database):
-    def __init__(self, user=None, password=None, host=None, port=None, db_name=None):
-        super().__init__(db_type='postgresql', user=user, password=password, host=host, port=port, db_name=db_name)
+    def __init__(self, user=None, password=None, host=None, port=None, db_name=None, registry=engine_registry):
+        super().__init__(db_type='postgresql', user=user, password=password, host=host, port=port, db_name=db_name, registry=registry)
+
+    def time_bucket(self, column, unit):
+        # date_trunc weeks start on Monday, as ISO weeks do
+        return sa.func.date_trunc(sql_constant(self.check_bucket(unit)), column)
 
 # Example of a derived class for Oracle
 class OracleDatabase(Database):
-    def __init__(self, user=None, password=None, host=None, port=None, db_name=None):
-        super().__init__(db_type='oracle', user=user, password=password, host=host, port=port, db_name=db_name)
+    def __init__(self, user=None, password=None, host=None, port=None, db_name=None, registry=engine_registry):
+        super().__init__(db_type='oracle', user=user, password=password, host=host, port=port, db_name=db_name, registry=registry)
+
+    # TRUNC formats per bucket; IW is the Monday of the ISO week
+    TRUNC_FORMATS = {'hour': 'HH24', 'day': 'DD', 'week': 'IW', 'month': 'MM', 'quarter': 'Q', 'year': 'YYYY'}
+
+    def time_bucket(self, column, unit):
+        return sa.func.trunc(column, sql_constant(self.TRUNC_FORMATS[self.check_bucket(unit)]))
+
+# Local SQLite database, mostly useful for testing without a database server
+class SQLiteDatabase(Database):
+    """A SQLite file under SQLITE_DIR, opened read-only.
+
+    db_name comes from the request, so it is resolved against the directory
+    and rejected if it points anywhere else; the file has to exist already.
+    """
+
+    def __init__(self, db_name=None, registry=engine_registry):
+        super().__init__(db_type='sqlite', user='', password='', host='', port='',
+                         db_name=self.resolve_path(db_name), registry=registry)
+
+    @staticmethod
+    def resolve_path(db_name):
+        if not db_name:
+            raise ValueError("SQLite needs a db_name.")
+        root = os.path.realpath(SQLITE_DIR)
+        path = os.path.realpath(os.path.join(root, db_name))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"SQLite databases must be in {root}.")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"SQLite database not found: {db_name}")
+        return path
+
+    def get_connection_string(self):
+        # A URI filename so the file can be opened read-only
+        return f"sqlite:///file:{urllib.parse.quote(self.db_name)}?mode=ro&uri=true"
+
+    def time_bucket(self, column, unit):
+        # SQLite stores datetimes as text; buckets come back as ISO strings
+        unit = self.check_bucket(unit)
+        if unit == 'hour':
+            return sa.func.strftime(sql_constant('%Y-%m-%d %H:00:00'), column)
+        if unit == 'day':
+            return sa.func.date(column)
+        if unit == 'week':
+            # Back six days, then forward to the next Monday: the Monday on or before the date
+            return sa.func.date(column, sql_constant('-6 days'), sql_constant('weekday 1'))
+        if unit == 'quarter':
+            months_into_quarter = (sa.cast(sa.func.strftime(sql_constant('%m'), column), sa.Integer) - 1) % 3
+            return sa.func.date(column, sql_constant('start of month'),
+                                sa.func.printf(sql_constant('-%d months'), months_into_quarter))
+        return sa.func.date(column, sql_constant(f"start of {unit}"))
 
 # Example usage
 if __name__ == "__main__":
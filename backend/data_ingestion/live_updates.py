@@ -0,0 +1,326 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from data_ingestion.dataset_registry import compact
+from data_ingestion.file_tail import FileTail
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of a file or SQL source; Sheets are polled less often to stay within Drive quotas
+DEFAULT_POLL_INTERVAL = float(os.environ.get('LIVE_POLL_INTERVAL', 0.25))
+DEFAULT_SHEETS_INTERVAL = float(os.environ.get('LIVE_SHEETS_INTERVAL', 5.0))
+# Deltas queued for one client before it is considered too slow and sent a reset instead
+DEFAULT_MAX_PENDING = int(os.environ.get('LIVE_MAX_PENDING', 256))
+
+
+def to_rows(data_frame):
+    """Rows as JSON-friendly lists: NaN becomes None and timestamps become ISO strings."""
+    values = data_frame.astype(object).where(data_frame.notna(), None)
+    return [[value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in values.itertuples(index=False, name=None)]
+
+
+class FileWatcher:
+    """Watches a registered file; CSV files are tailed, other formats are re-read when they change.
+
+    :param version: The file version the dataset was loaded from, so rows appended since are not missed
+    """
+
+    def __init__(self, data_reader, version, interval=None):
+        self.data_reader = data_reader
+        self.version = version
+        self.interval = interval or DEFAULT_POLL_INTERVAL
+        csv = data_reader.file_path.lower().endswith('.csv')
+        self.tail = FileTail(data_reader.file_path, offset=version[2]) if csv else None
+        # mtime and size at the last poll, so an unchanged file costs one stat() call
+        self.signature = None
+
+    def poll(self, current):
+        """Return the change since the last poll, or None; current() returns the registered frame (unused here)."""
+        if self.tail is not None:
+            stat = os.stat(self.data_reader.file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self.signature:
+                return None
+            self.signature = signature
+            if not self.tail.rewritten():
+                frames = list(self.tail.read_appended())
+                return ('append', pd.concat(frames, ignore_index=True)) if frames else None
+            # Rewritten rather than appended to: reload it and tail from the end of what was read
+            self.tail = FileTail(self.data_reader.file_path)
+            return 'replace', self.tail.read_consumed()
+        version = self.data_reader.version()
+        if version == self.version:
+            return None
+        self.version = version
+        return 'replace', self.data_reader.read()
+
+
+class SQLWatcher:
+    """Polls a SQL query for rows whose high-water-mark column passed the largest value seen so far."""
+
+    def __init__(self, database, query, column, last_value, batch_size=10000, interval=None):
+        self.database = database
+        # Wrapping the query keeps it as written; the alias without AS is accepted by every supported dialect.
+        # The column is quoted by the dialect, so only the query itself is taken as SQL.
+        source = sa.text(f"({query.strip().rstrip(';')}) live_source")
+        self.query = (sa.select(sa.text('*')).select_from(source)
+                      .where(sa.column(column) > sa.bindparam('high_water')).order_by(sa.column(column)))
+        self.column = column
+        self.last_value = last_value
+        self.batch_size = batch_size
+        self.interval = interval or DEFAULT_POLL_INTERVAL
+
+    def poll(self, current):
+        frames = [pd.DataFrame.from_records(rows, columns=columns)
+                  for columns, rows in self.database.stream_data(self.query, self.batch_size,
+                                                                 {"high_water": self.last_value})]
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return None
+        appended = pd.concat(frames, ignore_index=True)
+        self.last_value = appended[self.column].max()
+        if isinstance(self.last_value, np.generic):
+            self.last_value = self.last_value.item()
+        return 'append', appended
+
+
+class SheetWatcher:
+    """Polls a spreadsheet's Drive revision and diffs the values when it changes."""
+
+    def __init__(self, sheet_cache, to_frame, sheet_id, tab=None, interval=None):
+        self.sheet_cache = sheet_cache
+        self.to_frame = to_frame
+        self.sheet_id = sheet_id
+        self.tab = tab
+        self.interval = interval or DEFAULT_SHEETS_INTERVAL
+        # Unknown at first, so the first poll diffs against the registered values
+        self.revision = None
+
+    def poll(self, current):
+        """Diff the sheet against current(), the registered frame, which is only read once the revision changed."""
+        revision = self.sheet_cache.client.fetch_revision(self.sheet_id)
+        if revision == self.revision:
+            return None
+        self.revision = revision
+        if self.tab is None:
+            values = self.sheet_cache.fetch_sheet_content(self.sheet_id)
+        else:
+            values = self.sheet_cache.fetch_workbook(self.sheet_id, [self.tab]).get(self.tab, [])
+        return diff_frames(current(), compact(self.to_frame(values)))
+
+
+def diff_frames(old, new):
+    """Describe new relative to old as an append, an update of some rows, or a full replacement.
+
+    :return: ('append', frame), ('update', (positions, frame, appended frame)), ('replace', frame) or None
+    """
+    if list(old.columns) != list(new.columns) or len(new) < len(old):
+        return 'replace', new
+    # Compare as text, since the dtypes of the two frames may differ (e.g. a column turning categorical)
+    before = old.astype(str).to_numpy()
+    after = new.iloc[:len(old)].astype(str).to_numpy()
+    changed = np.flatnonzero((before != after).any(axis=1)) if len(old) else np.array([], dtype=np.int64)
+    appended = new.iloc[len(old):]
+    if len(changed):
+        return 'update', (changed, new.iloc[changed], appended)
+    if len(appended):
+        return 'append', appended
+    return None
+
+
+class Subscriber:
+    """One client's bounded queue of (delta, JSON text) messages, filled by a feed thread and read on the event loop.
+
+    Waiting costs no thread: the loop is woken through an asyncio.Event when
+    a message arrives.
+    """
+
+    def __init__(self, loop, max_pending=None):
+        self.loop = loop
+        self.max_pending = max_pending or DEFAULT_MAX_PENDING
+        self.messages = collections.deque()
+        self.lock = threading.Lock()
+        self.ready = asyncio.Event()
+
+    def put(self, message):
+        """Queue a message; False when the client fell this far behind, its queue being dropped instead."""
+        with self.lock:
+            if len(self.messages) >= self.max_pending:
+                self.messages.clear()
+                accepted = False
+            else:
+                self.messages.append(message)
+                accepted = True
+        self.loop.call_soon_threadsafe(self.ready.set)
+        return accepted
+
+    async def get(self, timeout):
+        """The next message, or None when none arrived within timeout seconds."""
+        while True:
+            with self.lock:
+                if self.messages:
+                    return self.messages.popleft()
+                self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+
+class LiveFeed:
+    """One watched dataset: a polling thread that applies changes to the registry and fans deltas out.
+
+    :param key: The parameters the watcher was built with, e.g. its high-water column
+    """
+
+    def __init__(self, registry, dataset_id, watcher, key=None):
+        self.registry = registry
+        self.dataset_id = dataset_id
+        self.watcher = watcher
+        self.key = key
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"live-{dataset_id}", daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.watcher.interval):
+            try:
+                if self.dataset_id not in self.registry:
+                    raise KeyError(self.dataset_id)
+                # Only read (and so consolidated) by watchers that diff against it, once something changed
+                change = self.watcher.poll(lambda: self.registry.get(self.dataset_id))
+                if change is not None:
+                    for delta in self.apply(*change):
+                        self.publish(delta)
+            except KeyError:
+                # The dataset was removed from the registry
+                self.publish({"type": "closed", "dataset_id": self.dataset_id})
+                self.stopped.set()
+                return
+            except Exception as e:
+                logger.error(f"Error polling dataset {self.dataset_id}: {str(e)}")
+
+    def apply(self, kind, payload):
+        """Apply a change to the registered dataset and return the deltas describing it."""
+        if kind == 'append':
+            start = self.registry.append(self.dataset_id, payload)
+            return [self.rows_delta('append', payload, start=start)]
+        if kind == 'update':
+            positions, rows, appended = payload
+            self.registry.update_rows(self.dataset_id, positions, rows)
+            deltas = [self.rows_delta('update', rows, positions=[int(position) for position in positions])]
+            if len(appended):
+                start = self.registry.append(self.dataset_id, appended)
+                deltas.append(self.rows_delta('append', appended, start=start))
+            return deltas
+        self.registry.replace(self.dataset_id, payload)
+        # A rewritten source is not sent as rows; clients page through it again
+        return [self.reset_delta()]
+
+    def reset_delta(self):
+        description = self.registry.describe(self.dataset_id)
+        return {"type": "reset", "dataset_id": self.dataset_id, "revision": description["revision"],
+                "rows": description["rows"], "columns": description["columns"]}
+
+    def rows_delta(self, kind, data_frame, **position):
+        dataset = self.registry.describe(self.dataset_id)
+        # Rows go out in the dataset's column order; columns it does not have are dropped
+        columns = [column["name"] for column in dataset["columns"]]
+        data_frame = data_frame.reindex(columns=columns)
+        return dict({"type": kind, "dataset_id": self.dataset_id, "revision": dataset["revision"],
+                     "total_rows": dataset["rows"], "columns": columns, "rows": to_rows(data_frame)}, **position)
+
+    def publish(self, delta):
+        # Serialised once for all subscribers; the delta goes along so that readers can act on its type
+        message = (delta, json.dumps(delta, default=str))
+        with self.lock:
+            for subscriber in self.subscribers:
+                if not subscriber.put(message):
+                    # Too far behind to catch up delta by delta: it pages through the dataset again
+                    if delta["type"] == "closed":
+                        subscriber.put(message)
+                    else:
+                        reset = self.reset_delta()
+                        subscriber.put((reset, json.dumps(reset, default=str)))
+
+
+class LiveUpdates:
+    """Watches the sources of registered datasets while at least one client is subscribed to them."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.feeds = {}
+        # Watchers (with the key they were built for) outlive their feeds, so a client
+        # reconnecting resumes where the last one stopped
+        self.watchers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, dataset_id, subscriber, make_watcher, key=None):
+        """Start delivering a dataset's deltas to a Subscriber.
+
+        :param make_watcher: Called with the previous watcher (or None) when none was built for this key yet
+        :param key: The watcher's parameters; while the dataset is followed they cannot change
+        """
+        with self.lock:
+            # Forget watchers of datasets removed since
+            for watched in [watched for watched in self.watchers
+                            if watched not in self.feeds and watched not in self.registry]:
+                del self.watchers[watched]
+            feed = self.feeds.get(dataset_id)
+            if feed is not None and feed.key != key:
+                raise ValueError(f"Dataset {dataset_id} is already followed with other options.")
+            if feed is None:
+                known_key, watcher = self.watchers.get(dataset_id, (None, None))
+                if watcher is None or known_key != key:
+                    watcher = make_watcher(watcher)
+                    self.watchers[dataset_id] = (key, watcher)
+                feed = LiveFeed(self.registry, dataset_id, watcher, key)
+                self.feeds[dataset_id] = feed
+                feed.thread.start()
+                logger.info(f"Watching dataset {dataset_id} for live updates")
+            with feed.lock:
+                feed.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, dataset_id, subscriber):
+        with self.lock:
+            feed = self.feeds.get(dataset_id)
+            if feed is None:
+                return
+            with feed.lock:
+                feed.subscribers.discard(subscriber)
+                idle = not feed.subscribers
+            if idle:
+                feed.stopped.set()
+                del self.feeds[dataset_id]
+                logger.info(f"Stopped watching dataset {dataset_id}")
+
+    def discard(self, dataset_id):
+        """Stop watching a removed dataset and forget its watcher."""
+        with self.lock:
+            feed = self.feeds.pop(dataset_id, None)
+            self.watchers.pop(dataset_id, None)
+        if feed is not None:
+            feed.stopped.set()
+            feed.publish({"type": "closed", "dataset_id": dataset_id})
+
+    def get_stats(self):
+        with self.lock:
+            return {dataset_id: len(feed.subscribers) for dataset_id, feed in self.feeds.items()}
+
+    def shutdown(self):
+        with self.lock:
+            for feed in self.feeds.values():
+                feed.stopped.set()
+            self.feeds.clear()
@@ -0,0 +1,205 @@
+import logging
+import os
+import re
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+from data_ingestion.add_csv import DataReader
+from data_ingestion.dataset_registry import dataset_registry
+
+try:
+    import duckdb
+except ImportError:  # Falls back to SQLite, which copies every table into memory first
+    duckdb = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.local_sql')
+TABLE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+# DuckDB table functions scanning a file in place, per extension
+DUCKDB_READERS = {
+    '.csv': 'read_csv_auto',
+    '.json': 'read_json_auto',
+    '.jsonl': 'read_json_auto',
+    '.ndjson': 'read_json_auto',
+    '.parquet': 'read_parquet',
+}
+# What a query may do in the SQLite fallback: read the loaded tables and call functions
+SQLITE_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+READ_ONLY_MESSAGE = "Only a single SELECT (or WITH ... SELECT) statement can be run."
+
+
+def sql_string(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sqlite_authorizer(action, *args):
+    return sqlite3.SQLITE_OK if action in SQLITE_READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def check_read_only(sql):
+    """Reject anything but one SELECT statement, so queries cannot write files, change settings or keep state."""
+    statements = duckdb.extract_statements(sql)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise ValueError(READ_ONLY_MESSAGE)
+
+
+def to_frame(reader):
+    """Collect query results as a DataFrame.
+
+    Decimal columns (DuckDB sums integers as 128-bit decimals) become int64
+    when they hold whole numbers that fit, and float64 otherwise, instead of
+    Python Decimal objects.
+    """
+    table = reader.read_all()
+    for index, field in enumerate(table.schema):
+        if not pa.types.is_decimal(field.type):
+            continue
+        column = table.column(index)
+        try:
+            if field.type.scale != 0:
+                raise pa.ArrowInvalid("fractional")
+            converted = column.cast(pa.int64())
+        except pa.ArrowInvalid:
+            converted = column.cast(pa.float64(), safe=False)
+        table = table.set_column(index, field.name, converted)
+    return table.to_pandas()
+
+
+class LocalSQLEngine:
+    """Ad-hoc SQL over local files and registered datasets with an embedded engine.
+
+    With DuckDB, files are exposed as views over its own readers, so a query
+    scans them in parallel, pushes filters and projections into the scan,
+    and never materialises the file in Python; results come back as Arrow
+    batches. Registered datasets (e.g. loaded sheets) are scanned from their
+    frames in place. Without DuckDB, tables are copied chunk by chunk into an
+    in-memory SQLite database for each query.
+
+    Queries are limited to a single SELECT on a database of their own: once
+    the tables are set up, file access outside them is switched off and the
+    configuration locked, and nothing they create outlives the request.
+    """
+
+    def __init__(self, registry, threads=None, memory_limit=None, temp_dir=None, use_duckdb=None):
+        self.registry = registry
+        self.threads = threads or int(os.environ.get('LOCAL_SQL_THREADS', os.cpu_count() or 1))
+        self.memory_limit = memory_limit or os.environ.get('LOCAL_SQL_MEMORY_LIMIT')
+        self.temp_dir = temp_dir or os.environ.get('LOCAL_SQL_TEMP_DIR', DEFAULT_TEMP_DIR)
+        self.use_duckdb = duckdb is not None if use_duckdb is None else use_duckdb
+
+    @property
+    def engine(self):
+        return 'duckdb' if self.use_duckdb else 'sqlite'
+
+    def connect(self):
+        """A new in-memory DuckDB database for one query."""
+        # Sorts and joins larger than memory spill to the temp directory
+        os.makedirs(self.temp_dir, exist_ok=True)
+        config = {'threads': self.threads, 'temp_directory': self.temp_dir}
+        if self.memory_limit:
+            config['memory_limit'] = self.memory_limit
+        return duckdb.connect(':memory:', config=config)
+
+    def query(self, sql, tables, batch_size=65536):
+        """Run a query over named tables and return its rows as a pyarrow.RecordBatchReader.
+
+        :param tables: Table name to {"file_path": ...} or {"dataset_id": ...}
+        """
+        for name, source in tables.items():
+            if not TABLE_NAME.match(name):
+                raise ValueError(f"Invalid table name: {name}")
+            if not source.get('file_path') and not source.get('dataset_id'):
+                raise ValueError(f"Table {name} needs a file_path or a dataset_id.")
+        if self.use_duckdb:
+            return self.query_duckdb(sql, tables, batch_size)
+        return self.query_sqlite(sql, tables, batch_size)
+
+    def query_duckdb(self, sql, tables, batch_size):
+        check_read_only(sql)
+        connection = self.connect()
+        try:
+            scanned = []
+            for name, source in tables.items():
+                if source.get('dataset_id'):
+                    # Scanned in place; registrations only live as long as the connection
+                    connection.register(name, self.registry.get(source['dataset_id']))
+                    continue
+                file_path = os.path.abspath(self.check_file(source['file_path']))
+                reader = DUCKDB_READERS.get(os.path.splitext(file_path)[1].lower())
+                if reader is None:
+                    # Excel has no DuckDB reader without an extension download; parse it with pandas instead
+                    connection.register(name, DataReader(file_path).read())
+                    continue
+                connection.execute(f'CREATE TEMP VIEW "{name}" AS SELECT * FROM {reader}({sql_string(file_path)})')
+                scanned.append(file_path)
+            # Views read their files lazily, so only those stay readable once file access is off
+            connection.execute(f"SET allowed_paths = [{', '.join(sql_string(path) for path in scanned)}]")
+            connection.execute("SET enable_external_access = false")
+            connection.execute("SET lock_configuration = true")
+            result = connection.execute(sql).fetch_record_batch(batch_size)
+        except Exception:
+            connection.close()
+            raise
+
+        def batches():
+            try:
+                yield from result
+            finally:
+                connection.close()
+
+        return pa.RecordBatchReader.from_batches(result.schema, batches())
+
+    def query_sqlite(self, sql, tables, batch_size):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        try:
+            for name, source in tables.items():
+                if source.get('dataset_id'):
+                    frames = [self.registry.get(source['dataset_id'])]
+                else:
+                    frames = DataReader(self.check_file(source['file_path'])).iter_chunks(batch_size)
+                for frame in frames:
+                    frame.to_sql(name, connection, if_exists='append', index=False)
+            connection.set_authorizer(sqlite_authorizer)
+            try:
+                cursor = connection.execute(sql)
+            except sqlite3.ProgrammingError as e:
+                raise ValueError(READ_ONLY_MESSAGE) from e
+            except sqlite3.DatabaseError as e:
+                if 'not authorized' in str(e):
+                    raise ValueError(READ_ONLY_MESSAGE) from e
+                raise
+            columns = [description[0] for description in cursor.description or []]
+            first = cursor.fetchmany(batch_size)
+        except Exception:
+            connection.close()
+            raise
+        schema = pa.RecordBatch.from_pandas(pd.DataFrame.from_records(first, columns=columns),
+                                            preserve_index=False).schema
+
+        def batches(rows):
+            try:
+                while rows:
+                    yield pa.RecordBatch.from_pandas(pd.DataFrame.from_records(rows, columns=columns),
+                                                     schema=schema, preserve_index=False)
+                    rows = cursor.fetchmany(batch_size)
+            finally:
+                connection.close()
+
+        return pa.RecordBatchReader.from_batches(schema, batches(first))
+
+    @staticmethod
+    def check_file(file_path):
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        return file_path
+
+    def get_stats(self):
+        return {"engine": self.engine, "threads": self.threads, "memory_limit": self.memory_limit}
+
+
+# Shared engine used by the API endpoints
+local_sql_engine = LocalSQLEngine(dataset_registry)
@@ -0,0 +1,186 @@
+import functools
+import logging
+import operator
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DATE_COLUMN = 'Date'
+PARTITION_COLUMN = 'Year'
+
+
+def normalize_history(history):
+    """Turn a yfinance-style history (rows indexed by date) into rows with one Date and one Year column."""
+    data_frame = history.reset_index() if DATE_COLUMN not in history.columns else history.reset_index(drop=True)
+    # Some exports carry the date twice (as the index and as a column); keep the first.
+    # Read back by pandas, the repeated header comes out as Date.1
+    data_frame = data_frame.loc[:, ~data_frame.columns.duplicated()]
+    data_frame = data_frame.drop(columns=[column for column in data_frame.columns if column == f"{DATE_COLUMN}.1"])
+    # Stored in UTC at one resolution, so every file shares a schema whatever timezone the provider uses
+    data_frame[DATE_COLUMN] = pd.to_datetime(data_frame[DATE_COLUMN], utc=True).astype('datetime64[ns, UTC]')
+    data_frame[PARTITION_COLUMN] = data_frame[DATE_COLUMN].dt.year.astype('int32')
+    return data_frame.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+
+
+def yfinance_history(symbol):
+    """History provider backed by yfinance: provider(start) returns rows from start on, or all rows for None."""
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+
+    def history(start=None):
+        if start is None:
+            return ticker.history(period="max")
+        return ticker.history(start=start.strftime('%Y-%m-%d'))
+
+    return history
+
+
+def frame_history(data_frame):
+    """History provider serving a fixed frame, e.g. an exported CSV or test data.
+
+    Like yfinance, provider(start) returns the rows from the day of start on, or all rows for None.
+    """
+    history = normalize_history(data_frame)
+
+    def provider(start=None):
+        if start is None:
+            return history
+        return history[history[DATE_COLUMN] >= MarketDataStore.to_scalar(start).normalize()]
+
+    return provider
+
+
+def csv_history(csv_path):
+    """History provider reading a CSV export such as data/NVIDIA.csv, for seeding a store without refetching."""
+    return frame_history(pd.read_csv(csv_path))
+
+
+class MarketDataStore:
+    """Append-only daily market data kept as Parquet files partitioned by year.
+
+    Files live under Year=<year>/ directories, so readers asking for a date
+    range only open the partitions that overlap it and skip row groups by
+    their Date statistics. Appends write new files and never rewrite the
+    stored history; rows at or before the last stored timestamp are dropped,
+    which makes repeated refreshes idempotent.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def partitions(self):
+        """Stored years, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = f"{PARTITION_COLUMN}="
+        return sorted(int(name[len(prefix):]) for name in os.listdir(self.root)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def partition_files(self, year):
+        directory = os.path.join(self.root, f"{PARTITION_COLUMN}={year}")
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.parquet'))
+
+    def last_timestamp(self):
+        """The newest stored Date, or None when the store is empty; only the newest partition is read."""
+        for year in reversed(self.partitions()):
+            files = self.partition_files(year)
+            if not files:
+                continue
+            newest = max(pq.read_table(file, columns=[DATE_COLUMN]).column(DATE_COLUMN).to_pandas().max()
+                         for file in files)
+            if pd.notna(newest):
+                return newest
+        return None
+
+    def append(self, data_frame):
+        """Store the rows after the last stored timestamp and return how many were written."""
+        data_frame = normalize_history(data_frame)
+        last = self.last_timestamp()
+        if last is not None:
+            data_frame = data_frame[data_frame[DATE_COLUMN] > last]
+        if data_frame.empty:
+            return 0
+        schema = self.schema()
+        for year, rows in data_frame.groupby(PARTITION_COLUMN, sort=True):
+            directory = os.path.join(self.root, f"{PARTITION_COLUMN}={year}")
+            os.makedirs(directory, exist_ok=True)
+            # Named by first timestamp, so files sort chronologically within a partition
+            first = rows[DATE_COLUMN].iloc[0]
+            name = f"part-{first.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+            table = pa.Table.from_pandas(rows.drop(columns=[PARTITION_COLUMN]), preserve_index=False)
+            if schema is not None:
+                if set(table.column_names) != set(schema.names):
+                    raise ValueError(f"Columns do not match the stored data: {', '.join(table.column_names)}")
+                table = table.select(schema.names).cast(schema)
+            temp_path = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, temp_path)
+            # Readers never see a partially written file
+            os.replace(temp_path, os.path.join(directory, name))
+        logger.info(f"Appended {len(data_frame)} rows to {self.root}")
+        return len(data_frame)
+
+    def ingest(self, history_provider):
+        """Fetch the rows after the last stored timestamp from history_provider(start) and append them.
+
+        :param history_provider: Callable taking the last stored timestamp (None when empty), e.g. yfinance_history('NVDA')
+        :return: Number of rows appended
+        """
+        last = self.last_timestamp()
+        history = history_provider(last)
+        if history is None or len(history) == 0:
+            logger.info(f"No new rows for {self.root}")
+            return 0
+        return self.append(history)
+
+    def read(self, start=None, end=None, columns=None):
+        """Rows with start <= Date <= end, sorted by Date; partitions outside the range are not opened.
+
+        :param end: Inclusive; a date without a time of day covers that whole day
+        """
+        if not self.partitions():
+            return pd.DataFrame(columns=columns or [])
+        dataset = ds.dataset(self.root, format='parquet', partitioning='hive')
+        conditions = []
+        # The Year conditions prune whole partitions; the Date ones skip row groups by their statistics
+        if start is not None:
+            start = self.to_scalar(start)
+            conditions += [ds.field(PARTITION_COLUMN) >= start.year, ds.field(DATE_COLUMN) >= start]
+        if end is not None:
+            end = self.to_scalar(end)
+            if end == end.normalize():
+                end += pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+            conditions += [ds.field(PARTITION_COLUMN) <= end.year, ds.field(DATE_COLUMN) <= end]
+        condition = functools.reduce(operator.and_, conditions) if conditions else None
+        if columns:
+            missing = [column for column in columns if column not in dataset.schema.names]
+            if missing:
+                raise ValueError(f"Unknown columns: {', '.join(missing)}")
+            columns = list(dict.fromkeys([DATE_COLUMN, *columns]))
+        table = dataset.to_table(columns=columns, filter=condition)
+        data_frame = table.to_pandas()
+        if PARTITION_COLUMN in data_frame.columns:
+            data_frame[PARTITION_COLUMN] = data_frame[PARTITION_COLUMN].astype('int32')
+        return data_frame.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+
+    def schema(self):
+        """Schema of the stored files (without the Year partition column), or None when the store is empty."""
+        for year in self.partitions():
+            files = self.partition_files(year)
+            if files:
+                return pq.read_schema(files[0]).remove_metadata()
+        return None
+
+    @staticmethod
+    def to_scalar(value):
+        """A bound as a UTC timestamp; naive values are taken to be UTC, like the stored dates."""
+        timestamp = pd.Timestamp(value)
+        return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
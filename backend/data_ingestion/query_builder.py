@@ -0,0 +1,119 @@
+import logging
+import operator
+import sqlalchemy as sa
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Same operators as dataset filters, compiled to SQL instead of evaluated in pandas
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda column, value: column.in_(list(value)),
+    'not_in': lambda column, value: column.not_in(list(value)),
+    'between': lambda column, value: column.between(*value),
+    'contains': lambda column, value: column.contains(str(value), autoescape=True),
+    'is_null': lambda column, value: column.is_(None),
+    'not_null': lambda column, value: column.is_not(None),
+}
+AGGREGATES = {
+    'count': sa.func.count,
+    'count_distinct': lambda column: sa.func.count(sa.distinct(column)),
+    'sum': sa.func.sum,
+    'mean': sa.func.avg,
+    'min': sa.func.min,
+    'max': sa.func.max,
+}
+
+
+def build_query(database, table, columns=None, filters=None, group_by=None, aggregates=None, time_bucket=None,
+                order_by=None, limit=None, schema=None):
+    """Compile a structured query into a SQLAlchemy Core SELECT for the database's dialect.
+
+    Filtering, grouping and aggregation run inside the database, so only the
+    reduced rows are fetched. Identifiers are checked against the reflected
+    table and values are bound as parameters.
+
+    :param table: Table to query
+    :param columns: Columns to return when nothing is aggregated; every column by default
+    :param filters: List of {"column", "op", "value"} with op one of FILTER_OPERATORS, all of which must hold
+    :param group_by: Columns to group by
+    :param aggregates: List of {"func", "column", "alias"} with func one of AGGREGATES; count needs no column
+    :param time_bucket: {"column", "unit", "alias"} grouping rows by the start of their hour, day, ..., year
+    :param order_by: Output column names, each prefixed with '-' for descending order
+    :param limit: Maximum number of rows
+    :return: sqlalchemy.Select
+    """
+    table = database.reflect_table(table, schema)
+
+    def column(name):
+        if name not in table.c:
+            raise ValueError(f"Unknown column: {name}")
+        return table.c[name]
+
+    selected, groups = [], []
+    if time_bucket:
+        bucket = database.time_bucket(column(time_bucket.get('column')), time_bucket.get('unit', 'day'))
+        bucket = bucket.label(time_bucket.get('alias') or 'bucket')
+        selected.append(bucket)
+        groups.append(bucket)
+    for name in group_by or []:
+        selected.append(column(name))
+        groups.append(column(name))
+    for aggregate in aggregates or []:
+        func, name = aggregate.get('func', 'count'), aggregate.get('column')
+        if func not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate: {func}")
+        if name is None and func != 'count':
+            raise ValueError(f"Aggregate {func} needs a column.")
+        argument = sa.literal_column('*') if name is None else column(name)
+        selected.append(AGGREGATES[func](argument).label(aggregate.get('alias') or
+                                                         (func if name is None else f"{func}_{name}")))
+    if groups or aggregates:
+        if columns:
+            raise ValueError("columns cannot be combined with aggregates; use group_by instead.")
+    else:
+        selected = [column(name) for name in columns] if columns else list(table.c)
+
+    statement = sa.select(*selected).select_from(table)
+    for condition in filters or []:
+        operator_name = condition.get('op', '==')
+        if operator_name not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator_name}")
+        value = condition.get('value')
+        if operator_name in ('in', 'not_in', 'between') and not isinstance(value, (list, tuple)):
+            raise ValueError(f"Operator {operator_name} needs a list of values.")
+        if operator_name == 'between' and len(value) != 2:
+            raise ValueError("Operator between needs exactly two values.")
+        statement = statement.where(FILTER_OPERATORS[operator_name](column(condition.get('column')), value))
+    if groups:
+        statement = statement.group_by(*groups)
+
+    outputs = {expression.name: expression for expression in selected}
+    for name in order_by or ([time_bucket.get('alias') or 'bucket'] if time_bucket else []):
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name not in outputs:
+            raise ValueError(f"Cannot order by {name}: it is not an output column.")
+        # Labels are ordered by name rather than repeating their expression
+        statement = statement.order_by(outputs[name].desc() if descending else outputs[name])
+    if limit is not None:
+        if limit < 0:
+            raise ValueError("limit cannot be negative.")
+        statement = statement.limit(limit)
+    return statement
+
+
+def compile_query(database, statement):
+    """Render a statement as SQL in the database's dialect, with values inlined where possible, e.g. for logs."""
+    dialect = database.engine.dialect
+    try:
+        return str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    except Exception:
+        return str(statement.compile(dialect=dialect))
@@ -0,0 +1,233 @@
+import logging
+import os
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from data_ingestion.file_tail import FileTail
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Mergeable accumulator for per-column and pairwise statistics.
+
+    Holds, for every pair of columns (i, j), the number of rows where both
+    are present, the mean of each over those rows and the co-moment
+    (sum of products of deviations). Chunks are folded in with the pairwise
+    form of Chan/Welford's update, so states built from different chunks,
+    threads or processes merge into exactly what a single pass would give.
+    Diagonal entries hold the per-column count, mean and second moment.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = []
+        size = 0
+        self.count = np.zeros((size, size))
+        self.mean = np.zeros((size, size))
+        self.m2 = np.zeros((size, size))
+        self.co_moment = np.zeros((size, size))
+        self.minimum = np.zeros(size)
+        self.maximum = np.zeros(size)
+        self.expand(list(columns))
+
+    @classmethod
+    def from_array(cls, values, columns=None):
+        """Build the state of a 2-D float array in one vectorised pass (NaN means missing)."""
+        values = np.asarray(values, dtype=np.float64)
+        stats = cls(columns if columns is not None else range(values.shape[1]))
+        if values.size == 0:
+            return stats
+
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.nanmean(values, axis=0)) if present.any() else np.zeros(values.shape[1])
+        block = values - shift
+        size = values.shape[1]
+
+        if present.all():
+            # Dense chunk: every pair sees every row, so one product is enough
+            ones = np.ones((size, size))
+            sums = block.sum(axis=0)[:, None] * ones
+            count = ones * len(block)
+            squares = (block * block).sum(axis=0)[:, None] * ones
+            products = block.T @ block
+        else:
+            mask = present.astype(np.float64)
+            filled = np.where(present, block, 0.0)
+            count = mask.T @ mask
+            sums = filled.T @ mask
+            squares = (filled * filled).T @ mask
+            products = filled.T @ filled
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # sums[i, j] is the sum of column i over the rows where columns i and j are both present
+            mean = np.where(count > 0, sums / count, 0.0)
+            stats.m2 = np.where(count > 0, squares - sums * mean, 0.0)
+            stats.co_moment = np.where(count > 0, products - sums * mean.T, 0.0)
+        stats.count = count
+        stats.mean = np.where(count > 0, mean + shift[:, None], 0.0)
+        with warnings.catch_warnings():
+            # Columns without any value yield NaN, which is what we want
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats.minimum = np.nanmin(values, axis=0)
+            stats.maximum = np.nanmax(values, axis=0)
+        return stats
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the state and return self.
+
+        The numeric columns of the first chunk define the tracked columns;
+        later chunks are aligned to them, with non-numeric values treated as
+        missing, and new numeric columns are added on the fly.
+        """
+        if not self.columns:
+            columns = list(chunk.select_dtypes(include='number').columns)
+        else:
+            columns = self.columns + [column for column in chunk.select_dtypes(include='number').columns
+                                      if column not in self.columns]
+        numeric = chunk.reindex(columns=columns).apply(pd.to_numeric, errors='coerce')
+        return self.merge(RunningStats.from_array(numeric.to_numpy(dtype=np.float64, na_value=np.nan), columns))
+
+    def merge(self, other):
+        """Merge another state into this one in place and return self."""
+        self.expand(other.columns)
+        other = other.aligned(self.columns)
+
+        count = self.count + other.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = other.mean - self.mean
+            weight = np.where(count > 0, self.count * other.count / count, 0.0)
+            share = np.where(count > 0, other.count / count, 0.0)
+        self.m2 = self.m2 + other.m2 + delta * delta * weight
+        self.co_moment = self.co_moment + other.co_moment + delta * delta.T * weight
+        self.mean = self.mean + delta * share
+        # fmin/fmax ignore the NaN held by columns that have not seen a value yet
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        self.count = count
+        return self
+
+    def expand(self, columns):
+        """Start tracking columns that are not tracked yet."""
+        new_columns = [column for column in columns if column not in self.columns]
+        if not new_columns:
+            return
+        old_size = len(self.columns)
+        size = old_size + len(new_columns)
+        for name in ('count', 'mean', 'm2', 'co_moment'):
+            grown = np.zeros((size, size))
+            grown[:old_size, :old_size] = getattr(self, name)
+            setattr(self, name, grown)
+        self.minimum = np.concatenate([self.minimum, np.full(len(new_columns), np.nan)])
+        self.maximum = np.concatenate([self.maximum, np.full(len(new_columns), np.nan)])
+        self.columns = self.columns + new_columns
+
+    def aligned(self, columns):
+        """Return a copy of the state laid out in the given column order."""
+        if columns == self.columns:
+            return self
+        stats = RunningStats(columns)
+        positions = {column: index for index, column in enumerate(columns)}
+        order = np.array([positions[column] for column in self.columns], dtype=int)
+        for name in ('count', 'mean', 'm2', 'co_moment'):
+            getattr(stats, name)[np.ix_(order, order)] = getattr(self, name)
+        stats.minimum[order] = self.minimum
+        stats.maximum[order] = self.maximum
+        return stats
+
+    def summary(self):
+        """Per-column count, mean, variance, standard deviation, min and max as a DataFrame."""
+        count = np.diag(self.count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.where(count > 1, np.diag(self.m2) / (count - 1), np.nan)
+        return pd.DataFrame({
+            'count': count,
+            'mean': np.where(count > 0, np.diag(self.mean), np.nan),
+            'variance': variance,
+            'std': np.sqrt(variance),
+            'min': np.where(count > 0, self.minimum, np.nan),
+            'max': np.where(count > 0, self.maximum, np.nan),
+        }, index=self.columns)
+
+    def covariance(self):
+        """Pairwise-complete sample covariance matrix."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = np.where(self.count > 1, self.co_moment / (self.count - 1), np.nan)
+        return pd.DataFrame(covariance, index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        """Pairwise-complete Pearson correlation matrix."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self.co_moment / np.sqrt(self.m2 * self.m2.T)
+        correlation[self.count < 2] = np.nan
+        np.clip(correlation, -1.0, 1.0, out=correlation)
+        return pd.DataFrame(correlation, index=self.columns, columns=self.columns)
+
+    def to_dict(self):
+        """Serialise the state, e.g. to send it between worker processes."""
+        return {
+            'columns': list(self.columns),
+            'count': self.count.tolist(),
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'co_moment': self.co_moment.tolist(),
+            'minimum': self.minimum.tolist(),
+            'maximum': self.maximum.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.columns = list(state['columns'])
+        for name in ('count', 'mean', 'm2', 'co_moment', 'minimum', 'maximum'):
+            setattr(stats, name, np.array(state[name], dtype=np.float64))
+        return stats
+
+
+def track_stats(chunks, stats):
+    """Pass DataFrame chunks through unchanged while folding each into stats."""
+    for chunk in chunks:
+        stats.update(chunk)
+        yield chunk
+
+
+class FileStatsTracker:
+    """Keeps running statistics per CSV file and folds in only rows appended since the last refresh.
+
+    Each file is followed by a FileTail. If the file has only grown, the new
+    complete lines are parsed and merged; if it was rewritten, the file is
+    read again from the start.
+    """
+
+    def __init__(self, chunk_size=50000):
+        self.chunk_size = chunk_size
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, file_path):
+        """Bring the statistics of a CSV file up to date and return them."""
+        path = os.path.realpath(file_path)
+        with self.lock:
+            state = self.files.get(path)
+
+            if state is not None and not state['tail'].rewritten():
+                if os.path.getsize(path) > state['tail'].offset:
+                    self.consume(state)
+                    logger.info(f"Updated statistics for {path} with appended rows")
+                return state['stats']
+
+            state = {'stats': RunningStats(), 'tail': FileTail(path, offset=0), 'rows': 0}
+            self.consume(state)
+            self.files[path] = state
+            logger.info(f"Computed statistics for {path} from scratch")
+            return state['stats']
+
+    def consume(self, state):
+        """Fold the complete lines appended since the last refresh into the state, chunk by chunk."""
+        for chunk in state['tail'].read_appended(self.chunk_size):
+            state['stats'].update(chunk)
+            state['rows'] += len(chunk)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sheet_cache')
+
+
+class SheetCache:
+    """Local cache of Google Sheets values keyed by spreadsheet ID and Drive revision.
+
+    Every read first asks Drive for the spreadsheet's modifiedTime and
+    version, which is a single lightweight metadata call. When they match
+    the cached revision the values are served locally; otherwise the cached
+    values for that spreadsheet are dropped and the requested ranges are
+    fetched again. Cached sheets are persisted as JSON so they survive
+    restarts. In memory they are kept under a byte budget (their JSON size)
+    with LRU eviction, as in DatasetCache; evicted sheets are read back from
+    disk.
+    """
+
+    def __init__(self, client, cache_dir=None, max_bytes=None):
+        self.client = client
+        self.cache_dir = cache_dir or os.environ.get('SHEET_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('SHEET_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.sheets = OrderedDict()
+        self.sizes = {}
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def fetch_sheet_content(self, sheet_id, range_name=None):
+        """Cached counterpart of GoogleDriveClient.fetch_sheet_content."""
+        key = f"range:{range_name}" if range_name else "first-tab"
+        return self.get(sheet_id, key, lambda: self.client.fetch_sheet_content(sheet_id, range_name))
+
+    def fetch_workbook(self, sheet_id, tabs=None):
+        """Cached counterpart of GoogleDriveClient.fetch_workbook."""
+        key = "tabs:" + json.dumps(sorted(tabs)) if tabs is not None else "workbook"
+        return self.get(sheet_id, key, lambda: self.client.fetch_workbook(sheet_id, tabs))
+
+    def get(self, sheet_id, key, fetch):
+        """Return the cached values for key when the sheet is unchanged, otherwise fetch them."""
+        revision = self.client.fetch_revision(sheet_id)
+
+        with self.lock:
+            entry = self.sheets.get(sheet_id)
+            nbytes = self.sizes.get(sheet_id, 0)
+            if entry is None:
+                entry, nbytes = self.load(sheet_id)
+            if entry is not None and entry['revision'] != revision:
+                logger.info(f"Sheet {sheet_id} changed since it was cached; invalidating")
+                self.stats['invalidations'] += 1
+                entry = None
+            if entry is None:
+                entry, nbytes = {'revision': revision, 'values': {}}, 0
+            self.store(sheet_id, entry, nbytes)
+
+            if key in entry['values']:
+                self.stats['hits'] += 1
+                logger.info(f"Serving sheet {sheet_id} ({key}) from cache")
+                return entry['values'][key]
+
+        values = fetch()
+        with self.lock:
+            self.stats['misses'] += 1
+            entry = self.sheets.get(sheet_id)
+            if entry is None:
+                # Evicted from memory while we were fetching
+                entry, _ = self.load(sheet_id)
+            # Only keep the values if nobody invalidated the sheet while we were fetching
+            if entry is not None and entry['revision'] == revision:
+                entry['values'][key] = values
+                self.store(sheet_id, entry, self.save(sheet_id, entry))
+        return values
+
+    def store(self, sheet_id, entry, nbytes):
+        """Keep a sheet in memory as most recently used and evict the oldest ones over the budget."""
+        self.current_bytes -= self.sizes.pop(sheet_id, 0)
+        self.sheets.pop(sheet_id, None)
+        if nbytes > self.max_bytes:
+            logger.info(f"Sheet {sheet_id} ({nbytes} bytes) exceeds the cache budget; kept on disk only")
+            return
+        self.sheets[sheet_id] = entry
+        self.sizes[sheet_id] = nbytes
+        self.current_bytes += nbytes
+        while self.current_bytes > self.max_bytes and self.sheets:
+            evicted_id, _ = self.sheets.popitem(last=False)
+            self.current_bytes -= self.sizes.pop(evicted_id)
+            self.stats['evictions'] += 1
+            logger.info(f"Evicted cached sheet {evicted_id} from memory")
+
+    def invalidate(self, sheet_id):
+        """Forget everything cached for a spreadsheet."""
+        with self.lock:
+            self.sheets.pop(sheet_id, None)
+            self.current_bytes -= self.sizes.pop(sheet_id, 0)
+            path = self.cache_path(sheet_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, sheets=len(self.sheets), bytes=self.current_bytes, max_bytes=self.max_bytes)
+
+    def cache_path(self, sheet_id):
+        return os.path.join(self.cache_dir, hashlib.sha1(sheet_id.encode()).hexdigest() + '.json')
+
+    def load(self, sheet_id):
+        """Load a cached sheet from disk with its size in bytes, or return (None, 0)."""
+        try:
+            with open(self.cache_path(sheet_id), 'r') as cache_file:
+                content = cache_file.read()
+            return json.loads(content), len(content)
+        except (OSError, ValueError):
+            return None, 0
+
+    def save(self, sheet_id, entry):
+        """Persist a cached sheet to disk and return its size in bytes."""
+        content = json.dumps(entry)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.cache_path(sheet_id)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as cache_file:
+                cache_file.write(content)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to persist sheet cache for {sheet_id}: {str(e)}")
+        return len(content)
@@ -1,10 +1,43 @@
+import asyncio
+import itertools
+import json
 import logging
-from fastapi import FastAPI, HTTPException
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
-from data_ingestion.google_sheets import GoogleDriveClient
+import sqlalchemy as sa
+from data_ingestion.google_sheets import GoogleDriveClient, values_to_dataframe
+from data_ingestion.sheet_cache import SheetCache
 from data_ingestion.add_csv import DataReader
-from data_ingestion.integrate_db import Database, PostgreSQLDatabase, OracleDatabase
+from data_ingestion.dataset_cache import dataset_cache
+from data_ingestion.dataset_registry import dataset_registry
+from data_ingestion.market_store import MarketDataStore
+from data_ingestion.live_updates import (LiveUpdates, Subscriber, FileWatcher, SQLWatcher, SheetWatcher,
+                                        DEFAULT_POLL_INTERVAL)
+from data_ingestion.integrate_db import Database, PostgreSQLDatabase, OracleDatabase, SQLiteDatabase
+from data_ingestion.query_builder import build_query, compile_query
+from data_ingestion.local_sql import local_sql_engine, to_frame
+from data_ingestion.engine_registry import engine_registry
+from data_ingestion.running_stats import RunningStats, FileStatsTracker
+from analysis.correlation import correlation_engine, matrix_to_json, METHODS as CORRELATION_METHODS
+from analysis.resampling import time_series_aggregator
+from analysis.imputation import MissingValueImputer
+from analysis.association import AssociationMiner, encode_transactions
+from analysis.sequences import SequenceDatabase, SequentialPatternMiner
+from analysis.training import model_trainer
+from analysis.projection import projection_engine
+from analysis.decimation import series_decimator
+from fastapi.responses import StreamingResponse
+from utils.serialization import (dataframe_response, chunked_response, negotiate_format, iter_record_batches,
+                                 iter_ndjson_rows, ARROW_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE)
+from utils.paging import encode_cursor, decode_cursor
+from utils.jobs import job_manager, input_hash
 from pydantic import BaseModel
 
 # Configure logging
@@ -12,7 +45,16 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Dispose pooled engines and stop background work on shutdown
+    yield
+    engine_registry.dispose_all()
+    sheets_executor.shutdown(wait=False)
+    job_manager.shutdown()
+    live_updates.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for the frontend
 app.add_middleware(
@@ -23,13 +65,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Running statistics per CSV file, refreshed with appended rows only
+file_stats_tracker = FileStatsTracker()
+
 # Google Drive Client for Sheets
 google_drive_client = GoogleDriveClient()
+# Sheet values are served from here while the Drive revision is unchanged
+sheet_cache = SheetCache(google_drive_client)
+
+# Watches the sources of registered datasets while clients follow them
+live_updates = LiveUpdates(dataset_registry)
+
+# Blocking Google API calls run here so they never stall the event loop
+SHEETS_MAX_CONCURRENCY = int(os.environ.get('SHEETS_MAX_CONCURRENCY', 4))
+sheets_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_CONCURRENCY, thread_name_prefix='sheets')
+
+async def run_sheets_call(func, *args):
+    """Run a blocking Google API call on the Sheets thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(sheets_executor, func, *args)
 
 # Define Data Request Models
 class CSVFilePath(BaseModel):
     file_path: str
 
+class CSVStreamRequest(BaseModel):
+    file_path: str
+    chunk_size: int = 50000
+
 class ExcelFilePath(BaseModel):
     file_path: str
 
@@ -40,6 +103,112 @@ class GoogleSheetRequest(BaseModel):
     sheet_id: str
     range_name: str = 'Sheet1!A1:Z1000'
 
+class GoogleSheetsBatchRequest(BaseModel):
+    sheet_ids: list[str]
+
+class CorrelationRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    # Table rows with the header as the first row, used when there is no file
+    rows: list[list] = None
+    methods: list[str] = list(CORRELATION_METHODS)
+
+class AggregationRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    date_column: str = None
+    columns: list[str] = None
+    freq: str = 'month'
+    how: str = 'mean'
+    rolling_window: int = None
+    expanding: bool = False
+    group_by: str = None
+
+class ImputationRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    strategy: str = 'rolling_mean'
+    window: int = 11
+    columns: list[str] = None
+    date_column: str = None
+
+class ImputationStreamRequest(BaseModel):
+    file_path: str
+    strategy: str = 'rolling_mean'
+    window: int = 11
+    columns: list[str] = None
+    date_column: str = None
+    chunk_size: int = 50000
+
+class AssociationRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    transaction_column: str = None
+    item_column: str = None
+    items_column: str = None
+    separator: str = ','
+    min_support: float = 0.01
+    min_confidence: float = 0.5
+    max_length: int = None
+    metric: str = 'lift'
+    top_k: int = 100
+
+class TrainingRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    task: str = 'regression'
+    model: str = 'ridge'
+    target: str
+    features: list[str] = None
+    param_grid: dict[str, list] = None
+    cv: int = 5
+
+class PredictionRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+
+class ProjectionRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    columns: list[str] = None
+    method: str = 'pca'
+    clusters: int = None
+    cluster_method: str = 'kmeans'
+    chunk_size: int = 50000
+
+class PointsRequest(BaseModel):
+    max_points: int = 20000
+    bounds: list[float] = None
+
+class ChartSeriesRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    x_column: str = None
+    columns: list[str] = None
+    kind: str = 'line'
+
+class TileRequest(BaseModel):
+    zoom: int
+    indices: list[int]
+    points_per_tile: int = 1000
+    method: str = 'lttb'
+
+class MarketDataRequest(BaseModel):
+    store_path: str
+    start: str = None
+    end: str = None
+    columns: list[str] = None
+
+class StatsRequest(BaseModel):
+    file_path: str
+
 class SQLQuery(BaseModel):
     db_type: str
     query: str
@@ -48,11 +217,86 @@ class SQLQuery(BaseModel):
     host: str = None
     port: str = None
     db_name: str = None
+    limit: int = None
+    # Unique column the pages are ordered by; required when paging
+    key: str = None
+    cursor: str = None
+    batch_size: int = 10000
+
+class DatasetRequest(BaseModel):
+    file_path: str = None
+    rows: list[list] = None
+    sql: SQLQuery = None
+    sheet_id: str = None
+    tab: str = None
+    name: str = None
+
+class FilterCondition(BaseModel):
+    column: str
+    op: str = '=='
+    value: Any = None
+
+class FilterRequest(BaseModel):
+    filters: list[FilterCondition]
+    columns: list[str] = None
+    name: str = None
+
+class QueryAggregate(BaseModel):
+    func: str = 'count'
+    column: str = None
+    alias: str = None
+
+class TimeBucket(BaseModel):
+    column: str
+    unit: str = 'day'
+    alias: str = None
+
+class StructuredQuery(BaseModel):
+    db_type: str
+    user: str = None
+    password: str = None
+    host: str = None
+    port: str = None
+    db_name: str = None
+    table: str
+    table_schema: str = None
+    columns: list[str] = None
+    filters: list[FilterCondition] = None
+    group_by: list[str] = None
+    aggregates: list[QueryAggregate] = None
+    time_bucket: TimeBucket = None
+    order_by: list[str] = None
+    limit: int = None
+    batch_size: int = 10000
+    dry_run: bool = False
+
+class LocalTable(BaseModel):
+    file_path: str = None
+    dataset_id: str = None
+
+class LocalSQLRequest(BaseModel):
+    query: str
+    tables: dict[str, LocalTable]
+    batch_size: int = 65536
+    name: str = None
+
+class SequenceRequest(BaseModel):
+    dataset_id: str = None
+    file_path: str = None
+    rows: list[list] = None
+    sql: SQLQuery = None
+    sequence_column: str
+    item_column: str
+    order_column: str = None
+    min_support: float = 0.01
+    max_gap: int = None
+    max_length: int = None
+    top_k: int = 100
 
 @app.post("/load-google-sheets")
 async def load_google_sheets():
     try:
-        sheets = google_drive_client.fetch_sheets()
+        sheets = await run_sheets_call(google_drive_client.fetch_sheets)
         logger.info(f"Successfully fetched {len(sheets)} Google Sheets")
         return sheets
     except Exception as e:
@@ -62,7 +306,7 @@ async def load_google_sheets():
 @app.post("/load-sheet-content/{sheet_id}")
 async def load_sheet_content(sheet_id: str):
     try:
-        content = google_drive_client.fetch_sheet_content(sheet_id)
+        content = await run_sheets_call(sheet_cache.fetch_sheet_content, sheet_id)
         if content is not None:
             logger.info(f"Successfully loaded content from sheet {sheet_id}")
             return content
@@ -73,52 +317,838 @@ async def load_sheet_content(sheet_id: str):
         logger.error(f"Error loading sheet content for {sheet_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to load sheet content: {str(e)}")
 
+@app.post("/load-workbook/{sheet_id}")
+async def load_workbook(sheet_id: str):
+    try:
+        workbook = await run_sheets_call(sheet_cache.fetch_workbook, sheet_id)
+        logger.info(f"Successfully loaded {len(workbook)} tabs from sheet {sheet_id}")
+        return workbook
+    except Exception as e:
+        logger.error(f"Error loading workbook {sheet_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load workbook: {str(e)}")
+
+@app.post("/load-sheet-frame/{sheet_id}")
+async def load_sheet_frame(sheet_id: str, request: Request, tab: str = None):
+    """Load one tab (the first by default) as a typed table, in the format negotiated via Accept."""
+    try:
+        if tab is None:
+            values = await run_sheets_call(sheet_cache.fetch_sheet_content, sheet_id)
+        else:
+            workbook = await run_sheets_call(sheet_cache.fetch_workbook, sheet_id, [tab])
+            if tab not in workbook:
+                raise HTTPException(status_code=404, detail=f"Tab '{tab}' not found in the sheet.")
+            values = workbook[tab]
+        df = values_to_dataframe(values)
+        logger.info(f"Successfully loaded {len(df)} rows from sheet {sheet_id}")
+        return dataframe_response(df, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading sheet {sheet_id} as a table: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load sheet: {str(e)}")
+
+@app.post("/load-sheet-contents")
+async def load_sheet_contents(data: GoogleSheetsBatchRequest):
+    """Fetch several sheets concurrently, bounded by the Sheets thread pool size."""
+    results = await asyncio.gather(
+        *(run_sheets_call(sheet_cache.fetch_sheet_content, sheet_id) for sheet_id in data.sheet_ids),
+        return_exceptions=True)
+
+    contents = {}
+    for sheet_id, result in zip(data.sheet_ids, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error loading sheet content for {sheet_id}: {str(result)}")
+            contents[sheet_id] = {"error": str(result)}
+        else:
+            contents[sheet_id] = result
+    logger.info(f"Loaded content for {len(data.sheet_ids)} sheets")
+    return contents
+
 @app.post("/load-csv")
-def load_csv(data: CSVFilePath):
+def load_csv(data: CSVFilePath, request: Request):
     try:
-        data_reader = DataReader(data.file_path)
+        data_reader = DataReader(data.file_path, cache=dataset_cache)
         df = data_reader.read_csv()
         logger.info(f"Successfully loaded CSV file: {data.file_path}")
-        return df.to_dict(orient='records')
+        return dataframe_response(df, request.headers.get('accept'))
     except Exception as e:
         logger.error(f"Error loading CSV file {data.file_path}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to load CSV file: {str(e)}")
 
+@app.post("/load-csv/stream")
+def load_csv_stream(data: CSVStreamRequest, request: Request):
+    try:
+        data_reader = DataReader(data.file_path, chunk_size=data.chunk_size)
+        chunks = data_reader.iter_csv()
+        logger.info(f"Streaming CSV file: {data.file_path}")
+        return chunked_response(chunks, request.headers.get('accept'))
+    except Exception as e:
+        logger.error(f"Error streaming CSV file {data.file_path}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to stream CSV file: {str(e)}")
+
 @app.post("/load-excel")
-def load_excel(data: ExcelFilePath):
+def load_excel(data: ExcelFilePath, request: Request):
     try:
-        data_reader = DataReader(data.file_path)
+        data_reader = DataReader(data.file_path, cache=dataset_cache)
         df = data_reader.read_excel()
         logger.info(f"Successfully loaded Excel file: {data.file_path}")
-        return df.to_dict(orient='records')
+        return dataframe_response(df, request.headers.get('accept'))
     except Exception as e:
         logger.error(f"Error loading Excel file {data.file_path}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to load Excel file: {str(e)}")
 
 @app.post("/load-json")
-def load_json(data: JSONFilePath):
+def load_json(data: JSONFilePath, request: Request):
     try:
-        data_reader = DataReader(data.file_path)
+        data_reader = DataReader(data.file_path, cache=dataset_cache)
         df = data_reader.read_json()
         logger.info(f"Successfully loaded JSON file: {data.file_path}")
-        return df.to_dict(orient='records')
+        return dataframe_response(df, request.headers.get('accept'))
     except Exception as e:
         logger.error(f"Error loading JSON file {data.file_path}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to load JSON file: {str(e)}")
 
+@app.post("/market-data")
+def market_data(data: MarketDataRequest, request: Request):
+    """Read a date range from a year-partitioned market data store; other years are never opened."""
+    try:
+        df = MarketDataStore(data.store_path).read(data.start, data.end, data.columns)
+        logger.info(f"Read {len(df)} rows from market data store {data.store_path}")
+        return dataframe_response(df, request.headers.get('accept'))
+    except ValueError as e:
+        logger.error(f"Invalid market data request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading market data store {data.store_path}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to read market data: {str(e)}")
+
+def load_table_rows(rows):
+    """Build a DataFrame from table rows whose first row holds the column names."""
+    data_frame = pd.DataFrame(rows[1:], columns=[str(name) for name in rows[0]])
+    # Rows coming from the table are strings, so recover numeric columns
+    for column in data_frame.columns:
+        converted = pd.to_numeric(data_frame[column], errors='coerce')
+        if converted.notna().sum() >= data_frame[column].replace('', None).notna().sum():
+            data_frame[column] = converted
+    return data_frame
+
+def load_source(data):
+    """Load the DataFrame a request refers to, plus a key identifying its version (None for inline rows)."""
+    if data.dataset_id:
+        try:
+            return dataset_registry.get(data.dataset_id), dataset_registry.version(data.dataset_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset: {data.dataset_id}")
+    if data.file_path:
+        data_reader = DataReader(data.file_path, cache=dataset_cache)
+        return data_reader.read(), data_reader.version()
+    if data.rows:
+        return load_table_rows(data.rows), None
+    raise HTTPException(status_code=400, detail="One of dataset_id, file_path or rows is required.")
+
+def load_dataset(data):
+    """Parse a file, SQL result or table rows into the registry and return its descriptor."""
+    if data.file_path:
+        return dataset_registry.register_file(DataReader(data.file_path, cache=dataset_cache), name=data.name)
+    if data.sql is not None:
+        database = get_database(data.sql)
+        frames = [pd.DataFrame.from_records(rows, columns=columns)
+                  for columns, rows in database.stream_data(data.sql.query, data.sql.batch_size)]
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return dataset_registry.register(frame, name=data.name or data.sql.query,
+                                         source={"db_type": data.sql.db_type, "query": data.sql.query},
+                                         origin={"sql": data.sql})
+    if data.rows:
+        return dataset_registry.register(load_table_rows(data.rows), name=data.name or "table", source={"rows": True})
+    raise HTTPException(status_code=400, detail="One of file_path, sql, sheet_id or rows is required.")
+
+@app.post("/datasets")
+async def create_dataset(data: DatasetRequest):
+    """Load data once into the server-side registry; later requests refer to it by dataset_id."""
+    try:
+        if data.sheet_id:
+            if data.tab is None:
+                values = await run_sheets_call(sheet_cache.fetch_sheet_content, data.sheet_id)
+            else:
+                workbook = await run_sheets_call(sheet_cache.fetch_workbook, data.sheet_id, [data.tab])
+                if data.tab not in workbook:
+                    raise HTTPException(status_code=404, detail=f"Tab '{data.tab}' not found in the sheet.")
+                values = workbook[data.tab]
+            descriptor = dataset_registry.register(values_to_dataframe(values), name=data.name or data.sheet_id,
+                                                   source={"sheet_id": data.sheet_id, "tab": data.tab})
+        else:
+            descriptor = await run_in_threadpool(load_dataset, data)
+        logger.info(f"Registered dataset {descriptor['dataset_id']} with {descriptor['rows']} rows")
+        return descriptor
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid dataset request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error loading dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load dataset: {str(e)}")
+
+@app.get("/datasets")
+def list_datasets():
+    return dataset_registry.list()
+
+@app.get("/datasets/{dataset_id}")
+def describe_dataset(dataset_id: str):
+    try:
+        return dataset_registry.describe(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+
+@app.delete("/datasets/{dataset_id}")
+def delete_dataset(dataset_id: str):
+    try:
+        dataset_registry.remove(dataset_id)
+        live_updates.discard(dataset_id)
+        return {"dataset_id": dataset_id, "status": "removed"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+
+@app.get("/datasets/{dataset_id}/rows")
+def dataset_rows(dataset_id: str, request: Request, offset: int = 0, limit: int = 1000,
+                 columns: list[str] = Query(None)):
+    """One page of a dataset, in the format negotiated via Accept."""
+    try:
+        if offset < 0 or limit < 0:
+            raise HTTPException(status_code=400, detail="offset and limit must not be negative.")
+        page = dataset_registry.slice(dataset_id, offset, limit, columns)
+        return dataframe_response(page, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    except ValueError as e:
+        logger.error(f"Invalid slice of dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error slicing dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to read dataset: {str(e)}")
+
+@app.post("/datasets/{dataset_id}/filter")
+def filter_dataset(dataset_id: str, data: FilterRequest):
+    """Register the rows matching every filter as a new dataset, without sending any rows back."""
+    try:
+        conditions = [condition.model_dump() for condition in data.filters]
+        descriptor = dataset_registry.filter(dataset_id, conditions, columns=data.columns, name=data.name)
+        logger.info(f"Filtered dataset {dataset_id} into {descriptor['dataset_id']} ({descriptor['rows']} rows)")
+        return descriptor
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    except ValueError as e:
+        logger.error(f"Invalid filter on dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error filtering dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to filter dataset: {str(e)}")
+
+def make_watcher(dataset, high_water_column=None, interval=None, previous=None):
+    """Build the watcher matching where a registered dataset came from.
+
+    A file watcher built before keeps its position in the file and only takes
+    the new interval, since the rows it already appended must not be read again.
+    """
+    source, origin = dataset.source or {}, dataset.origin or {}
+    if "file_path" in source and "version" in origin:
+        if isinstance(previous, FileWatcher):
+            previous.interval = interval or DEFAULT_POLL_INTERVAL
+            return previous
+        return FileWatcher(DataReader(source["file_path"], cache=dataset_cache), origin["version"], interval)
+    if "sheet_id" in source:
+        return SheetWatcher(sheet_cache, values_to_dataframe, source["sheet_id"], source.get("tab"), interval)
+    if "sql" in origin:
+        if high_water_column is None:
+            raise ValueError("high_water_column is required to follow a SQL dataset.")
+        frame = dataset_registry.get(dataset.dataset_id)
+        if high_water_column not in frame.columns:
+            raise ValueError(f"Unknown column: {high_water_column}")
+        last_value = frame[high_water_column].max() if len(frame) else None
+        if hasattr(last_value, 'item'):
+            last_value = last_value.item()
+        query = origin["sql"]
+        return SQLWatcher(get_database(query), query.query, high_water_column, last_value, query.batch_size, interval)
+    raise ValueError("This dataset has no source that can be watched.")
+
+@app.get("/datasets/{dataset_id}/live")
+async def follow_dataset(dataset_id: str, high_water_column: str = None, interval: float = None):
+    """Stream a dataset's appended and changed rows as server-sent events while its source changes.
+
+    CSV files are tailed, SQL queries are polled for rows past the largest
+    high_water_column value seen, and Sheets are diffed when their Drive
+    revision changes. Each event carries only the new or changed rows.
+    Open streams wait on the event loop, so they hold no worker thread.
+    """
+    subscriber = Subscriber(asyncio.get_running_loop())
+
+    def subscribe():
+        with dataset_registry.lock:
+            dataset = dataset_registry.datasets[dataset_id]
+        live_updates.subscribe(dataset_id, subscriber,
+                               lambda previous: make_watcher(dataset, high_water_column, interval, previous),
+                               key=(high_water_column, interval))
+
+    try:
+        # Building a watcher may query the source, so it stays off the event loop
+        await run_in_threadpool(subscribe)
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    except ValueError as e:
+        logger.error(f"Cannot follow dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error following dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to follow dataset: {str(e)}")
+
+    async def events():
+        try:
+            yield f"event: ready\ndata: {json.dumps(dataset_registry.describe(dataset_id), default=str)}\n\n"
+            while True:
+                message = await subscriber.get(timeout=15)
+                if message is None:
+                    # Comment lines act as a heartbeat, so proxies keep the connection open
+                    yield ": keep-alive\n\n"
+                    continue
+                delta, text = message
+                yield f"event: delta\ndata: {text}\n\n"
+                if delta["type"] == "closed":
+                    return
+        finally:
+            live_updates.unsubscribe(dataset_id, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/datasets/{dataset_id}/stats")
+def dataset_stats(dataset_id: str):
+    try:
+        return stats_to_json(RunningStats().update(dataset_registry.get(dataset_id)))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    except Exception as e:
+        logger.error(f"Error computing statistics for dataset {dataset_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute statistics: {str(e)}")
+
+@app.post("/correlation")
+def correlation(data: CorrelationRequest):
+    try:
+        df, cache_key = load_source(data)
+        results = correlation_engine.compute(df, data.methods, cache_key=cache_key)
+        logger.info(f"Computed correlation matrices for {len(results['columns'])} columns")
+        response = {"columns": results['columns']}
+        for method in data.methods:
+            response[method] = matrix_to_json(results[method])
+        return response
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid correlation request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error computing correlation matrices: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute correlation matrices: {str(e)}")
+
+@app.post("/aggregate")
+def aggregate(data: AggregationRequest, request: Request):
+    """Resample or group a dataset server-side so clients only receive the reduced series."""
+    try:
+        df, cache_key = load_source(data)
+        result = time_series_aggregator.aggregate(
+            df, date_column=data.date_column, columns=data.columns, freq=data.freq, how=data.how,
+            rolling_window=data.rolling_window, expanding=data.expanding, group_by=data.group_by,
+            cache_key=cache_key)
+        logger.info(f"Aggregated dataset into {len(result)} rows")
+        return dataframe_response(result, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid aggregation request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error aggregating dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate dataset: {str(e)}")
+
+@app.post("/impute")
+def impute(data: ImputationRequest, request: Request):
+    """Fill missing values in a dataset with a rolling window, interpolation or carried values."""
+    try:
+        df, _ = load_source(data)
+        imputer = MissingValueImputer(data.strategy, data.window)
+        result = imputer.impute(df, columns=data.columns, date_column=data.date_column)
+        logger.info(f"Imputed {int(df.isna().sum().sum() - result.isna().sum().sum())} missing values")
+        return dataframe_response(result, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid imputation request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error imputing dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to impute dataset: {str(e)}")
+
+@app.post("/impute/stream")
+def impute_stream(data: ImputationStreamRequest, request: Request):
+    """Impute a file chunk by chunk and stream the result, without loading it whole."""
+    try:
+        imputer = MissingValueImputer(data.strategy, data.window)
+        data_reader = DataReader(data.file_path, chunk_size=data.chunk_size)
+        chunks = imputer.impute_chunks(data_reader.iter_chunks(), columns=data.columns, date_column=data.date_column)
+        logger.info(f"Streaming imputed file: {data.file_path}")
+        return chunked_response(chunks, request.headers.get('accept'))
+    except ValueError as e:
+        logger.error(f"Invalid imputation request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error streaming imputed file {data.file_path}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to impute file: {str(e)}")
+
+def job_key(kind, data):
+    """Deduplication key for a job request, or None when its input cannot be versioned (e.g. a live SQL query)."""
+    if getattr(data, 'sql', None) is not None:
+        return None
+    if data.dataset_id:
+        # Registered datasets only change through live updates, which bump their revision
+        if data.dataset_id not in dataset_registry:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset: {data.dataset_id}")
+        return input_hash(kind, data.model_dump(), dataset_registry.version(data.dataset_id))
+    try:
+        version = DataReader(data.file_path).version() if data.file_path else None
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"File not found: {data.file_path}")
+    return input_hash(kind, data.model_dump(), version)
+
+def run_job(function, data, snapshot, *args, progress):
+    """Entry point of job processes, which start without the server's registered datasets."""
+    if snapshot is not None:
+        dataset_registry.restore(data.dataset_id, snapshot)
+    return function(data, *args, progress=progress)
+
+def submit_job(kind, function, data, *args, key=None):
+    """Submit function(data, *args, progress=...) as a job; a registered dataset is handed over as a snapshot file."""
+    if not data.dataset_id:
+        return job_manager.submit(kind, run_job, function, data, None, *args, key=key)
+    snapshot = dataset_registry.snapshot(data.dataset_id)
+    # The snapshot file is kept until the job has read it and ended
+    return job_manager.submit(kind, run_job, function, data, snapshot, *args, key=key,
+                              on_done=partial(dataset_registry.release_snapshot, snapshot))
+
+def job_response(job_id):
+    status = job_manager.status(job_id)
+    return {"job_id": job_id, "status": status['status'], "cached": status['cached']}
+
+def mine_association_rules(data, miner, progress):
+    df, _ = load_source(data)
+    progress(0.01, "Encoding transactions")
+    transactions = encode_transactions(df, data.transaction_column, data.item_column, data.items_column, data.separator)
+    return miner.mine(transactions, progress)
+
+@app.post("/mining/association")
+def association_mining(data: AssociationRequest):
+    """Start an association rule mining job; poll /jobs/{job_id} for progress."""
+    try:
+        if not (data.dataset_id or data.file_path or data.rows):
+            raise HTTPException(status_code=400, detail="One of dataset_id, file_path or rows is required.")
+        miner = AssociationMiner(min_support=data.min_support, min_confidence=data.min_confidence,
+                                 max_length=data.max_length, metric=data.metric, top_k=data.top_k)
+        job_id = submit_job('association', mine_association_rules, data, miner,
+                            key=job_key('association', data))
+        return job_response(job_id)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid mining request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting mining job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to start mining job: {str(e)}")
+
+def iter_event_chunks(data):
+    """Yield the events of a mining request as DataFrame chunks, streaming files and SQL results."""
+    if data.dataset_id:
+        yield dataset_registry.get(data.dataset_id)
+    elif data.sql is not None:
+        database = get_database(data.sql)
+        for columns, rows in database.stream_data(data.sql.query, data.sql.batch_size):
+            yield pd.DataFrame.from_records(rows, columns=columns)
+    elif data.file_path:
+        yield from DataReader(data.file_path).iter_chunks()
+    elif data.rows:
+        yield load_table_rows(data.rows)
+
+def mine_sequential_patterns(data, miner, progress):
+    database = SequenceDatabase(data.sequence_column, data.item_column, data.order_column)
+    progress(0.01, "Loading events")
+    for chunk in iter_event_chunks(data):
+        database.add_chunk(chunk)
+    return miner.mine(database.finalize(), progress)
+
+@app.post("/mining/sequential")
+def sequential_mining(data: SequenceRequest):
+    """Start a sequential pattern mining job; poll /jobs/{job_id} for progress."""
+    try:
+        if not (data.dataset_id or data.file_path or data.rows or data.sql):
+            raise HTTPException(status_code=400, detail="One of dataset_id, file_path, rows or sql is required.")
+        miner = SequentialPatternMiner(min_support=data.min_support, max_gap=data.max_gap,
+                                       max_length=data.max_length, top_k=data.top_k)
+        job_id = submit_job('sequential', mine_sequential_patterns, data, miner,
+                            key=job_key('sequential', data))
+        return job_response(job_id)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid mining request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting mining job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to start mining job: {str(e)}")
+
+def train_model(data, progress):
+    df, _ = load_source(data)
+    progress(0.02, "Loaded dataset")
+    return model_trainer.train(df, data.task, data.model, data.target, features=data.features,
+                               param_grid=data.param_grid, cv=data.cv, progress=progress)
+
+@app.post("/ml/train")
+def train(data: TrainingRequest):
+    """Start a model training job on a server-side dataset; the job result holds the model_id."""
+    try:
+        if not (data.dataset_id or data.file_path or data.rows):
+            raise HTTPException(status_code=400, detail="One of dataset_id, file_path or rows is required.")
+        job_id = submit_job('training', train_model, data, key=job_key('training', data))
+        return job_response(job_id)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid training request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting training job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to start training job: {str(e)}")
+
+@app.get("/ml/models")
+def list_models():
+    return model_trainer.list_models()
+
+@app.post("/ml/models/{model_id}/predict")
+def predict(model_id: str, data: PredictionRequest, request: Request):
+    """Score a dataset with a persisted model."""
+    try:
+        df, _ = load_source(data)
+        result = model_trainer.predict(model_id, df)
+        logger.info(f"Scored {len(result)} rows with model {model_id}")
+        return dataframe_response(result, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model_id}")
+    except ValueError as e:
+        logger.error(f"Invalid prediction request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scoring with model {model_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to score dataset: {str(e)}")
+
+def project_dataset(data, progress):
+    if data.dataset_id:
+        frame = dataset_registry.get(data.dataset_id)
+        chunk_source = lambda: (frame.iloc[start:start + data.chunk_size] for start in range(0, len(frame), data.chunk_size))
+        version = dataset_registry.version(data.dataset_id)
+    elif data.file_path:
+        chunk_source = lambda: DataReader(data.file_path).iter_chunks(data.chunk_size)
+        version = DataReader(data.file_path).version()
+    else:
+        chunk_source = lambda: iter([load_table_rows(data.rows)])
+        version = None
+    return projection_engine.project(chunk_source, columns=data.columns, method=data.method, clusters=data.clusters,
+                                     cluster_method=data.cluster_method, version=version, progress=progress)
+
+@app.post("/projection")
+def projection(data: ProjectionRequest):
+    """Start a 2-D projection and clustering job; the job result holds the projection_id and cluster summary."""
+    try:
+        if not (data.dataset_id or data.file_path or data.rows):
+            raise HTTPException(status_code=400, detail="One of dataset_id, file_path or rows is required.")
+        job_id = submit_job('projection', project_dataset, data, key=job_key('projection', data))
+        return job_response(job_id)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid projection request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting projection job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to start projection job: {str(e)}")
+
+@app.get("/projection/{projection_id}")
+def projection_metadata(projection_id: str):
+    metadata = projection_engine.metadata(projection_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail=f"Unknown projection: {projection_id}")
+    return metadata
+
+@app.post("/projection/{projection_id}/points")
+def projection_points(projection_id: str, data: PointsRequest, request: Request):
+    """Downsampled points of a projection, optionally restricted to an (x_min, y_min, x_max, y_max) viewport."""
+    try:
+        if data.bounds is not None and len(data.bounds) != 4:
+            raise HTTPException(status_code=400, detail="bounds must be [x_min, y_min, x_max, y_max].")
+        points = projection_engine.points(projection_id, max_points=data.max_points, bounds=data.bounds)
+        return dataframe_response(points, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown projection: {projection_id}")
+    except Exception as e:
+        logger.error(f"Error sampling projection {projection_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to sample projection: {str(e)}")
+
+@app.post("/charts/series")
+def chart_series(data: ChartSeriesRequest):
+    """Prepare a line or OHLC series for level-of-detail tiles; returns its series_id and x range."""
+    try:
+        df, cache_key = load_source(data)
+        description = series_decimator.prepare(df, x_column=data.x_column, columns=data.columns, kind=data.kind,
+                                               version=cache_key)
+        logger.info(f"Prepared chart series {description['series_id']}")
+        return description
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid chart request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error preparing chart series: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to prepare chart series: {str(e)}")
+
+@app.post("/charts/series/{series_id}/tiles")
+def chart_tiles(series_id: str, data: TileRequest):
+    """Decimated tiles of a prepared series at one zoom level."""
+    try:
+        return {"tiles": series_decimator.tiles(series_id, data.zoom, data.indices, data.points_per_tile, data.method)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown chart series: {series_id}")
+    except ValueError as e:
+        logger.error(f"Invalid tile request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error building tiles for series {series_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to build chart tiles: {str(e)}")
+
+def get_job_status(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return status
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return get_job_status(job_id)
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    status = get_job_status(job_id)
+    if status['status'] == 'failed':
+        raise HTTPException(status_code=500, detail=f"Job failed: {status['error']}")
+    if status['status'] != 'finished':
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    result = job_manager.result(job_id)
+    if result is None:
+        raise HTTPException(status_code=410, detail="Job result has expired.")
+    return result
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream job status changes as server-sent events until the job ends; waiting holds no worker thread."""
+    status = get_job_status(job_id)
+
+    async def events(status):
+        while True:
+            yield f"event: {status['status']}\ndata: {json.dumps(status, default=str)}\n\n"
+            if status['status'] in ('finished', 'failed', 'cancelled'):
+                return
+            version = status['version']
+            while status is not None and status['version'] == version:
+                # Comment lines act as a heartbeat, so proxies keep the connection open
+                yield ": keep-alive\n\n"
+                status = await job_manager.wait_async(job_id, version)
+            if status is None:
+                return
+
+    return StreamingResponse(events(status), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    get_job_status(job_id)
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job has already ended.")
+    return get_job_status(job_id)
+
+def stats_to_json(stats):
+    """Convert a RunningStats state to a JSON-friendly summary and covariance matrix."""
+    summary = stats.summary()
+    summary = summary.astype(object).where(summary.notna(), None)
+    return {
+        "columns": stats.columns,
+        "summary": summary.to_dict(orient='index'),
+        "covariance": matrix_to_json(stats.covariance()),
+        "pearson": matrix_to_json(stats.correlation()),
+    }
+
+@app.post("/stats")
+def column_stats(data: StatsRequest):
+    """Summary statistics and covariance, updated incrementally for CSV files that grow."""
+    try:
+        if data.file_path.lower().endswith('.csv'):
+            stats = file_stats_tracker.refresh(data.file_path)
+        else:
+            stats = RunningStats()
+            for _ in DataReader(data.file_path).iter_chunks(stats=stats):
+                pass
+        logger.info(f"Computed statistics for {data.file_path}")
+        return stats_to_json(stats)
+    except Exception as e:
+        logger.error(f"Error computing statistics for {data.file_path}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute statistics: {str(e)}")
+
+@app.get("/cache-stats")
+def cache_stats():
+    # The file cache's counters stay at the top level, where callers have always read them
+    return dict(dataset_cache.get_stats(), sheets=sheet_cache.get_stats(), registry=dataset_registry.get_stats(),
+                live=live_updates.get_stats(), local_sql=local_sql_engine.get_stats())
+
+def get_database(query):
+    """Create the Database object matching the requested database type."""
+    db_type = query.db_type.lower()
+    if db_type == 'mysql':
+        return Database(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
+    elif db_type == 'postgresql':
+        return PostgreSQLDatabase(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
+    elif db_type == 'oracle':
+        return OracleDatabase(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
+    elif db_type == 'sqlite':
+        try:
+            return SQLiteDatabase(db_name=query.db_name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    logger.error(f"Unsupported database type: {query.db_type}")
+    raise HTTPException(status_code=400, detail="Unsupported database type.")
+
+@app.post("/query")
+def structured_query(query: StructuredQuery, request: Request):
+    """Run a structured query (filters, group-by, aggregates, time bucket) inside the database.
+
+    The query is compiled to SQLAlchemy Core for the database's dialect, so
+    only the reduced rows are sent back. With dry_run the compiled SQL is
+    returned instead of being run.
+    """
+    try:
+        db = get_database(query)
+        statement = build_query(db, query.table, columns=query.columns,
+                                filters=[condition.model_dump() for condition in query.filters or []],
+                                group_by=query.group_by,
+                                aggregates=[aggregate.model_dump() for aggregate in query.aggregates or []],
+                                time_bucket=query.time_bucket.model_dump() if query.time_bucket else None,
+                                order_by=query.order_by, limit=query.limit, schema=query.table_schema)
+        if query.dry_run:
+            return {"sql": compile_query(db, statement)}
+        # Filter values stay out of the logs unless debugging
+        logger.info(f"Running structured query on {query.table} in {query.db_type} database")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Structured query SQL: {compile_query(db, statement)}")
+        if negotiate_format(request.headers.get('accept')) == 'arrow':
+            return StreamingResponse(iter_record_batches(db.stream_arrow(statement, query.batch_size)),
+                                     media_type=ARROW_STREAM_MEDIA_TYPE)
+        frames = [pd.DataFrame.from_records(rows, columns=columns)
+                  for columns, rows in db.stream_data(statement, query.batch_size)]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return dataframe_response(df, request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except sa.exc.NoSuchTableError as e:
+        logger.error(f"Unknown table in structured query: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Unknown table: {query.table}")
+    except ValueError as e:
+        logger.error(f"Invalid structured query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running structured query on {query.db_type} database: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run query: {str(e)}")
+
+@app.post("/local-sql")
+def local_sql(data: LocalSQLRequest, request: Request):
+    """Run SQL over local files and registered datasets, e.g. joining a CSV with a loaded sheet.
+
+    Each entry of tables names a file or a dataset_id for use in the query.
+    With a name, the result is registered as a dataset and its descriptor
+    returned; otherwise the rows are returned, streamed when Arrow is asked for.
+    """
+    try:
+        tables = {name: table.model_dump() for name, table in data.tables.items()}
+        for table in tables.values():
+            if table.get('dataset_id') and table['dataset_id'] not in dataset_registry:
+                raise HTTPException(status_code=404, detail=f"Unknown dataset: {table['dataset_id']}")
+        reader = local_sql_engine.query(data.query, tables, data.batch_size)
+        logger.info(f"Running local SQL over {len(tables)} tables with {local_sql_engine.engine}")
+        if data.name:
+            df = to_frame(reader)
+            return dataset_registry.register(df, name=data.name, source={"local_sql": data.query})
+        if negotiate_format(request.headers.get('accept')) == 'arrow':
+            return StreamingResponse(iter_record_batches(reader), media_type=ARROW_STREAM_MEDIA_TYPE)
+        return dataframe_response(to_frame(reader), request.headers.get('accept'))
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        logger.error(f"Missing file in local SQL request: {str(e)}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Invalid local SQL request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running local SQL: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run local SQL: {str(e)}")
+
 @app.post("/execute-sql")
-def execute_sql(query: SQLQuery):
+def execute_sql(query: SQLQuery, request: Request):
     try:
         # Determine which database to use
-        if query.db_type.lower() == 'mysql':
-            db = Database(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
-        elif query.db_type.lower() == 'postgresql':
-            db = PostgreSQLDatabase(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
-        elif query.db_type.lower() == 'oracle':
-            db = OracleDatabase(user=query.user, password=query.password, host=query.host, port=query.port, db_name=query.db_name)
-        else:
-            logger.error(f"Unsupported database type: {query.db_type}")
-            raise HTTPException(status_code=400, detail="Unsupported database type.")
+        db = get_database(query)
+
+        # Stream the whole result set when the client asks for a streaming format
+        accept_header = request.headers.get('accept') or ''
+        if negotiate_format(accept_header) == 'arrow':
+            logger.info(f"Streaming SQL results from {query.db_type} database as Arrow")
+            return StreamingResponse(iter_record_batches(db.stream_arrow(query.query, query.batch_size)),
+                                     media_type=ARROW_STREAM_MEDIA_TYPE)
+        if NDJSON_MEDIA_TYPE in accept_header:
+            logger.info(f"Streaming SQL results from {query.db_type} database as NDJSON")
+            batches = db.stream_data(query.query, query.batch_size)
+            # Run the query before the response starts, so that errors still get an error status
+            first_batch = next(batches, None)
+            batches = itertools.chain([first_batch], batches) if first_batch is not None else iter(())
+            return StreamingResponse(iter_ndjson_rows(batches), media_type=NDJSON_MEDIA_TYPE)
+
+        # Page through the results when a limit or cursor is given
+        if query.limit is not None or query.cursor is not None:
+            if not query.key:
+                raise ValueError("Paging needs a key: a unique column to order the pages by.")
+            limit = query.limit or query.batch_size
+            after = decode_cursor(query.query, query.key, query.cursor) if query.cursor else None
+            # Fetch one extra row to find out whether another page exists
+            rows = db.fetch_page(query.query, limit + 1, query.key, after)
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            logger.info(f"Fetched page of {len(rows)} rows from {query.db_type} database")
+            return {
+                "rows": rows,
+                "next_cursor": encode_cursor(query.query, query.key, rows[-1][query.key]) if has_more else None,
+            }
 
         # Fetch data from the database
         data = db.fetch_data(query.query)
@@ -128,10 +1158,19 @@ def execute_sql(query: SQLQuery):
         else:
             logger.warning("SQL query returned no data")
             raise HTTPException(status_code=404, detail="No data found.")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid SQL request for {query.db_type} database: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error executing SQL query on {query.db_type} database: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to execute SQL query: {str(e)}")
 
+@app.get("/engine-stats")
+def engine_stats():
+    return engine_registry.get_stats()
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting the FastAPI application")
@@ -0,0 +1,404 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process rlimits
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.job_results')
+DEFAULT_RESULT_TTL = 24 * 60 * 60
+PURGE_INTERVAL = 5 * 60
+TERMINAL_STATES = ('finished', 'failed', 'cancelled')
+
+
+def input_hash(kind, payload, version=None):
+    """Stable hash of a job's inputs, used to deduplicate identical submissions.
+
+    :param payload: JSON-serialisable description of the request
+    :param version: Anything identifying the version of the input data, e.g. a file's (path, mtime, size)
+    """
+    text = json.dumps([kind, payload, version], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """Finished job results as JSON files named by key, expiring ttl seconds after they were written."""
+
+    def __init__(self, directory=None, ttl=None):
+        self.directory = directory or os.environ.get('JOB_RESULTS_DIR', DEFAULT_RESULTS_DIR)
+        self.ttl = ttl if ttl is not None else int(os.environ.get('JOB_RESULT_TTL', DEFAULT_RESULT_TTL))
+        self.last_purge = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def contains(self, key):
+        try:
+            return time.time() - os.path.getmtime(self.path(key)) < self.ttl
+        except OSError:
+            return False
+
+    def get(self, key):
+        """Return the stored result, or None when it is missing or expired."""
+        if not self.contains(key):
+            return None
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read job result {key}: {str(e)}")
+            return None
+
+    def put(self, key, result):
+        # Write to a temporary file first so readers never see a partial result
+        temporary = self.path(f"{key}.{uuid.uuid4().hex}.tmp")
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(result, file, default=str)
+        os.replace(temporary, self.path(key))
+
+    def purge(self, force=False):
+        """Delete expired results; runs at most every PURGE_INTERVAL seconds unless forced."""
+        now = time.time()
+        if not force and now - self.last_purge < PURGE_INTERVAL:
+            return 0
+        self.last_purge = now
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) >= self.ttl:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Purged {removed} expired job results")
+        return removed
+
+
+def apply_limits(cpu_seconds=None, memory_mb=None):
+    """Cap the CPU time and address space of the current process."""
+    if resource is None:
+        if cpu_seconds or memory_mb:
+            logger.warning("Job resource limits are not supported on this platform")
+        return
+    if cpu_seconds:
+        # SIGXCPU at the soft limit names the cause; the hard limit one second later kills outright
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds), int(cpu_seconds) + 1))
+    if memory_mb:
+        limit = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_in_process(function, args, limits, connection):
+    """Entry point of a job process: apply limits, run the function and report back over the pipe."""
+    apply_limits(**limits)
+
+    def progress(fraction, message='', partial=None):
+        connection.send(('progress', float(fraction), message, partial))
+
+    try:
+        connection.send(('result', function(*args, progress=progress)))
+    except MemoryError:
+        connection.send(('error', "Memory limit exceeded"))
+    except Exception as e:
+        connection.send(('error', str(e)))
+    finally:
+        connection.close()
+
+
+def describe_exit(exitcode):
+    """Explain why a job process ended without reporting a result."""
+    if exitcode == -getattr(signal, 'SIGXCPU', 0):
+        return "CPU time limit exceeded"
+    if exitcode == -signal.SIGKILL:
+        return "Job process was killed, possibly for running out of memory"
+    if exitcode == -signal.SIGTERM:
+        return "Job process was terminated"
+    return f"Job process exited with code {exitcode}"
+
+
+class LocalBroker:
+    """Runs every job in its own process on this machine, at most max_concurrent at a time.
+
+    A broker only has to provide start(job_id, function, args, limits,
+    on_message) and cancel(job_id); on_message receives ('started',),
+    ('progress', fraction, message, partial), ('result', value),
+    ('error', message) or ('cancelled',). Another broker (e.g. one backed by
+    a message queue) can be plugged in through the JOB_BROKER setting.
+    """
+
+    def __init__(self, max_concurrent=None):
+        max_concurrent = max_concurrent or int(os.environ.get('JOB_MAX_CONCURRENCY', os.cpu_count() or 1))
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        # Forking the threaded server could copy locks held by other threads into the job. A fork
+        # server is started once, single-threaded, with the heavy modules preloaded; spawn is the portable fallback
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if self.context.get_start_method() == 'forkserver':
+            self.context.set_forkserver_preload(['numpy', 'pandas'])
+        self.processes = {}
+        self.cancelled = set()
+        self.lock = threading.Lock()
+
+    def start(self, job_id, function, args, limits, on_message):
+        """Run function(*args) in a new process; both are pickled, so they cannot rely on this process's state."""
+        threading.Thread(target=self.supervise, args=(job_id, function, args, limits, on_message),
+                         name=f"job-{job_id[:8]}", daemon=True).start()
+
+    def supervise(self, job_id, function, args, limits, on_message):
+        with self.slots:
+            with self.lock:
+                if job_id in self.cancelled:
+                    self.cancelled.discard(job_id)
+                    on_message(('cancelled',))
+                    return
+                receiver, sender = self.context.Pipe(duplex=False)
+                process = self.context.Process(target=run_in_process, args=(function, args, limits, sender))
+                process.start()
+                self.processes[job_id] = process
+            sender.close()
+            on_message(('started',))
+
+            reported = False
+            try:
+                while True:
+                    try:
+                        message = receiver.recv()
+                    except EOFError:
+                        break
+                    reported = reported or message[0] in ('result', 'error')
+                    on_message(message)
+            finally:
+                process.join()
+                receiver.close()
+                with self.lock:
+                    self.processes.pop(job_id, None)
+                    cancelled = job_id in self.cancelled
+                    self.cancelled.discard(job_id)
+            if cancelled:
+                on_message(('cancelled',))
+            elif not reported:
+                on_message(('error', describe_exit(process.exitcode)))
+
+    def cancel(self, job_id):
+        with self.lock:
+            self.cancelled.add(job_id)
+            process = self.processes.get(job_id)
+            if process is not None:
+                process.terminate()
+
+
+def load_broker(spec=None):
+    """Create the broker named by spec ("package.module:ClassName"), or a LocalBroker by default."""
+    spec = spec or os.environ.get('JOB_BROKER')
+    if not spec:
+        return LocalBroker()
+    module_name, _, class_name = spec.partition(':')
+    broker = getattr(importlib.import_module(module_name), class_name)()
+    logger.info(f"Using job broker {spec}")
+    return broker
+
+
+class JobManager:
+    """Tracks long-running jobs: submission, progress, cancellation and persisted results.
+
+    submit() returns a job id straight away and hands the work to the
+    broker, which by default runs it in a separate process with optional
+    CPU-time and memory limits. Jobs submitted with a key (see input_hash)
+    are deduplicated: an identical job that is still running is shared, and
+    a stored result that has not expired is returned without running again.
+    Clients poll status() or wait() for the next change, e.g. to stream
+    server-sent events.
+    """
+
+    def __init__(self, broker=None, store=None, max_jobs=1000):
+        self.broker = broker
+        self.store = store
+        self.jobs = OrderedDict()
+        self.by_key = {}
+        self.max_jobs = max_jobs
+        self.condition = threading.Condition()
+        # (event loop, asyncio.Event) of each wait_async() call in progress
+        self.waiters = set()
+        # Job id -> on_done callback of a job that has not ended yet
+        self.on_done = {}
+        self.cpu_seconds = os.environ.get('JOB_CPU_SECONDS')
+        self.memory_mb = os.environ.get('JOB_MEMORY_MB')
+
+    def setup(self):
+        """Create the broker and result store on first use, so importing the module stays cheap."""
+        if self.store is None:
+            self.store = ResultStore()
+        if self.broker is None:
+            self.broker = load_broker()
+
+    def submit(self, kind, function, *args, key=None, cpu_seconds=None, memory_mb=None, on_done=None):
+        """Run function(*args, progress=...) as a job and return its id.
+
+        function must be defined at module level and the arguments picklable, so
+        that they can be sent to another process; data held only in this
+        process (e.g. registered datasets) has to be passed by path.
+
+        :param on_done: Called once the job has ended, or straight away when no new job is run, e.g. to delete
+            files written for it
+        """
+        self.setup()
+        self.store.purge()
+        with self.condition:
+            existing = self.jobs.get(self.by_key.get(key)) if key else None
+            if existing is not None and (existing['status'] in ('queued', 'running') or
+                                         (existing['status'] == 'finished' and
+                                          self.store.contains(existing['result_key']))):
+                if on_done is not None:
+                    on_done()
+                return existing['id']
+
+            job_id = uuid.uuid4().hex
+            job = {'id': job_id, 'kind': kind, 'status': 'queued', 'progress': 0.0, 'message': '', 'partial': None,
+                   'created': time.time(), 'started': None, 'finished': None, 'error': None, 'cached': False,
+                   'result_key': key or job_id, 'version': 0}
+            self.jobs[job_id] = job
+            if key:
+                self.by_key[key] = job_id
+            if key and self.store.contains(key):
+                job.update(status='finished', progress=1.0, message='Finished', cached=True, finished=time.time())
+                logger.info(f"Serving {kind} job {job_id} from stored result")
+                self.prune()
+                if on_done is not None:
+                    on_done()
+                return job_id
+            if on_done is not None:
+                self.on_done[job_id] = on_done
+            self.prune()
+
+        limits = {'cpu_seconds': cpu_seconds or self.cpu_seconds, 'memory_mb': memory_mb or self.memory_mb}
+        self.broker.start(job_id, function, args, limits, partial(self.on_message, job_id))
+        logger.info(f"Submitted {kind} job {job_id}")
+        return job_id
+
+    def on_message(self, job_id, message):
+        """Apply a broker message to the job record and wake up waiting clients."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        kind = message[0]
+        if kind == 'result':
+            # Persist before publishing, so a client told 'finished' can always read the result
+            self.store.put(job['result_key'], message[1])
+        with self.condition:
+            if job['status'] in TERMINAL_STATES:
+                return
+            if kind == 'started':
+                job.update(status='running', started=time.time())
+            elif kind == 'progress':
+                job.update(progress=round(message[1], 4), message=message[2])
+                if message[3] is not None:
+                    job['partial'] = message[3]
+            elif kind == 'result':
+                job.update(status='finished', progress=1.0, message='Finished', partial=None, finished=time.time())
+                logger.info(f"Job {job_id} finished")
+            elif kind == 'error':
+                job.update(status='failed', error=message[1], finished=time.time())
+                logger.error(f"Job {job_id} failed: {message[1]}")
+            elif kind == 'cancelled':
+                job.update(status='cancelled', finished=time.time())
+                logger.info(f"Job {job_id} cancelled")
+            job['version'] += 1
+            self.condition.notify_all()
+            for loop, changed in self.waiters:
+                loop.call_soon_threadsafe(changed.set)
+            on_done = self.on_done.pop(job_id, None) if job['status'] in TERMINAL_STATES else None
+        if on_done is not None:
+            on_done()
+
+    def status(self, job_id):
+        """Job state without internal fields, or None for unknown ids."""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key != 'result_key'}
+
+    def wait(self, job_id, version, timeout=15.0):
+        """Block until the job changes from the given version (or timeout) and return its status."""
+        with self.condition:
+            self.condition.wait_for(lambda: job_id not in self.jobs or self.jobs[job_id]['version'] != version,
+                                    timeout=timeout)
+        return self.status(job_id)
+
+    async def wait_async(self, job_id, version, timeout=15.0):
+        """Like wait(), for use on an event loop: no thread is held while waiting."""
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        waiter = (loop, changed)
+        deadline = loop.time() + timeout
+        with self.condition:
+            self.waiters.add(waiter)
+        try:
+            while True:
+                changed.clear()
+                status = self.status(job_id)
+                remaining = deadline - loop.time()
+                if status is None or status['version'] != version or remaining <= 0:
+                    return status
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self.condition:
+                self.waiters.discard(waiter)
+
+    def result(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job['status'] != 'finished':
+            return None
+        return self.store.get(job['result_key'])
+
+    def cancel(self, job_id):
+        """Stop a queued or running job; returns False for unknown or already finished jobs."""
+        job = self.jobs.get(job_id)
+        if job is None or job['status'] in TERMINAL_STATES:
+            return False
+        self.broker.cancel(job_id)
+        if job['status'] == 'queued':
+            # Not started yet: report it now rather than when the broker gets to it
+            self.on_message(job_id, ('cancelled',))
+        return True
+
+    def prune(self):
+        """Forget the oldest finished jobs once more than max_jobs are tracked; results stay in the store."""
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in TERMINAL_STATES]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            job = self.jobs.pop(job_id)
+            if self.by_key.get(job['result_key']) == job_id:
+                del self.by_key[job['result_key']]
+
+    def shutdown(self):
+        """Terminate the jobs that are still running."""
+        for job_id, job in list(self.jobs.items()):
+            if job['status'] in ('queued', 'running') and self.broker is not None:
+                self.broker.cancel(job_id)
+
+
+# Shared job manager used by the API endpoints
+job_manager = JobManager()
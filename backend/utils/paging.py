@@ -0,0 +1,29 @@
+import base64
+import hashlib
+import json
+
+
+def query_fingerprint(query, key):
+    """Short hash identifying a query and its paging key, so cursors cannot be replayed against another one."""
+    return hashlib.sha1(json.dumps([query, key]).encode()).hexdigest()[:16]
+
+
+def encode_cursor(query, key, last):
+    """Encode the key value of the last row of the current page as an opaque cursor token.
+
+    Values JSON cannot hold (e.g. timestamps) are kept as text, which databases compare against the column.
+    """
+    payload = json.dumps({"q": query_fingerprint(query, key), "k": last}, default=str).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(query, key, cursor):
+    """Decode a cursor token into the key value to continue after, checking that it belongs to the query."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last = payload["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor token.")
+    if payload.get("q") != query_fingerprint(query, key) or last is None:
+        raise ValueError("Cursor token does not match the query.")
+    return last
@@ -0,0 +1,214 @@
+import io
+import itertools
+import json
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.responses import Response, StreamingResponse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MEDIA_TYPE = 'application/vnd.apache.parquet'
+JSON_MEDIA_TYPE = 'application/json'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Accept header values that select each columnar format
+ARROW_MEDIA_TYPES = (ARROW_STREAM_MEDIA_TYPE, 'application/vnd.apache.arrow.file', 'application/x-arrow')
+PARQUET_MEDIA_TYPES = (PARQUET_MEDIA_TYPE, 'application/parquet', 'application/x-parquet')
+
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+
+def negotiate_format(accept_header):
+    """Pick the response format ('arrow', 'parquet' or 'json') from an Accept header."""
+    if not accept_header:
+        return 'json'
+
+    ranked = []
+    for position, part in enumerate(accept_header.split(',')):
+        fields = part.strip().split(';')
+        media_type = fields[0].strip().lower()
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type))
+
+    for _, _, media_type in sorted(ranked):
+        if media_type in ARROW_MEDIA_TYPES:
+            return 'arrow'
+        if media_type in PARQUET_MEDIA_TYPES:
+            return 'parquet'
+        if media_type in (JSON_MEDIA_TYPE, '*/*', 'application/*'):
+            return 'json'
+    return 'json'
+
+
+def dataframe_to_table(df):
+    """Convert a DataFrame to an Arrow table without materializing per-row objects."""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def iter_arrow_stream(table, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield an Arrow IPC stream for the table, one record batch at a time."""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def iter_parquet(table, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield a Parquet file for the table, one row group at a time."""
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_table(pa.Table.from_batches([batch], schema=table.schema))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink):
+    """Return the bytes written to the sink so far and reset it."""
+    chunk = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return chunk
+
+
+def stream_schema(df):
+    """Arrow schema for a stream of DataFrame chunks, settled from the first one.
+
+    Integer columns are widened to float64, since a later chunk may hold
+    fractions or missing values, and columns with no values yet become
+    strings, so later chunks still fit the schema the stream started with.
+    """
+    fields = []
+    for field in dataframe_to_table(df).schema:
+        # Parsers read an empty column as all-NaN floats, which says nothing about its type
+        if pa.types.is_null(field.type) or df[field.name].isna().all():
+            field = field.with_type(pa.string())
+        elif pa.types.is_integer(field.type):
+            field = field.with_type(pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def chunk_to_table(chunk, schema):
+    """Convert a DataFrame chunk to the stream's schema, writing values of string columns as text."""
+    try:
+        return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. numbers turning up in a column that held no values in the first chunk
+        chunk = chunk.copy()
+        for field in schema:
+            if pa.types.is_string(field.type):
+                column = chunk[field.name]
+                chunk[field.name] = column.where(column.isna(), column.astype(str))
+        return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def iter_arrow_chunks(chunks):
+    """Yield an Arrow IPC stream with one record batch per DataFrame chunk.
+
+    The stream is only completed when every chunk was written; a client that
+    disconnects just closes the writer.
+    """
+    sink = io.BytesIO()
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = stream_schema(chunk)
+                writer = pa.ipc.new_stream(sink, schema)
+            for batch in chunk_to_table(chunk, schema).to_batches():
+                writer.write_batch(batch)
+            yield _drain(sink)
+        if writer is None:
+            # No rows at all still make a valid (empty) stream
+            writer = pa.ipc.new_stream(sink, pa.schema([]))
+        writer.close()
+        writer = None
+        yield _drain(sink)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def iter_ndjson_chunks(chunks):
+    """Yield newline-delimited JSON records for each DataFrame chunk."""
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        yield chunk.to_json(orient='records', lines=True, date_format='iso', double_precision=15).rstrip('\n') + '\n'
+
+
+def iter_record_batches(reader):
+    """Yield an Arrow IPC stream for a pyarrow.RecordBatchReader.
+
+    The schema is written even when there are no batches, so an empty result
+    is still a valid stream.
+    """
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, reader.schema)
+    try:
+        yield _drain(sink)
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(sink)
+        writer.close()
+        writer = None
+        yield _drain(sink)
+    finally:
+        if writer is not None:
+            writer.close()
+        reader.close()
+
+
+def iter_ndjson_rows(batches):
+    """Yield newline-delimited JSON for an iterator of (columns, rows) batches."""
+    for columns, rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+
+def chunked_response(chunks, accept_header=None):
+    """Stream DataFrame chunks to the client as they are parsed.
+
+    Arrow IPC is used when the client asks for it, otherwise NDJSON. The
+    first chunk is parsed before the response starts so that unreadable
+    files still surface as an error status.
+    """
+    chunks = iter(chunks)
+    first_chunk = next(chunks, None)
+    chunks = itertools.chain([first_chunk], chunks) if first_chunk is not None else iter(())
+    if negotiate_format(accept_header) == 'arrow':
+        return StreamingResponse(iter_arrow_chunks(chunks), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return StreamingResponse(iter_ndjson_chunks(chunks), media_type=NDJSON_MEDIA_TYPE)
+
+
+def dataframe_response(df, accept_header=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Build a response for the DataFrame in the format requested by the client."""
+    response_format = negotiate_format(accept_header)
+
+    if response_format == 'arrow':
+        table = dataframe_to_table(df)
+        logger.info(f"Streaming {table.num_rows} rows as Arrow IPC")
+        return StreamingResponse(iter_arrow_stream(table, batch_size), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    if response_format == 'parquet':
+        table = dataframe_to_table(df)
+        logger.info(f"Streaming {table.num_rows} rows as Parquet")
+        return StreamingResponse(iter_parquet(table, batch_size), media_type=PARQUET_MEDIA_TYPE)
+
+    # JSON records stay the default for clients that do not ask for a columnar format
+    return Response(content=df.to_json(orient='records', date_format='iso', double_precision=15), media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,44 @@
+import contextlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+
+
+def pool_context():
+    """Start method for worker pools: a fork server, or spawn where there is none.
+
+    Pools run inside job processes and threaded servers, and forking those
+    copies whatever locks other threads hold at that moment. The fork
+    server imports numpy and pandas once, so workers start without doing so.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload(['numpy', 'pandas'])
+    return context
+
+
+@contextlib.contextmanager
+def shared_arrays(*arrays):
+    """Write arrays to a temporary directory and yield their paths, for workers to open with open_shared.
+
+    Workers map the files instead of each receiving a pickled copy, so they
+    share the pages. The files are deleted on exit.
+    """
+    directory = tempfile.mkdtemp(prefix='shared-arrays-')
+    try:
+        paths = []
+        for index, array in enumerate(arrays):
+            path = os.path.join(directory, f"{index}.npy")
+            np.save(path, np.ascontiguousarray(array))
+            paths.append(path)
+        yield paths
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def open_shared(path):
+    """Open an array written by shared_arrays as a read-only memory map."""
+    return np.load(path, mmap_mode='r')
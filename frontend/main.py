@@ -38,10 +38,11 @@ class DataAnalysisApp(QMainWindow):
 
         try:
             self.data_table = DataTable()  # Create DataTable instance first
+            self.visualisation = Visualisation(self.data_table)
             self.data_ingestion = DataIngestion(self.data_table)  # Pass data_table instance
-            self.data_mining = DataMining()
-            self.data_preprocessing = DataPreprocessing()
-            self.machine_learning = MachineLearning()
+            self.data_mining = DataMining(self.data_table, self.visualisation)
+            self.data_preprocessing = DataPreprocessing(self.data_table, self.visualisation)
+            self.machine_learning = MachineLearning(self.data_table, self.visualisation)
 
             top_row.addWidget(self.data_ingestion)
             top_row.addWidget(self.data_mining)
@@ -58,7 +59,6 @@ class DataAnalysisApp(QMainWindow):
             main_layout.addWidget(vertical_splitter)
 
             horizontal_splitter = QSplitter(Qt.Horizontal)
-            self.visualisation = Visualisation()
 
             horizontal_splitter.addWidget(self.data_table)
             horizontal_splitter.addWidget(self.visualisation)
@@ -1,7 +1,7 @@
 import logging
 from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QPushButton, QHBoxLayout, QLabel, QLineEdit, QComboBox, QFileDialog, QMessageBox
 from PyQt5.QtCore import Qt, QTimer
-import requests
+from utils.workers import RequestWorker, start_request
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -11,6 +11,7 @@ logger = logging.getLogger(__name__)
 class DataIngestion(QGroupBox):
     def __init__(self, data_table):
         super().__init__("Data Ingestion")
+        self.workers = {}  # Running background requests, by purpose
         self.setup_ui()
         self.sheets = []  # To store fetched sheets
         self.data_table = data_table  # Reference to DataTable instance
@@ -55,64 +56,116 @@ class DataIngestion(QGroupBox):
             db_layout.addWidget(db_connect)
             layout.addLayout(db_layout)
 
+            # Status of background requests
+            status_layout = QHBoxLayout()
+            self.status_label = QLabel("")
+            self.cancel_button = QPushButton("Cancel")
+            self.cancel_button.setEnabled(False)
+            self.cancel_button.clicked.connect(self.cancel_requests)
+            status_layout.addWidget(self.status_label)
+            status_layout.addWidget(self.cancel_button)
+            layout.addLayout(status_layout)
+
             logger.info("DataIngestion UI setup completed successfully")
         except Exception as e:
             logger.error(f"Error setting up DataIngestion UI: {str(e)}")
             QMessageBox.critical(self, "Error", f"Failed to set up the UI: {str(e)}")
 
+    def run_request(self, purpose, worker, **callbacks):
+        """Start a background request, cancelling any earlier request with the same purpose."""
+        previous = self.workers.pop(purpose, None)
+        if previous is not None:
+            previous.cancel()
+
+        def done(*_):
+            if self.workers.get(purpose) is worker:
+                del self.workers[purpose]
+            self.cancel_button.setEnabled(bool(self.workers))
+
+        worker.signals.finished.connect(done)
+        worker.signals.error.connect(done)
+        worker.signals.cancelled.connect(done)
+        self.workers[purpose] = worker
+        self.cancel_button.setEnabled(True)
+        return start_request(worker, **callbacks)
+
+    def cancel_requests(self):
+        """Cancel every running background request."""
+        for worker in list(self.workers.values()):
+            worker.cancel()
+        self.status_label.setText("Cancelled")
+        logger.info("Cancelled running requests")
+
     def google_login(self):
         try:
             # Indicate loading
             self.sheets_combo.clear()
             self.sheets_combo.addItem("Loading...", None)
-            # Fetch the sheets from the FastAPI backend
-            response = requests.post("http://127.0.0.1:8000/load-google-sheets")
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
-            self.sheets = response.json()
-            self.sheets_combo.clear()
-            for sheet in self.sheets:
-                self.sheets_combo.addItem(sheet['name'], sheet['id'])
-            self.sheets_combo.setEnabled(True)
-            logger.info(f"Successfully loaded {len(self.sheets)} Google Sheets")
-        except requests.RequestException as e:
-            logger.error(f"Failed to load Google Sheets: {str(e)}")
-            self.sheets_combo.clear()
-            QMessageBox.critical(self, "Error", f"Failed to load sheets: {str(e)}")
+            self.status_label.setText("Loading sheets...")
+            # Fetch the sheets from the FastAPI backend without blocking the UI
+            self.run_request("sheets", RequestWorker("POST", "/load-google-sheets"),
+                             on_finished=self.on_sheets_loaded,
+                             on_error=self.on_sheets_error)
         except Exception as e:
             logger.error(f"Unexpected error during Google Sheets login: {str(e)}")
             self.sheets_combo.clear()
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
+    def on_sheets_loaded(self, sheets):
+        self.sheets = sheets
+        self.sheets_combo.clear()
+        for sheet in self.sheets:
+            self.sheets_combo.addItem(sheet['name'], sheet['id'])
+        self.sheets_combo.setEnabled(True)
+        self.status_label.setText(f"{len(self.sheets)} sheets")
+        logger.info(f"Successfully loaded {len(self.sheets)} Google Sheets")
+
+    def on_sheets_error(self, message):
+        logger.error(f"Failed to load Google Sheets: {message}")
+        self.sheets_combo.clear()
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to load sheets: {message}")
+
     def add_sheet_to_table(self):
         try:
             selected_sheet_id = self.sheets_combo.currentData()
             if selected_sheet_id:
                 # Fetch sheet content from the backend
-                response = requests.post(f"http://127.0.0.1:8000/load-sheet-content/{selected_sheet_id}")
-                response.raise_for_status()
-                
-                data = response.json()
-                self.data_table.display_data(data)  # Update data_table with the fetched data
-                logger.info(f"Successfully loaded and displayed sheet content for sheet ID: {selected_sheet_id}")
+                self.status_label.setText("Loading sheet...")
+                self.run_request("table", RequestWorker("POST", "/datasets", {"sheet_id": selected_sheet_id,
+                                                                               "name": self.sheets_combo.currentText()}),
+                                 on_finished=self.on_dataset_loaded,
+                                 on_error=self.on_table_error)
             else:
                 logger.warning("No sheet selected for adding to table")
                 QMessageBox.warning(self, "Warning", "Please select a sheet to add.")
-        except requests.RequestException as e:
-            logger.error(f"Failed to load sheet content: {str(e)}")
-            QMessageBox.critical(self, "Error", f"Failed to load selected sheet: {str(e)}")
         except Exception as e:
             logger.error(f"Unexpected error adding sheet to table: {str(e)}")
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
+    def on_dataset_loaded(self, dataset):
+        # The backend keeps the data; the table pages through it by dataset ID
+        self.data_table.display_dataset(dataset)
+        self.status_label.setText(f"{dataset['rows']} rows")
+        logger.info(f"Displaying dataset {dataset['dataset_id']} ({dataset['name']})")
+
+    def on_table_error(self, message):
+        logger.error(f"Failed to load data: {message}")
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to load data: {message}")
+
     def select_csv(self):
         try:
             file_dialog = QFileDialog()
             csv_file, _ = file_dialog.getOpenFileName(self, "Select CSV File", "", "CSV Files (*.csv)")
             if csv_file:
-                # Code to handle CSV
                 logger.info(f"CSV file selected: {csv_file}")
-                # Add your CSV handling logic here
+                # The file is registered as a dataset on the backend; the table then pages through it
+                self.data_table.clear_table()
+                self.status_label.setText("Loading CSV...")
+                self.run_request("table", RequestWorker("POST", "/datasets", {"file_path": csv_file}),
+                                 on_finished=self.on_dataset_loaded,
+                                 on_error=self.on_table_error)
             else:
                 logger.info("CSV file selection cancelled")
         except Exception as e:
@@ -1,22 +1,140 @@
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QComboBox, QPushButton
+import logging
+from PyQt5.QtWidgets import (QGroupBox, QVBoxLayout, QFormLayout, QComboBox, QPushButton, QDoubleSpinBox, QSpinBox, QLineEdit,
+                             QProgressBar, QLabel, QMessageBox)
+from utils.workers import JobPoller
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class DataMining(QGroupBox):
-    def __init__(self):
+    ENDPOINTS = {"Association Rule Mining": "/mining/association", "Sequential Pattern Mining": "/mining/sequential"}
+
+    def __init__(self, data_table=None, visualisation=None):
         super().__init__("Data Mining")
+        self.data_table = data_table
+        self.visualisation = visualisation
+        self.mode = None
+        self.poller = JobPoller(self)
+        self.poller.progress.connect(self.on_progress)
+        self.poller.finished.connect(self.on_result_ready)
+        self.poller.failed.connect(self.on_mining_error)
         self.setup_ui()
 
     def setup_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        mining_combo = QComboBox()
-        mining_combo.addItems(["Association Rule Mining", "Sequential Pattern Mining"])
-        layout.addWidget(mining_combo)
+        self.mining_combo = QComboBox()
+        self.mining_combo.addItems(list(self.ENDPOINTS))
+        layout.addWidget(self.mining_combo)
+
+        form = QFormLayout()
+        self.support_spin = QDoubleSpinBox()
+        self.support_spin.setDecimals(4)
+        self.support_spin.setRange(0.0001, 1.0)
+        self.support_spin.setSingleStep(0.005)
+        self.support_spin.setValue(0.01)
+        form.addRow("Min support", self.support_spin)
+        self.confidence_spin = QDoubleSpinBox()
+        self.confidence_spin.setRange(0.0, 1.0)
+        self.confidence_spin.setSingleStep(0.05)
+        self.confidence_spin.setValue(0.5)
+        form.addRow("Min confidence", self.confidence_spin)
+        # For association rules, leave both empty when every row is one transaction
+        self.transaction_edit = QLineEdit()
+        self.transaction_edit.setPlaceholderText("optional for association rules")
+        form.addRow("Transaction / sequence column", self.transaction_edit)
+        self.item_edit = QLineEdit()
+        self.item_edit.setPlaceholderText("optional for association rules")
+        form.addRow("Item column", self.item_edit)
+        self.order_edit = QLineEdit()
+        self.order_edit.setPlaceholderText("optional, e.g. a timestamp")
+        form.addRow("Order column", self.order_edit)
+        self.gap_spin = QSpinBox()
+        self.gap_spin.setRange(0, 1000)
+        self.gap_spin.setSpecialValueText("no limit")
+        form.addRow("Max gap", self.gap_spin)
+        layout.addLayout(form)
 
-        mining_button = QPushButton("Run Mining")
-        mining_button.clicked.connect(self.run_mining)
-        layout.addWidget(mining_button)
+        self.mining_button = QPushButton("Run Mining")
+        self.mining_button.clicked.connect(self.run_mining)
+        layout.addWidget(self.mining_button)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
 
     def run_mining(self):
-        # Implement data mining logic here
-        pass
+        """Start a mining job on the backend and poll it until the result is ready."""
+        try:
+            payload = self.data_table.request_source() if self.data_table else None
+            if payload is None:
+                QMessageBox.warning(self, "Warning", "Please load data first.")
+                return
+            self.mode = self.mining_combo.currentText()
+            transaction_column = self.transaction_edit.text().strip()
+            item_column = self.item_edit.text().strip()
+            payload["min_support"] = self.support_spin.value()
+            if self.mode == "Sequential Pattern Mining":
+                if not (transaction_column and item_column):
+                    QMessageBox.warning(self, "Warning", "Please enter the sequence and item columns.")
+                    return
+                payload.update(sequence_column=transaction_column, item_column=item_column,
+                               order_column=self.order_edit.text().strip() or None,
+                               max_gap=self.gap_spin.value() or None)
+            else:
+                payload["min_confidence"] = self.confidence_spin.value()
+                if transaction_column or item_column:
+                    payload.update(transaction_column=transaction_column, item_column=item_column)
+
+            self.mining_button.setEnabled(False)
+            self.progress_bar.setValue(0)
+            self.status_label.setText("Submitting job...")
+            self.poller.submit(self.ENDPOINTS[self.mode], payload)
+        except Exception as e:
+            logger.error(f"Error running mining: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to run mining: {str(e)}")
+
+    def on_progress(self, percent, message):
+        self.progress_bar.setValue(percent)
+        self.status_label.setText(message)
+
+    def on_result_ready(self, result):
+        self.mining_button.setEnabled(True)
+        if self.mode == "Sequential Pattern Mining":
+            self.show_patterns(result)
+        else:
+            self.show_rules(result)
+
+    def show_rules(self, result):
+        self.status_label.setText(f"{result['frequent_itemsets']} frequent itemsets in {result['transactions']} transactions")
+        records = [{
+            "antecedents": ", ".join(rule["antecedents"]),
+            "consequents": ", ".join(rule["consequents"]),
+            "support": round(rule["support"], 4),
+            "confidence": round(rule["confidence"], 4),
+            "lift": round(rule["lift"], 4),
+        } for rule in result["rules"]]
+        if self.visualisation is not None:
+            self.visualisation.display_records(records)
+        logger.info(f"Displayed {len(records)} association rules")
+
+    def show_patterns(self, result):
+        self.status_label.setText(f"{result['frequent_patterns']} frequent patterns in {result['sequences']} sequences")
+        records = [{
+            "pattern": " -> ".join(pattern["pattern"]),
+            "length": pattern["length"],
+            "support": round(pattern["support"], 4),
+        } for pattern in result["patterns"]]
+        if self.visualisation is not None:
+            self.visualisation.display_records(records)
+        logger.info(f"Displayed {len(records)} sequential patterns")
+
+    def on_mining_error(self, message):
+        self.mining_button.setEnabled(True)
+        self.status_label.setText("Mining failed")
+        QMessageBox.critical(self, "Error", f"Mining failed: {message}")
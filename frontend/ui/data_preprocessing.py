@@ -1,14 +1,33 @@
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QPushButton
+import logging
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QPushButton, QComboBox, QMessageBox, QInputDialog
+from utils.workers import RequestWorker, start_request, JobPoller
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class DataPreprocessing(QGroupBox):
-    def __init__(self):
+    MATRIX_METHODS = {"Covariance": "covariance", "Pearson": "pearson", "Spearman": "spearman"}
+
+    def __init__(self, data_table=None, visualisation=None):
         super().__init__("Data Preprocessing")
+        self.data_table = data_table
+        self.visualisation = visualisation
+        self.worker = None
+        self.poller = JobPoller(self)
+        self.poller.finished.connect(self.on_regression_ready)
+        self.poller.failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Regression failed: {message}"))
         self.setup_ui()
 
     def setup_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
+        self.matrix_combo = QComboBox()
+        self.matrix_combo.addItems(list(self.MATRIX_METHODS))
+        layout.addWidget(self.matrix_combo)
+
         covariance_button = QPushButton("Generate Covariance Matrix")
         covariance_button.clicked.connect(self.generate_covariance)
         layout.addWidget(covariance_button)
@@ -18,9 +37,46 @@ class DataPreprocessing(QGroupBox):
         layout.addWidget(regularisation_button)
 
     def generate_covariance(self):
-        # Implement covariance generation
-        pass
+        try:
+            payload = self.data_table.request_source() if self.data_table else None
+            if payload is None:
+                QMessageBox.warning(self, "Warning", "Please load data first.")
+                return
+            method = self.MATRIX_METHODS[self.matrix_combo.currentText()]
+            payload["methods"] = [method]
+            if self.worker is not None:
+                self.worker.cancel()
+            self.worker = start_request(RequestWorker("POST", "/correlation", payload),
+                                        on_finished=lambda result: self.on_matrix_ready(method, result),
+                                        on_error=lambda message: QMessageBox.critical(self, "Error", f"Failed to compute matrix: {message}"))
+        except Exception as e:
+            logger.error(f"Error generating covariance matrix: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to generate matrix: {str(e)}")
+
+    def on_matrix_ready(self, method, result):
+        if self.visualisation is not None:
+            self.visualisation.display_matrix(result["columns"], result[method])
+        logger.info(f"Displayed {method} matrix for {len(result['columns'])} columns")
 
     def perform_regularization(self):
-        # Implement regularization
-        pass
+        """Fit a cross-validated elastic net, which shows how strongly each feature survives regularisation."""
+        try:
+            payload = self.data_table.request_source() if self.data_table else None
+            headers = self.data_table.model.headers if self.data_table else None
+            if payload is None or not headers:
+                QMessageBox.warning(self, "Warning", "Please load data first.")
+                return
+            target, accepted = QInputDialog.getItem(self, "Regression Analysis", "Target column:",
+                                                    [str(header) for header in headers], 0, False)
+            if not accepted:
+                return
+            payload.update(task="regression", model="elastic_net", target=target)
+            self.poller.submit("/ml/train", payload)
+        except Exception as e:
+            logger.error(f"Error performing regression analysis: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to perform regression analysis: {str(e)}")
+
+    def on_regression_ready(self, result):
+        if self.visualisation is not None:
+            self.visualisation.display_model(result)
+        logger.info(f"Displayed regression analysis for model {result['model_id']}")
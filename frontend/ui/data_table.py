@@ -1,5 +1,9 @@
 import logging
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QTableWidget, QTableWidgetItem, QMessageBox
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QTableView, QMessageBox, QCheckBox, QInputDialog
+from utils.table_model import DataFrameTableModel
+from utils.api_client import session, url
+from utils.workers import EventStream
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -7,8 +11,14 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 class DataTable(QGroupBox):
+    # Live deltas applied to the dataset on display, for views that follow it (e.g. charts)
+    live_delta = pyqtSignal(dict)
+
     def __init__(self):
         super().__init__("Data Table")
+        self.source = None  # Where the displayed data came from, e.g. {"dataset_id": ...}
+        self.dataset = None  # Descriptor of the backend dataset on display: ID, schema and row count
+        self.live_stream = None
         try:
             self.setup_ui()
             logger.info("DataTable UI component initialized")
@@ -21,7 +31,17 @@ class DataTable(QGroupBox):
             layout = QVBoxLayout()
             self.setLayout(layout)
 
-            self.data_table = QTableWidget()
+            # Only the rows a source appends or changes are pushed, instead of reloading the table
+            self.live_checkbox = QCheckBox("Live updates")
+            self.live_checkbox.setEnabled(False)
+            self.live_checkbox.toggled.connect(self.toggle_live)
+            layout.addWidget(self.live_checkbox)
+
+            # The view only asks the model for visible cells, so large tables open instantly
+            self.model = DataFrameTableModel(self)
+            self.data_table = QTableView()
+            self.data_table.setModel(self.model)
+            self.data_table.verticalHeader().setDefaultSectionSize(22)
             layout.addWidget(self.data_table)
             
             logger.info("DataTable UI setup completed successfully")
@@ -29,25 +49,17 @@ class DataTable(QGroupBox):
             logger.error(f"Error setting up DataTable UI: {str(e)}")
             QMessageBox.critical(self, "Error", f"Failed to set up the DataTable UI: {str(e)}")
 
-    def display_data(self, data):
+    def display_data(self, data, headers=None):
         """Display data in the table."""
         try:
             if data:
                 if not isinstance(data, list) or not all(isinstance(row, list) for row in data):
                     raise ValueError("Invalid data format. Expected a list of lists.")
                 
-                self.data_table.setRowCount(len(data))
-                self.data_table.setColumnCount(len(data[0]))
-
-                for row_index, row in enumerate(data):
-                    for column_index, value in enumerate(row):
-                        self.data_table.setItem(row_index, column_index, QTableWidgetItem(str(value)))
-                
-                logger.info(f"Successfully displayed data in table. Rows: {len(data)}, Columns: {len(data[0])}")
+                self.model.set_rows(data, headers)
+                logger.info(f"Successfully displayed data in table. Rows: {self.model.rowCount()}, Columns: {self.model.columnCount()}")
             else:
-                self.data_table.clear()
-                self.data_table.setRowCount(0)
-                self.data_table.setColumnCount(0)
+                self.model.clear()
                 logger.info("Cleared the data table due to empty data")
         except ValueError as ve:
             logger.error(f"Invalid data format: {str(ve)}")
@@ -59,26 +71,132 @@ class DataTable(QGroupBox):
     def clear_table(self):
         """Clear the data table."""
         try:
-            self.data_table.clear()
-            self.data_table.setRowCount(0)
-            self.data_table.setColumnCount(0)
+            self.stop_live()
+            self.source = None
+            self.dataset = None
+            self.live_checkbox.setEnabled(False)
+            self.model.clear()
             logger.info("Data table cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing data table: {str(e)}")
             QMessageBox.critical(self, "Error", f"Failed to clear data table: {str(e)}")
 
+    def display_paged(self, page_loader, total_rows, headers=None, page_size=1000):
+        """Display a table whose rows are fetched lazily with page_loader(offset, limit)."""
+        try:
+            self.model.set_page_loader(page_loader, total_rows, headers, page_size)
+            # Load the first page right away; later pages arrive as the view scrolls
+            self.model.fetchMore()
+            logger.info(f"Displaying paged data in table. Total rows: {total_rows}")
+        except Exception as e:
+            logger.error(f"Error displaying paged data in table: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to display data: {str(e)}")
+
+    def display_dataset(self, dataset, page_size=1000):
+        """Display a dataset registered on the backend; only the pages the view scrolls to are fetched."""
+        headers = [column["name"] for column in dataset["columns"]]
+
+        def load_page(offset, limit):
+            response = session.get(url(f"/datasets/{dataset['dataset_id']}/rows"),
+                                   params={"offset": offset, "limit": limit}, timeout=60)
+            response.raise_for_status()
+            return [[record.get(header) for header in headers] for record in response.json()]
+
+        if self.dataset is None or self.dataset["dataset_id"] != dataset["dataset_id"]:
+            self.stop_live()
+        self.source = {"dataset_id": dataset["dataset_id"]}
+        self.dataset = dataset
+        self.live_checkbox.setEnabled(True)
+        self.display_paged(load_page, dataset["rows"], headers, page_size)
+
+    def toggle_live(self, checked):
+        if checked:
+            self.start_live()
+        else:
+            self.stop_live()
+
+    def start_live(self):
+        """Follow the dataset on display: its source is watched on the backend and deltas are pushed here."""
+        if self.dataset is None or self.live_stream is not None:
+            return
+        params = {}
+        if "query" in (self.dataset.get("source") or {}):
+            # New SQL rows are found through a column that only grows, such as an ID or a timestamp
+            headers = [column["name"] for column in self.dataset["columns"]]
+            column, accepted = QInputDialog.getItem(self, "Live updates", "Column that increases with new rows:",
+                                                    headers, 0, False)
+            if not accepted:
+                self.live_checkbox.setChecked(False)
+                return
+            params["high_water_column"] = column
+        self.live_stream = EventStream(f"/datasets/{self.dataset['dataset_id']}/live", params, self)
+        self.live_stream.event.connect(self.on_live_event)
+        self.live_stream.failed.connect(self.on_live_failed)
+        self.live_stream.start()
+        logger.info(f"Following dataset {self.dataset['dataset_id']}")
+
+    def stop_live(self):
+        if self.live_stream is not None:
+            self.live_stream.stop()
+            self.live_stream = None
+            logger.info("Stopped following the dataset")
+        if self.live_checkbox.isChecked():
+            self.live_checkbox.blockSignals(True)
+            self.live_checkbox.setChecked(False)
+            self.live_checkbox.blockSignals(False)
+
+    def on_live_event(self, name, delta):
+        if name != "delta" or self.dataset is None or delta.get("dataset_id") != self.dataset["dataset_id"]:
+            return
+        try:
+            kind = delta["type"]
+            if kind == "append":
+                if delta["start"] == self.model.rowCount() and not self.model.canFetchMore():
+                    # Everything up to the new rows is loaded, so they can be shown right away
+                    self.model.append_rows(delta["rows"])
+                else:
+                    self.model.extend_total(delta["total_rows"])
+            elif kind == "update":
+                self.model.update_rows(delta["positions"], delta["rows"])
+            elif kind == "reset":
+                # The source was rewritten; page through the new contents
+                self.display_dataset(dict(self.dataset, rows=delta["rows"], columns=delta["columns"]))
+            elif kind == "closed":
+                self.stop_live()
+                return
+            self.dataset = dict(self.dataset, rows=delta.get("total_rows", delta.get("rows")), revision=delta["revision"])
+            self.live_delta.emit(delta)
+        except Exception as e:
+            logger.error(f"Error applying live update: {str(e)}")
+
+    def on_live_failed(self, message):
+        self.stop_live()
+        QMessageBox.warning(self, "Warning", f"Live updates stopped: {message}")
+
+    def append_rows(self, rows, headers=None):
+        """Append rows to the table without redrawing the rows already shown."""
+        try:
+            self.model.append_rows(rows, headers)
+        except Exception as e:
+            logger.error(f"Error appending rows to table: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to append rows: {str(e)}")
+
+    def request_source(self):
+        """Describe the loaded data for the backend: its dataset ID or source file when known, otherwise the rows."""
+        if self.source:
+            return dict(self.source)
+        rows = self.get_data()
+        if not rows:
+            return None
+        headers = self.model.headers
+        return {"rows": ([list(headers)] + rows) if headers else rows}
+
     def get_data(self):
         """Retrieve data from the table."""
         try:
-            rows = self.data_table.rowCount()
-            cols = self.data_table.columnCount()
-            data = []
-            for row in range(rows):
-                row_data = []
-                for col in range(cols):
-                    item = self.data_table.item(row, col)
-                    row_data.append(item.text() if item else "")
-                data.append(row_data)
+            rows = self.model.rowCount()
+            cols = self.model.columnCount()
+            data = self.model.to_rows()
             logger.info(f"Successfully retrieved data from table. Rows: {rows}, Columns: {cols}")
             return data
         except Exception as e:
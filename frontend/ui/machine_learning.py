@@ -1,26 +1,116 @@
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QPushButton
+import logging
+from PyQt5.QtWidgets import (QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QComboBox, QProgressBar, QLabel,
+                             QMessageBox)
+from utils.workers import JobPoller
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class MachineLearning(QGroupBox):
-    def __init__(self):
+    REGRESSION_MODELS = {"Ridge": "ridge", "Lasso": "lasso", "Linear": "linear", "Elastic Net": "elastic_net",
+                         "Decision Tree": "decision_tree", "Random Forest": "random_forest",
+                         "Gradient Boosting": "gradient_boosting"}
+    CLASSIFICATION_MODELS = {"Logistic": "logistic", "Decision Tree": "decision_tree",
+                             "Random Forest": "random_forest", "Gradient Boosting": "gradient_boosting"}
+
+    def __init__(self, data_table=None, visualisation=None):
         super().__init__("Machine Learning")
+        self.data_table = data_table
+        self.visualisation = visualisation
+        self.poller = JobPoller(self)
+        self.poller.progress.connect(self.on_progress)
+        self.poller.finished.connect(self.on_model_trained)
+        self.poller.failed.connect(self.on_training_error)
         self.setup_ui()
 
     def setup_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        regression_button = QPushButton("Regression")
-        regression_button.clicked.connect(self.perform_regression)
-        layout.addWidget(regression_button)
+        self.target_combo = QComboBox()
+        self.target_combo.setEditable(True)
+        self.target_combo.setPlaceholderText("Target column")
+        layout.addWidget(self.target_combo)
+
+        regression_row = QHBoxLayout()
+        self.regression_combo = QComboBox()
+        self.regression_combo.addItems(list(self.REGRESSION_MODELS))
+        self.regression_button = QPushButton("Regression")
+        self.regression_button.clicked.connect(self.perform_regression)
+        regression_row.addWidget(self.regression_combo)
+        regression_row.addWidget(self.regression_button)
+        layout.addLayout(regression_row)
+
+        classification_row = QHBoxLayout()
+        self.classification_combo = QComboBox()
+        self.classification_combo.addItems(list(self.CLASSIFICATION_MODELS))
+        self.classification_button = QPushButton("Classification")
+        self.classification_button.clicked.connect(self.perform_classification)
+        classification_row.addWidget(self.classification_combo)
+        classification_row.addWidget(self.classification_button)
+        layout.addLayout(classification_row)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
 
-        classification_button = QPushButton("Classification")
-        classification_button.clicked.connect(self.perform_classification)
-        layout.addWidget(classification_button)
+    def refresh_targets(self):
+        """Offer the loaded table's column names as targets."""
+        headers = self.data_table.model.headers if self.data_table else None
+        current = self.target_combo.currentText()
+        self.target_combo.clear()
+        if headers:
+            self.target_combo.addItems([str(header) for header in headers])
+        if current:
+            self.target_combo.setCurrentText(current)
 
     def perform_regression(self):
-        # Implement regression logic
-        pass
+        self.train("regression", self.REGRESSION_MODELS[self.regression_combo.currentText()])
 
     def perform_classification(self):
-        # Implement classification logic
-        pass
+        self.train("classification", self.CLASSIFICATION_MODELS[self.classification_combo.currentText()])
+
+    def train(self, task, model):
+        """Train a model on the backend's copy of the loaded dataset; only the summary comes back."""
+        try:
+            payload = self.data_table.request_source() if self.data_table else None
+            if payload is None:
+                QMessageBox.warning(self, "Warning", "Please load data first.")
+                return
+            if self.target_combo.count() == 0:
+                self.refresh_targets()
+            target = self.target_combo.currentText()
+            if not target:
+                QMessageBox.warning(self, "Warning", "Please choose a target column.")
+                return
+            payload.update(task=task, model=model, target=target)
+            self.set_busy(True)
+            self.progress_bar.setValue(0)
+            self.status_label.setText("Submitting job...")
+            self.poller.submit("/ml/train", payload)
+        except Exception as e:
+            logger.error(f"Error starting {task}: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to start {task}: {str(e)}")
+
+    def on_progress(self, percent, message):
+        self.progress_bar.setValue(percent)
+        self.status_label.setText(message)
+
+    def on_model_trained(self, result):
+        self.set_busy(False)
+        self.status_label.setText(f"Model {result['model_id']} trained on {result['rows']} rows")
+        if self.visualisation is not None:
+            self.visualisation.display_model(result)
+
+    def on_training_error(self, message):
+        self.set_busy(False)
+        self.status_label.setText("Training failed")
+        QMessageBox.critical(self, "Error", f"Training failed: {message}")
+
+    def set_busy(self, busy):
+        self.regression_button.setEnabled(not busy)
+        self.classification_button.setEnabled(not busy)
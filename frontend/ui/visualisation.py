@@ -1,13 +1,219 @@
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QTableWidget
+import logging
+from PyQt5.QtWidgets import (QGroupBox, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QComboBox, QPushButton,
+                             QMessageBox, QSpinBox, QLabel, QTabWidget)
+from utils.workers import RequestWorker, start_request, JobPoller
+from utils.charts import ChartWidget
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class Visualisation(QGroupBox):
-    def __init__(self):
+    FREQUENCIES = {"Day": "day", "Week": "week", "Month": "month", "Year": "year"}
+    CHART_KINDS = {"Line": "line", "OHLC": "ohlc"}
+    DECIMATION_METHODS = {"LTTB": "lttb", "Min-max": "minmax"}
+
+    def __init__(self, data_table=None):
         super().__init__("Visualisation")
+        self.data_table = data_table
+        self.worker = None
+        self.chart_worker = None
+        self.chart_payload = None  # Request behind the plotted series, to prepare it again after live updates
+        self.projection_id = None
+        self.projection_poller = JobPoller(self)
+        self.projection_poller.progress.connect(lambda percent, message: self.projection_label.setText(message))
+        self.projection_poller.finished.connect(self.on_projection_ready)
+        self.projection_poller.failed.connect(self.on_projection_error)
         self.setup_ui()
+        if self.data_table is not None:
+            self.data_table.live_delta.connect(self.on_live_delta)
 
     def setup_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
+        # Trend controls: the backend resamples the series, only the reduced rows come back
+        controls = QHBoxLayout()
+        self.column_combo = QComboBox()
+        self.column_combo.setEditable(True)
+        self.column_combo.setPlaceholderText("Column")
+        self.freq_combo = QComboBox()
+        self.freq_combo.addItems(list(self.FREQUENCIES))
+        self.freq_combo.setCurrentText("Month")
+        trend_button = QPushButton("Show Trend")
+        trend_button.clicked.connect(self.show_trend)
+        controls.addWidget(self.column_combo)
+        controls.addWidget(self.freq_combo)
+        controls.addWidget(trend_button)
+        layout.addLayout(controls)
+
+        # Projection controls: PCA and clustering run as a backend job over the whole dataset
+        projection_controls = QHBoxLayout()
+        self.clusters_spin = QSpinBox()
+        self.clusters_spin.setRange(0, 100)
+        self.clusters_spin.setValue(5)
+        self.clusters_spin.setSpecialValueText("No clusters")
+        self.clusters_spin.setPrefix("Clusters: ")
+        self.projection_button = QPushButton("Project 2-D")
+        self.projection_button.clicked.connect(self.show_projection)
+        self.projection_label = QLabel("")
+        projection_controls.addWidget(self.clusters_spin)
+        projection_controls.addWidget(self.projection_button)
+        projection_controls.addWidget(self.projection_label)
+        layout.addLayout(projection_controls)
+
+        # Chart controls: the column picker above selects the line; OHLC finds its columns by name
+        chart_controls = QHBoxLayout()
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItems(list(self.CHART_KINDS))
+        self.method_combo = QComboBox()
+        self.method_combo.addItems(list(self.DECIMATION_METHODS))
+        plot_button = QPushButton("Plot")
+        plot_button.clicked.connect(self.show_chart)
+        chart_controls.addWidget(self.kind_combo)
+        chart_controls.addWidget(self.method_combo)
+        chart_controls.addWidget(plot_button)
+        layout.addLayout(chart_controls)
+
+        self.tabs = QTabWidget()
         self.visual_table = QTableWidget()
-        layout.addWidget(self.visual_table)
+        self.chart = ChartWidget()
+        self.tabs.addTab(self.visual_table, "Table")
+        self.tabs.addTab(self.chart, "Chart")
+        layout.addWidget(self.tabs)
+
+    def refresh_columns(self):
+        """Offer the loaded table's column names in the column picker."""
+        headers = self.data_table.model.headers if self.data_table else None
+        current = self.column_combo.currentText()
+        self.column_combo.clear()
+        if headers:
+            self.column_combo.addItems([str(header) for header in headers])
+        if current:
+            self.column_combo.setCurrentText(current)
+
+    def show_trend(self):
+        """Request a downsampled series for the selected column and show it."""
+        source = getattr(self.data_table, 'source', None)
+        if not source:
+            QMessageBox.warning(self, "Warning", "Please load a file first.")
+            return
+        if self.column_combo.count() == 0:
+            self.refresh_columns()
+        column = self.column_combo.currentText()
+        payload = dict(source, freq=self.FREQUENCIES[self.freq_combo.currentText()])
+        if column:
+            payload["columns"] = [column]
+        if self.worker is not None:
+            self.worker.cancel()
+        self.worker = start_request(RequestWorker("POST", "/aggregate", payload),
+                                    on_finished=self.display_records,
+                                    on_error=lambda message: QMessageBox.critical(self, "Error", f"Failed to load trend: {message}"))
+
+    def show_chart(self):
+        """Plot the loaded dataset; the chart then fetches decimated tiles for whatever is in view."""
+        payload = self.data_table.request_source() if self.data_table else None
+        if payload is None:
+            QMessageBox.warning(self, "Warning", "Please load data first.")
+            return
+        if self.column_combo.count() == 0:
+            self.refresh_columns()
+        kind = self.CHART_KINDS[self.kind_combo.currentText()]
+        column = self.column_combo.currentText()
+        payload["kind"] = kind
+        if kind == "line" and column:
+            payload["columns"] = [column]
+        self.chart_payload = payload
+        if self.chart_worker is not None:
+            self.chart_worker.cancel()
+        self.chart_worker = start_request(RequestWorker("POST", "/charts/series", payload),
+                                          on_finished=self.on_series_ready,
+                                          on_error=lambda message: QMessageBox.critical(self, "Error", f"Failed to plot: {message}"))
+
+    def on_series_ready(self, series, view=None):
+        self.chart.show_series(series, self.DECIMATION_METHODS[self.method_combo.currentText()], view)
+        if view is None:
+            self.tabs.setCurrentWidget(self.chart)
+        logger.info(f"Plotting series {series['series_id']} with {series['rows']} points")
+
+    def on_live_delta(self, delta):
+        """Keep the plotted series in step with live updates of the dataset it was drawn from."""
+        if (self.chart.series is None or self.chart_payload is None
+                or self.chart_payload.get("dataset_id") != delta["dataset_id"]):
+            return
+        if delta["type"] == "append" and self.chart.append_rows(delta["columns"], delta["rows"], delta["start"]):
+            return
+        # Changed rows, a rewritten source or a long live tail: tile the new revision, keeping the view
+        if self.chart_worker is not None:
+            self.chart_worker.cancel()
+        view = self.chart.axes.get_xlim()
+        self.chart_worker = start_request(RequestWorker("POST", "/charts/series", self.chart_payload),
+                                          on_finished=lambda series: self.on_series_ready(series, view),
+                                          on_error=lambda message: logger.error(f"Failed to refresh chart: {message}"))
+
+    def show_projection(self):
+        """Start a 2-D projection (and clustering) job over the loaded dataset."""
+        payload = self.data_table.request_source() if self.data_table else None
+        if payload is None:
+            QMessageBox.warning(self, "Warning", "Please load data first.")
+            return
+        if self.clusters_spin.value():
+            payload["clusters"] = self.clusters_spin.value()
+        self.projection_button.setEnabled(False)
+        self.projection_label.setText("Submitting job...")
+        self.projection_poller.submit("/projection", payload)
+
+    def on_projection_ready(self, result):
+        self.projection_button.setEnabled(True)
+        self.projection_id = result["projection_id"]
+        ratios = ", ".join(f"{ratio:.1%}" for ratio in result["explained_variance_ratio"])
+        self.projection_label.setText(f"{result['rows']} rows projected (variance explained: {ratios})")
+        if result["clusters"]:
+            self.display_records(result["clusters"])
+        else:
+            self.display_records([{"column": column, "pc1": weights[0], "pc2": weights[1]}
+                                  for column, weights in result["components"].items()])
+        self.chart.show_projection(result)
+        self.tabs.setCurrentWidget(self.chart)
+
+    def on_projection_error(self, message):
+        self.projection_button.setEnabled(True)
+        self.projection_label.setText("Projection failed")
+        QMessageBox.critical(self, "Error", f"Projection failed: {message}")
+
+    def display_records(self, records):
+        """Show a list of records (dicts) in the visualisation table."""
+        columns = list(records[0].keys()) if records else []
+        self.visual_table.clear()
+        self.visual_table.setRowCount(len(records))
+        self.visual_table.setColumnCount(len(columns))
+        self.visual_table.setHorizontalHeaderLabels(columns)
+        for row_index, record in enumerate(records):
+            for column_index, column in enumerate(columns):
+                value = record[column]
+                self.visual_table.setItem(row_index, column_index, QTableWidgetItem("" if value is None else str(value)))
+        self.tabs.setCurrentWidget(self.visual_table)
+        logger.info(f"Displayed {len(records)} aggregated rows")
+
+    def display_matrix(self, columns, matrix, precision=4):
+        """Show a square matrix (e.g. a covariance matrix) labelled by column names."""
+        self.visual_table.clear()
+        self.visual_table.setRowCount(len(columns))
+        self.visual_table.setColumnCount(len(columns))
+        self.visual_table.setHorizontalHeaderLabels([str(column) for column in columns])
+        self.visual_table.setVerticalHeaderLabels([str(column) for column in columns])
+        for row_index, row in enumerate(matrix):
+            for column_index, value in enumerate(row):
+                text = "" if value is None else f"{value:.{precision}g}"
+                self.visual_table.setItem(row_index, column_index, QTableWidgetItem(text))
+        self.tabs.setCurrentWidget(self.visual_table)
+        logger.info(f"Displayed {len(columns)}x{len(columns)} matrix")
+
+    def display_model(self, result, precision=4):
+        """Show a trained model's cross-validation scores, best parameters and feature weights."""
+        records = [{"name": f"cv {metric}", "value": f"{score['mean']:.{precision}g} ± {score['std']:.{precision}g}"}
+                   for metric, score in result["cv"].items()]
+        records += [{"name": f"param {name}", "value": str(value)} for name, value in result["best_params"].items()]
+        records += [{"name": weight["feature"], "value": f"{weight['weight']:.{precision}g}"} for weight in result["weights"]]
+        self.display_records(records)
@@ -0,0 +1,13 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "http://127.0.0.1:8000"
+
+# One keep-alive session shared by every request to the backend
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+
+def url(path):
+    """Build the full backend URL for an endpoint path."""
+    return f"{BASE_URL}{path}"
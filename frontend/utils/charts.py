@@ -0,0 +1,334 @@
+import logging
+import math
+from collections import OrderedDict
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg, NavigationToolbar2QT
+from matplotlib.collections import LineCollection
+from matplotlib.dates import datestr2num
+from matplotlib.figure import Figure
+from utils.workers import RequestWorker, start_request
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400.0
+
+
+class TileCache:
+    """Least recently used tiles keyed by (series, zoom level, tile index)."""
+
+    def __init__(self, max_tiles=512):
+        self.tiles = OrderedDict()
+        self.max_tiles = max_tiles
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def clear(self):
+        self.tiles.clear()
+
+
+def zoom_level(view_min, view_max, data_min, data_max, max_zoom):
+    """The zoom level whose tiles are about as wide as the viewport, so one or two cover it."""
+    span = max(data_max - data_min, 1e-12)
+    view = max(view_max - view_min, 1e-12)
+    return int(min(max(math.floor(math.log2(span / view)), 0), max_zoom))
+
+
+def tile_range(view_min, view_max, data_min, data_max, zoom):
+    """Indices of the tiles at a zoom level that overlap [view_min, view_max]."""
+    count = 2 ** zoom
+    width = max(data_max - data_min, 1e-12) / count
+    first = int(min(max(math.floor((view_min - data_min) / width), 0), count - 1))
+    last = int(min(max(math.floor((view_max - data_min) / width), 0), count - 1))
+    return range(first, last + 1)
+
+
+class ChartWidget(QWidget):
+    """Line, OHLC and scatter charts that stay interactive over millions of points.
+
+    The backend cuts a series into tiles per zoom level and decimates each
+    tile to a fixed number of points. After every pan or zoom (debounced),
+    the chart works out the zoom level matching the viewport, draws the
+    tiles it already has, and fetches only the missing ones in the
+    background. Tiles are cached per zoom level, so panning back or zooming
+    out again costs no request. Artists are updated in place with set_data
+    rather than re-plotted.
+    """
+
+    SCATTER_MAX_ZOOM = 8
+    # Live rows drawn after the tiles; beyond this the series should be prepared again
+    MAX_TAIL_POINTS = 20000
+
+    def __init__(self, parent=None, points_per_tile=1000, max_tiles=512):
+        super().__init__(parent)
+        self.points_per_tile = points_per_tile
+        self.cache = TileCache(max_tiles)
+        self.series = None
+        self.method = 'lttb'
+        self.projection = None
+        self.pending = set()
+        self.workers = []
+        # Bumped whenever a new series is shown, so late responses for the previous one are dropped
+        self.generation = 0
+        self.x_scale = 1.0
+        self.artists = {}
+        # Rows appended to the plotted dataset since its tiles were made, in axis units
+        self.tail = None
+
+        self.figure = Figure(figsize=(5, 3), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(120)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def reset(self):
+        """Forget the current chart and start a new, empty one."""
+        self.generation += 1
+        self.pending.clear()
+        self.artists = {}
+        self.tail = None
+        self.series = None
+        self.projection = None
+        self.axes.clear()
+        self.axes.callbacks.connect('xlim_changed', self.on_limits_changed)
+        self.axes.callbacks.connect('ylim_changed', self.on_limits_changed)
+
+    def show_series(self, series, method='lttb', view=None):
+        """Plot a series prepared by /charts/series (line or OHLC) over its full x range, or over view."""
+        self.reset()
+        self.series = series
+        self.method = method
+        self.x_scale = SECONDS_PER_DAY if series["x_is_time"] else 1.0
+        if series["x_is_time"]:
+            # Dates are sent as epoch seconds; Matplotlib dates count days since the epoch
+            self.axes.xaxis_date()
+        if series["kind"] == 'ohlc':
+            self.artists["wicks"] = self.axes.add_collection(LineCollection([], linewidths=0.8, colors='0.35'))
+            self.artists["bodies"] = self.axes.add_collection(LineCollection([], linewidths=3))
+        else:
+            for column in series["columns"]:
+                self.artists[column], = self.axes.plot([], [], linewidth=0.9, label=column)
+            if len(series["columns"]) > 1:
+                self.axes.legend(loc='upper left')
+        self.axes.set_title(", ".join(series["columns"]) if series["kind"] == 'line' else "OHLC")
+        x_min, x_max = series["x_min"] / self.x_scale, series["x_max"] / self.x_scale
+        self.axes.set_xlim(*(view or (x_min, x_max if x_max > x_min else x_min + 1)))
+        self.refresh()
+
+    def append_rows(self, columns, rows, start):
+        """Draw rows appended to the plotted dataset (a live delta) after its tiles.
+
+        While the view shows the end of the series, it scrolls to keep the
+        newest rows in sight.
+
+        :param start: Position of the first row in the dataset, the x value when the series has no x column
+        :return: False when the appended rows should rather be tiled, by preparing the series again
+        """
+        series = self.series
+        if series is None or not rows:
+            return True
+        names = [series["x_column"], *series["columns"]] if series["x_column"] else list(series["columns"])
+        if any(name not in columns for name in names):
+            return True
+        positions = {name: columns.index(name) for name in names}
+        if series["x_column"] is None:
+            x = np.arange(start, start + len(rows), dtype=float)
+        elif series["x_is_time"]:
+            x = datestr2num([str(row[positions[series["x_column"]]]) for row in rows])
+        else:
+            x = np.array([row[positions[series["x_column"]]] for row in rows], dtype=float)
+        values = {name: np.array([row[positions[name]] for row in rows], dtype=float) for name in series["columns"]}
+
+        right = self.tail["x"][-1] if self.tail else series["x_max"] / self.x_scale
+        if self.tail is None:
+            self.tail = {"x": x, **values}
+        else:
+            self.tail = {"x": np.concatenate([self.tail["x"], x]),
+                         **{name: np.concatenate([self.tail[name], values[name]]) for name in values}}
+        if len(self.tail["x"]) > self.MAX_TAIL_POINTS:
+            return False
+        view_min, view_max = self.axes.get_xlim()
+        newest = np.nanmax(x)
+        if view_max >= right and newest > right:
+            self.axes.set_xlim(view_min + newest - right, view_max + newest - right)
+        else:
+            self.refresh()
+        return True
+
+    def show_projection(self, projection):
+        """Plot the 2-D points of a projection (metadata from /projection), sampled per viewport tile."""
+        self.reset()
+        self.projection = projection
+        self.x_scale = 1.0
+        self.artists["points"] = self.axes.scatter([], [], s=[], c=[], cmap='tab10', vmin=0, vmax=9,
+                                                   linewidths=0, alpha=0.7)
+        x_min, y_min, x_max, y_max = projection["bounds"]
+        self.axes.set_title("2-D projection")
+        self.axes.set_xlim(x_min, x_max if x_max > x_min else x_min + 1)
+        self.axes.set_ylim(y_min, y_max if y_max > y_min else y_min + 1)
+        self.refresh()
+
+    def on_limits_changed(self, _axes):
+        # Pan and zoom fire this continuously; fetch once the view settles
+        self.refresh_timer.start()
+
+    def refresh(self):
+        """Draw the tiles covering the viewport and request the missing ones."""
+        if self.series is not None:
+            keys = self.visible_series_tiles()
+        elif self.projection is not None:
+            keys = self.visible_scatter_tiles()
+        else:
+            return
+        missing = [key for key in keys if self.cache.get(key) is None and key not in self.pending]
+        if missing:
+            self.fetch(missing)
+        self.draw([tile for tile in (self.cache.get(key) for key in keys) if tile is not None])
+
+    def visible_series_tiles(self):
+        series = self.series
+        view_min, view_max = (value * self.x_scale for value in self.axes.get_xlim())
+        zoom = zoom_level(view_min, view_max, series["x_min"], series["x_max"], series["max_zoom"])
+        return [(series["series_id"], self.method, zoom, index)
+                for index in tile_range(view_min, view_max, series["x_min"], series["x_max"], zoom)]
+
+    def visible_scatter_tiles(self):
+        x_min, y_min, x_max, y_max = self.projection["bounds"]
+        view_x, view_y = self.axes.get_xlim(), self.axes.get_ylim()
+        # One zoom level for both axes keeps the tiles square in data space
+        zoom = min(zoom_level(*view_x, x_min, x_max, self.SCATTER_MAX_ZOOM),
+                   zoom_level(*view_y, y_min, y_max, self.SCATTER_MAX_ZOOM))
+        return [(self.projection["projection_id"], zoom, column, row)
+                for column in tile_range(*view_x, x_min, x_max, zoom)
+                for row in tile_range(*view_y, y_min, y_max, zoom)]
+
+    def fetch(self, keys):
+        generation = self.generation
+        self.pending.update(keys)
+        if self.series is not None:
+            # Every missing tile of a series is at the same zoom level, so one request fetches them all
+            series_id, method, zoom = keys[0][:3]
+            payload = {"zoom": zoom, "indices": [key[3] for key in keys], "points_per_tile": self.points_per_tile,
+                       "method": method}
+            self.start(RequestWorker("POST", f"/charts/series/{series_id}/tiles", payload),
+                       lambda result: self.on_tiles(generation, keys, result["tiles"]), keys)
+            return
+        x_min, y_min, x_max, y_max = self.projection["bounds"]
+        for key in keys:
+            projection_id, zoom, column, row = key
+            width, height = (x_max - x_min) / 2 ** zoom, (y_max - y_min) / 2 ** zoom
+            bounds = [x_min + column * width, y_min + row * height,
+                      x_min + (column + 1) * width, y_min + (row + 1) * height]
+            payload = {"max_points": self.points_per_tile, "bounds": bounds}
+            self.start(RequestWorker("POST", f"/projection/{projection_id}/points", payload),
+                       lambda points, key=key: self.on_tiles(generation, [key], [points]), [key])
+
+    def start(self, worker, on_finished, keys):
+        self.workers.append(worker)
+
+        def done(*_):
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+        def failed(message):
+            self.pending.difference_update(keys)
+            logger.error(f"Failed to load chart tiles: {message}")
+
+        worker.signals.finished.connect(done)
+        worker.signals.error.connect(done)
+        start_request(worker, on_finished=on_finished, on_error=failed)
+
+    def on_tiles(self, generation, keys, tiles):
+        if generation != self.generation:
+            return
+        self.pending.difference_update(keys)
+        for key, tile in zip(keys, tiles):
+            self.cache.put(key, tile)
+        self.refresh()
+
+    def draw(self, tiles):
+        if not tiles:
+            return
+        if self.projection is not None:
+            self.draw_points(tiles)
+        elif self.series["kind"] == 'ohlc':
+            self.draw_bars(tiles)
+        else:
+            self.draw_lines(tiles)
+        self.canvas.draw_idle()
+
+    def draw_lines(self, tiles):
+        tiles = sorted(tiles, key=lambda tile: tile["index"])
+        low, high = math.inf, -math.inf
+        for column, line in self.artists.items():
+            x = np.concatenate([tile["lines"][column]["x"] for tile in tiles]) / self.x_scale
+            y = np.concatenate([tile["lines"][column]["y"] for tile in tiles])
+            if self.tail is not None:
+                x, y = np.concatenate([x, self.tail["x"]]), np.concatenate([y, self.tail[column]])
+            line.set_data(x, y)
+            if len(y):
+                low, high = min(low, np.nanmin(y)), max(high, np.nanmax(y))
+        self.fit_y(low, high)
+
+    def draw_bars(self, tiles):
+        tiles = sorted(tiles, key=lambda tile: tile["index"])
+        x = np.concatenate([tile["x"] for tile in tiles]) / self.x_scale
+        values = {name: np.concatenate([np.asarray(tile["values"][name], dtype=float) for tile in tiles])
+                  for name in ('open', 'high', 'low', 'close')}
+        if self.tail is not None:
+            x = np.concatenate([x, self.tail["x"]])
+            # The series columns are in open, high, low, close order
+            values = {name: np.concatenate([values[name], self.tail[column]])
+                      for name, column in zip(('open', 'high', 'low', 'close'), self.series["columns"])}
+        self.artists["wicks"].set_segments(np.stack([np.column_stack([x, values["low"]]),
+                                                     np.column_stack([x, values["high"]])], axis=1))
+        self.artists["bodies"].set_segments(np.stack([np.column_stack([x, values["open"]]),
+                                                      np.column_stack([x, values["close"]])], axis=1))
+        self.artists["bodies"].set_color(np.where((values["close"] >= values["open"])[:, None],
+                                                  [[0.1, 0.6, 0.3, 1.0]], [[0.8, 0.2, 0.2, 1.0]]))
+        if len(x):
+            self.fit_y(np.nanmin(values["low"]), np.nanmax(values["high"]))
+
+    def draw_points(self, tiles):
+        points = [point for tile in tiles for point in tile]
+        if not points:
+            return
+        x = np.array([point["x"] for point in points])
+        y = np.array([point["y"] for point in points])
+        clusters = np.array([max(point["cluster"], 0) for point in points]) % 10
+        counts = np.array([point["count"] for point in points], dtype=float)
+        scatter = self.artists["points"]
+        scatter.set_offsets(np.column_stack([x, y]))
+        # Markers grow with the number of points each sample stands for
+        scatter.set_sizes(4 + 6 * np.log1p(counts))
+        scatter.set_array(clusters)
+
+    def fit_y(self, low, high):
+        """Fit the y axis to the drawn data without re-triggering a refresh for it."""
+        if not (math.isfinite(low) and math.isfinite(high)):
+            return
+        margin = (high - low) * 0.05 or abs(high) * 0.05 or 1.0
+        self.axes.set_ylim(low - margin, high + margin, emit=False)
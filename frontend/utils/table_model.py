@@ -0,0 +1,176 @@
+import math
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+
+class ColumnStore:
+    """Column-oriented storage of table values in growable NumPy arrays."""
+
+    def __init__(self):
+        self.columns = []
+        self.row_count = 0
+
+    @property
+    def column_count(self):
+        return len(self.columns)
+
+    def ensure_columns(self, width):
+        """Add empty columns until the store is at least width columns wide."""
+        capacity = len(self.columns[0]) if self.columns else 0
+        while len(self.columns) < width:
+            self.columns.append(np.full(capacity, None, dtype=object))
+
+    def append_rows(self, rows):
+        """Append a list of row lists; short rows are padded and long rows widen the table."""
+        if not rows:
+            return
+        width = max(self.column_count, max(len(row) for row in rows))
+        self.ensure_columns(width)
+        block = np.full((len(rows), width), None, dtype=object)
+        for row_index, row in enumerate(rows):
+            block[row_index, :len(row)] = row
+
+        needed = self.row_count + len(rows)
+        for index, column in enumerate(self.columns):
+            if len(column) < needed:
+                # Grow geometrically so that streamed appends stay amortised O(1)
+                grown = np.full(max(needed, 2 * len(column), 1024), None, dtype=object)
+                grown[:self.row_count] = column[:self.row_count]
+                column = self.columns[index] = grown
+            column[self.row_count:needed] = block[:, index]
+        self.row_count = needed
+
+    def set_row(self, row, values):
+        """Overwrite one stored row; extra values beyond the table width are ignored."""
+        for index, value in enumerate(values[:self.column_count]):
+            self.columns[index][row] = value
+
+    def value(self, row, column):
+        return self.columns[column][row]
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """Table model that formats only the cells the view asks for.
+
+    Values live in a ColumnStore rather than in one QTableWidgetItem per
+    cell, so loading a large table costs one array copy and scrolling only
+    formats the visible rows. When a page loader is set, further rows are
+    requested from the backend as the view scrolls near the end.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = ColumnStore()
+        self.headers = None
+        self.page_loader = None
+        self.total_rows = 0
+        self.page_size = 1000
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.store.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.store.column_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return QVariant()
+        return self.format_value(self.store.value(index.row(), index.column()))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal and self.headers is not None and section < len(self.headers):
+            return str(self.headers[section])
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self.page_loader is not None and self.store.row_count < self.total_rows
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Request the next page of rows from the page loader."""
+        if not self.canFetchMore(parent):
+            return
+        limit = min(self.page_size, self.total_rows - self.store.row_count)
+        rows = self.page_loader(self.store.row_count, limit)
+        if not rows:
+            # The source returned fewer rows than announced; stop asking for more
+            self.total_rows = self.store.row_count
+            return
+        self.append_rows(rows)
+
+    def set_rows(self, rows, headers=None):
+        """Replace the model contents with a list of row lists."""
+        self.beginResetModel()
+        self.store = ColumnStore()
+        self.store.append_rows(rows)
+        self.headers = headers
+        self.page_loader = None
+        self.total_rows = self.store.row_count
+        self.endResetModel()
+
+    def set_page_loader(self, page_loader, total_rows, headers=None, page_size=None):
+        """Load rows lazily: page_loader(offset, limit) returns a list of row lists."""
+        self.beginResetModel()
+        self.store = ColumnStore()
+        self.headers = headers
+        self.page_loader = page_loader
+        self.total_rows = total_rows
+        self.page_size = page_size or self.page_size
+        self.endResetModel()
+
+    def set_headers(self, headers):
+        """Replace the column names, telling the view to repaint its header."""
+        self.headers = headers
+        if self.store.column_count:
+            self.headerDataChanged.emit(Qt.Horizontal, 0, self.store.column_count - 1)
+
+    def append_rows(self, rows, headers=None):
+        """Append rows at the end of the table, e.g. while a response is still streaming.
+
+        headers, when given, replaces the column names, e.g. with those of the first streamed batch.
+        """
+        if not rows:
+            return
+        first = self.store.row_count
+        width = max(len(row) for row in rows)
+        if width > self.store.column_count:
+            self.beginInsertColumns(QModelIndex(), self.store.column_count, width - 1)
+            self.store.ensure_columns(width)
+            self.endInsertColumns()
+        if headers is not None and headers != self.headers:
+            self.set_headers(headers)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.store.append_rows(rows)
+        self.total_rows = max(self.total_rows, self.store.row_count)
+        self.endInsertRows()
+
+    def update_rows(self, positions, rows):
+        """Overwrite rows in place, e.g. rows changed at the source; rows not loaded yet are skipped."""
+        for position, row in zip(positions, rows):
+            if position < self.store.row_count:
+                self.store.set_row(position, row)
+                self.dataChanged.emit(self.index(position, 0), self.index(position, self.store.column_count - 1))
+
+    def extend_total(self, total_rows):
+        """Announce rows added at the source; they are paged in as the view scrolls to them."""
+        self.total_rows = max(self.total_rows, total_rows)
+
+    def clear(self):
+        self.beginResetModel()
+        self.store = ColumnStore()
+        self.headers = None
+        self.page_loader = None
+        self.total_rows = 0
+        self.endResetModel()
+
+    def to_rows(self):
+        """Return every loaded row as a list of display strings."""
+        formatted = [[self.format_value(value) for value in column[:self.store.row_count]] for column in self.store.columns]
+        return [list(row) for row in zip(*formatted)]
+
+    @staticmethod
+    def format_value(value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return ""
+        return str(value)
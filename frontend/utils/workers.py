@@ -0,0 +1,274 @@
+import json
+import logging
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+import requests
+from utils.api_client import session, url
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class WorkerSignals(QObject):
+    """Signals emitted by a RequestWorker; they are delivered on the GUI thread."""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    rows = pyqtSignal(list, list)
+    cancelled = pyqtSignal()
+
+
+class RequestWorker(QRunnable):
+    """Runs one backend request on the thread pool so the GUI thread never blocks.
+
+    With stream=True the response is read as NDJSON and rows are emitted in
+    batches of batch_rows through the rows signal (column names, row lists)
+    as they arrive, followed by finished with the total row count.
+    """
+
+    def __init__(self, method, path, json_body=None, stream=False, batch_rows=2000, timeout=300):
+        super().__init__()
+        self.method = method
+        self.path = path
+        self.json_body = json_body
+        self.stream = stream
+        self.batch_rows = batch_rows
+        self.timeout = timeout
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+        self.response = None
+
+    def cancel(self):
+        """Ask the worker to stop; an open streaming response is closed.
+
+        Results it already emitted but the GUI thread has not handled yet are
+        dropped by the callbacks connected through start_request.
+        """
+        self.cancel_event.set()
+        if self.response is not None:
+            self.response.close()
+
+    @property
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            headers = {"Accept": "application/x-ndjson"} if self.stream else None
+            self.response = session.request(self.method, url(self.path), json=self.json_body, headers=headers,
+                                            stream=self.stream, timeout=self.timeout)
+            self.response.raise_for_status()
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+                return
+            if self.stream:
+                self.signals.finished.emit(self.read_stream())
+            else:
+                self.signals.finished.emit(self.response.json())
+        except Exception as e:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+                return
+            logger.error(f"Request to {self.path} failed: {str(e)}")
+            self.signals.error.emit(str(e))
+        finally:
+            if self.response is not None:
+                self.response.close()
+
+    def read_stream(self):
+        """Emit NDJSON records in row batches and return the number of rows read."""
+        columns = None
+        batch = []
+        total = 0
+        for line in self.response.iter_lines():
+            if self.is_cancelled:
+                break
+            if not line:
+                continue
+            record = json.loads(line)
+            if columns is None:
+                columns = list(record.keys())
+            batch.append([record.get(column) for column in columns])
+            if len(batch) >= self.batch_rows:
+                total += len(batch)
+                self.signals.rows.emit(columns, batch)
+                self.signals.progress.emit(total)
+                batch = []
+        if batch and not self.is_cancelled:
+            total += len(batch)
+            self.signals.rows.emit(columns, batch)
+            self.signals.progress.emit(total)
+        if self.is_cancelled:
+            raise requests.RequestException("Request cancelled")
+        return total
+
+
+def start_request(worker, on_finished=None, on_error=None, on_progress=None, on_rows=None, on_cancelled=None):
+    """Connect the callbacks and queue the worker on the global thread pool.
+
+    Signals are queued to the GUI thread, so a batch of rows emitted just
+    before cancel() can arrive after it, e.g. after the table was cleared for
+    the next request. Except for on_cancelled, callbacks are skipped once the
+    worker is cancelled.
+    """
+    def unless_cancelled(callback):
+        def deliver(*args):
+            if not worker.is_cancelled:
+                callback(*args)
+        return deliver
+
+    if on_finished:
+        worker.signals.finished.connect(unless_cancelled(on_finished))
+    if on_error:
+        worker.signals.error.connect(unless_cancelled(on_error))
+    if on_progress:
+        worker.signals.progress.connect(unless_cancelled(on_progress))
+    if on_rows:
+        worker.signals.rows.connect(unless_cancelled(on_rows))
+    if on_cancelled:
+        worker.signals.cancelled.connect(on_cancelled)
+    QThreadPool.globalInstance().start(worker)
+    return worker
+
+
+class JobPoller(QObject):
+    """Submits a backend job and polls it until it ends.
+
+    progress carries (percent, message); finished carries the job result
+    and failed an error message.
+    """
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, interval_ms=500):
+        super().__init__(parent)
+        self.job_id = None
+        self.pending = False
+        self.worker = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.poll)
+
+    def submit(self, path, payload):
+        """POST payload to a job endpoint and start polling the job it creates."""
+        self.stop()
+        self.worker = start_request(RequestWorker("POST", path, payload),
+                                    on_finished=self.on_submitted, on_error=self.on_error)
+
+    def on_submitted(self, response):
+        self.job_id = response["job_id"]
+        logger.info(f"Job {self.job_id} submitted")
+        self.timer.start()
+        self.poll()
+
+    def poll(self):
+        # Skip a tick while the previous status request is still in flight
+        if self.job_id is None or self.pending:
+            return
+        self.pending = True
+        self.worker = start_request(RequestWorker("GET", f"/jobs/{self.job_id}", timeout=30),
+                                    on_finished=self.on_status, on_error=self.on_error)
+
+    def on_status(self, status):
+        self.pending = False
+        if self.job_id is None or status["id"] != self.job_id:
+            return
+        self.progress.emit(int(status["progress"] * 100), status["message"] or status["status"])
+        if status["status"] == "failed":
+            self.on_error(status["error"])
+        elif status["status"] == "cancelled":
+            self.on_error("Job was cancelled")
+        elif status["status"] == "finished":
+            self.timer.stop()
+            self.worker = start_request(RequestWorker("GET", f"/jobs/{self.job_id}/result"),
+                                        on_finished=self.on_result, on_error=self.on_error)
+
+    def on_result(self, result):
+        self.stop()
+        self.finished.emit(result)
+
+    def on_error(self, message):
+        self.stop()
+        self.failed.emit(message)
+
+    def cancel(self):
+        """Stop polling and ask the backend to cancel the job."""
+        if self.job_id is not None:
+            start_request(RequestWorker("DELETE", f"/jobs/{self.job_id}", timeout=30))
+        self.stop()
+
+    def stop(self):
+        self.timer.stop()
+        self.pending = False
+        self.job_id = None
+
+
+class EventStream(QObject):
+    """Follows a server-sent event stream on a background thread.
+
+    Every event is delivered on the GUI thread through the event signal as
+    (event name, decoded JSON data); failed carries an error message when
+    the connection cannot be opened or drops while still wanted.
+    """
+    event = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, params=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.params = params
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"events-{self.path}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop following the stream; closing the response unblocks the reading thread."""
+        self.stopped.set()
+        if self.response is not None:
+            self.response.close()
+
+    def run(self):
+        try:
+            # No read timeout: the server sends a keep-alive comment while nothing changes
+            self.response = session.get(url(self.path), params=self.params, stream=True, timeout=(10, None),
+                                        headers={"Accept": "text/event-stream"})
+            if self.stopped.is_set():
+                return
+            if not self.response.ok:
+                try:
+                    detail = self.response.json().get("detail")
+                except ValueError:
+                    detail = None
+                raise requests.HTTPError(detail or f"{self.response.status_code} {self.response.reason}")
+            name, data = "message", []
+            for line in self.response.iter_lines(decode_unicode=True):
+                if self.stopped.is_set():
+                    return
+                if line is None or line.startswith(':'):
+                    continue
+                if line == '':
+                    # A blank line ends an event
+                    if data:
+                        self.event.emit(name, json.loads("\n".join(data)))
+                    name, data = "message", []
+                elif line.startswith('event:'):
+                    name = line[6:].strip()
+                elif line.startswith('data:'):
+                    data.append(line[5:].lstrip())
+            if not self.stopped.is_set():
+                self.failed.emit("The live connection was closed by the server")
+        except Exception as e:
+            if self.stopped.is_set():
+                return
+            logger.error(f"Event stream {self.path} failed: {str(e)}")
+            self.failed.emit(str(e))
+        finally:
+            if self.response is not None:
+                self.response.close()
@@ -0,0 +1,101 @@
+"""Checks for the year-partitioned market data store, using a fake history provider instead of yfinance.
+
+Run from the repository root with `python test_market_store.py` (or with pytest).
+"""
+import os
+import sys
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from data_ingestion.market_store import MarketDataStore, frame_history, csv_history
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'data', 'NVIDIA.csv')
+
+
+def fake_history():
+    """Business days from 2019 to 2021 in the exchange's timezone, indexed by Date like yfinance."""
+    dates = pd.bdate_range('2019-01-01', '2021-12-31', tz='America/New_York', name='Date')
+    prices = pd.Series(range(len(dates)), index=dates, dtype='float64')
+    return pd.DataFrame({'Open': prices, 'Close': prices + 0.5, 'Volume': (prices * 100).astype('int64')})
+
+
+def recording(provider):
+    """Wrap a provider to record the start it is asked for."""
+    calls = []
+
+    def history(start=None):
+        calls.append(start)
+        return provider(start)
+
+    return history, calls
+
+
+def stored_files(root):
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
+
+
+def test_empty_store_gets_full_history():
+    history = fake_history()
+    with tempfile.TemporaryDirectory() as root:
+        store = MarketDataStore(root)
+        provider, calls = recording(frame_history(history))
+        assert store.ingest(provider) == len(history)
+        assert calls == [None]
+        assert store.partitions() == [2019, 2020, 2021]
+        stored = store.read()
+        assert len(stored) == len(history)
+        assert (stored['Date'].to_numpy() == history.index.tz_convert('UTC').to_numpy()).all()
+
+
+def test_overlapping_refresh_is_idempotent():
+    history = fake_history()
+    with tempfile.TemporaryDirectory() as root:
+        store = MarketDataStore(root)
+        store.ingest(frame_history(history.iloc[:-10]))
+        files = stored_files(root)
+        # Asked from the last stored day, the provider sends that day again along with the new ones
+        provider, calls = recording(frame_history(history))
+        assert store.ingest(provider) == 10
+        assert calls == [history.index[-11].tz_convert('UTC')]
+        assert store.ingest(provider) == 0
+        # Replaying the whole history writes nothing either
+        assert store.append(history) == 0
+        assert len(stored_files(root)) == len(files) + 1
+        assert len(store.read()) == len(history)
+
+
+def test_read_prunes_partitions():
+    with tempfile.TemporaryDirectory() as root:
+        store = MarketDataStore(root)
+        store.ingest(frame_history(fake_history()))
+        # A partition outside the range is not opened, so damaging it does not affect the read
+        for path in store.partition_files(2021):
+            with open(path, 'wb') as damaged:
+                damaged.write(b'not parquet')
+        rows = store.read('2019-03-01', '2019-03-31')
+        assert len(rows) == len(pd.bdate_range('2019-03-01', '2019-03-31'))
+        assert rows['Date'].min() >= pd.Timestamp('2019-03-01', tz='UTC')
+        try:
+            store.read('2021-01-01', '2021-01-31')
+        except Exception:
+            pass
+        else:
+            raise AssertionError("Reading the damaged partition should fail")
+
+
+def test_seed_from_csv():
+    with tempfile.TemporaryDirectory() as root:
+        store = MarketDataStore(root)
+        rows = len(pd.read_csv(CSV_PATH))
+        assert store.ingest(csv_history(CSV_PATH)) == rows
+        assert store.ingest(csv_history(CSV_PATH)) == 0
+        assert len(store.read()) == rows
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"{name}: ok")
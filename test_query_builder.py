@@ -0,0 +1,115 @@
+"""Checks structured queries run in SQLite against the same computation in pandas.
+
+Run from the repository root with `python test_query_builder.py` (or with pytest).
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from data_ingestion import integrate_db
+from data_ingestion.integrate_db import SQLiteDatabase
+from data_ingestion.query_builder import build_query
+
+
+def sales():
+    rng = np.random.default_rng(0)
+    rows = 2000
+    frame = pd.DataFrame({
+        'region': rng.choice(['north', 'south', 'east', 'west'], rows),
+        'product': rng.choice(['a', 'b', 'c', '10%_off'], rows),
+        'units': rng.integers(1, 50, rows),
+        'price': rng.random(rows).round(2) * 100,
+        'sold_at': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730 * 24, rows), unit='h'),
+    })
+    frame.loc[rng.random(rows) < 0.05, 'price'] = np.nan
+    return frame
+
+
+def run(database, **query):
+    """Rows of a structured query as a DataFrame."""
+    statement = build_query(database, 'sales', **query)
+    frames = [pd.DataFrame.from_records(rows, columns=columns) for columns, rows in database.stream_data(statement, 500)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def check(database, expected, **query):
+    actual = run(database, **query)
+    expected = expected.reset_index(drop=True)
+    assert list(actual.columns) == list(expected.columns), (list(actual.columns), list(expected.columns))
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def as_stored(frame):
+    """The frame as SQLite holds it, with datetimes as text."""
+    return frame.assign(sold_at=frame['sold_at'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def check_against_pandas(database, frame):
+    # Filters; the rows come back as stored
+    rows = as_stored(frame)
+    check(database, rows[(frame['region'] == 'north') & (frame['units'] >= 25)],
+          filters=[{'column': 'region', 'op': '==', 'value': 'north'}, {'column': 'units', 'op': '>=', 'value': 25}])
+    check(database, rows[frame['product'].isin(['a', 'c']) & frame['units'].between(10, 20)],
+          filters=[{'column': 'product', 'op': 'in', 'value': ['a', 'c']},
+                   {'column': 'units', 'op': 'between', 'value': [10, 20]}])
+    # contains escapes LIKE wildcards, so '%' only matches itself
+    check(database, rows[frame['product'].str.contains('%', regex=False)],
+          filters=[{'column': 'product', 'op': 'contains', 'value': '%'}])
+    check(database, frame[frame['price'].isna()][['region', 'units']],
+          columns=['region', 'units'], filters=[{'column': 'price', 'op': 'is_null'}])
+
+    # Grouping and aggregates; pandas skips missing values as SQL does
+    grouped = frame.groupby('region').agg(count=('units', 'size'), sum_units=('units', 'sum'),
+                                          mean_price=('price', 'mean'), min_price=('price', 'min'),
+                                          max_price=('price', 'max'),
+                                          count_distinct_product=('product', 'nunique')).reset_index()
+    check(database, grouped.sort_values('region'), group_by=['region'],
+          aggregates=[{'func': 'count'}, {'func': 'sum', 'column': 'units'}, {'func': 'mean', 'column': 'price'},
+                      {'func': 'min', 'column': 'price'}, {'func': 'max', 'column': 'price'},
+                      {'func': 'count_distinct', 'column': 'product'}],
+          order_by=['region'])
+
+    # Ordering and limits
+    top = frame.groupby('product')['units'].sum().rename('total').reset_index()
+    check(database, top.sort_values('total', ascending=False).head(2), group_by=['product'],
+          aggregates=[{'func': 'sum', 'column': 'units', 'alias': 'total'}], order_by=['-total'], limit=2)
+
+    # Time buckets; SQLite returns their start as text
+    for unit, starts in (('day', frame['sold_at'].dt.floor('D')),
+                         ('week', frame['sold_at'].dt.to_period('W-SUN').dt.start_time),
+                         ('month', frame['sold_at'].dt.to_period('M').dt.start_time),
+                         ('quarter', frame['sold_at'].dt.to_period('Q').dt.start_time),
+                         ('year', frame['sold_at'].dt.to_period('Y').dt.start_time)):
+        expected = frame.groupby(starts.dt.strftime('%Y-%m-%d').rename('bucket'))['units'].sum() \
+            .rename('units').reset_index()
+        check(database, expected, time_bucket={'column': 'sold_at', 'unit': unit},
+              aggregates=[{'func': 'sum', 'column': 'units', 'alias': 'units'}])
+    hours = frame.groupby(frame['sold_at'].dt.floor('h').dt.strftime('%Y-%m-%d %H:00:00').rename('bucket')).size()
+    check(database, hours.rename('count').reset_index(), time_bucket={'column': 'sold_at', 'unit': 'hour'},
+          aggregates=[{'func': 'count'}])
+
+
+def test_sqlite_matches_pandas():
+    frame = sales()
+    with tempfile.TemporaryDirectory() as directory:
+        with sqlite3.connect(os.path.join(directory, 'sales.db')) as connection:
+            as_stored(frame).to_sql('sales', connection, index=False)
+        previous, integrate_db.SQLITE_DIR = integrate_db.SQLITE_DIR, directory
+        try:
+            database = SQLiteDatabase('sales.db', registry=None)
+            try:
+                check_against_pandas(database, frame)
+            finally:
+                database.engine.dispose()
+        finally:
+            integrate_db.SQLITE_DIR = previous
+
+
+if __name__ == "__main__":
+    test_sqlite_matches_pandas()
+    print("test_sqlite_matches_pandas: ok")